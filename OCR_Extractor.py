@@ -3,16 +3,39 @@ import pytesseract
 import pdfplumber
 from pathlib import Path
 from PIL import Image
-from docx import Document
-from pptx import Presentation
 from io import BytesIO
 import docx
 import pptx
 import json
 from dotenv import load_dotenv
 import shutil
-import re
+import csv
+import glob
 import time
+import signal
+import multiprocessing
+import multiprocessing.connection
+import concurrent.futures
+from collections import deque
+from extraction_cache import get_extraction_cache, hash_file
+from ocr_engine import get_ocr_engine, ImageOCRCache, OCR_IMAGE_CACHE_SCOPE
+from text_cleaner import TextCleaner, clean_text, clean_text_with_stats, text_stats
+from pdf_backends import (PdfPagePlanner, resolve_pdf_backend, PDF_TRIAGE_MIN_CHARS,
+                          PDF_TRIAGE_IMAGE_COVERAGE, PDF_TRIAGE_MIN_RULES)
+from document_parser import (parse_docx, parse_pptx, docx_text_blocks, PackageImages,
+                             load_parsed_document, evict_parsed_documents, SHARE_PARSED_DOCUMENTS)
+from corpus_manifest import scan_corpus, get_corpus_manifest
+from archive_reader import (READ_ARCHIVES, ARCHIVE_SUFFIXES, is_archive, iter_archive_documents, provided_member,
+                            document_input, is_member_path, read_member, submit_bounded)
+from text_reader import iter_txt_blocks, TXT_BLOCK_CHARS, TXT_FALLBACK_ENCODING
+from pipeline_settings import SUPPORTED_EXTENSIONS, resolve_worker_count
+
+# psutil measures the memory of isolated document workers and their Tesseract processes
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
 
 load_dotenv()
 
@@ -21,6 +44,53 @@ CLEAN_EXTRACTED_TEXT = os.getenv('CLEAN_EXTRACTED_TEXT', 'true').lower() == 'tru
 VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
 DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
 
+# Number of worker processes used by process_folder_with_ocr ("auto" = one per CPU core)
+OCR_WORKERS = os.getenv('OCR_WORKERS', '1')
+
+# Number of worker processes that OCR the pages of a single PDF
+OCR_PAGE_WORKERS = os.getenv('OCR_PAGE_WORKERS', '1')
+
+# Rasterization resolution (DPI) for the PDF OCR fallback
+OCR_RESOLUTION = int(os.getenv('OCR_RESOLUTION', '300'))
+
+# Adaptive OCR: rasterize at OCR_MIN_RESOLUTION first and only re-render at
+# OCR_RESOLUTION when the mean word confidence is below OCR_CONFIDENCE_THRESHOLD
+OCR_ADAPTIVE_DPI = os.getenv('OCR_ADAPTIVE_DPI', 'false').lower() == 'true'
+OCR_MIN_RESOLUTION = int(os.getenv('OCR_MIN_RESOLUTION', '150'))
+OCR_CONFIDENCE_THRESHOLD = float(os.getenv('OCR_CONFIDENCE_THRESHOLD', '70'))
+
+# Write PDF text to the output file page by page instead of building it in memory
+OCR_STREAM_PDF = os.getenv('OCR_STREAM_PDF', 'false').lower() == 'true'
+
+# Raw characters held by the rolling cleaner before a window is cleaned and written
+OCR_CLEAN_WINDOW_CHARS = int(os.getenv('OCR_CLEAN_WINDOW_CHARS', '65536'))
+
+# Tesseract page segmentation mode
+OCR_PSM = os.getenv('OCR_PSM', '6')
+
+# Also save tables found in PDFs as side files: "none", "markdown", "csv" or "both"
+OCR_TABLE_FILES = os.getenv('OCR_TABLE_FILES', 'none').lower()
+
+# Output format: "text" writes <name>_extracted.txt; "jsonl" also writes <name>_extracted.jsonl
+# with one record per page, slide or embedded image and its character span in the .txt
+OCR_OUTPUT_FORMAT = os.getenv('OCR_OUTPUT_FORMAT', 'text').lower()
+
+# Per-document limits: with either set, every document is extracted in its own process,
+# which is killed when it runs longer than OCR_DOCUMENT_TIMEOUT seconds or uses more than
+# OCR_DOCUMENT_MAX_RSS_MB of memory (0 = no limit)
+OCR_DOCUMENT_TIMEOUT = float(os.getenv('OCR_DOCUMENT_TIMEOUT', '0'))
+OCR_DOCUMENT_MAX_RSS_MB = float(os.getenv('OCR_DOCUMENT_MAX_RSS_MB', '0'))
+OCR_ISOLATE_DOCUMENTS = OCR_DOCUMENT_TIMEOUT > 0 or OCR_DOCUMENT_MAX_RSS_MB > 0
+
+# OCR resolution (DPI) for a second attempt at documents stopped for time or memory (0 = no retry)
+OCR_RETRY_RESOLUTION = int(os.getenv('OCR_RETRY_RESOLUTION', '0'))
+
+# Seconds between checks on isolated workers
+ISOLATION_POLL_SECONDS = 0.5
+
+# Bump whenever a change to the extractors alters their output, so cached extractions are redone
+EXTRACTOR_VERSION = 5
+
 def log_verbose(message, level="info"):
     """Log message only if verbose mode is enabled"""
     if not VERBOSE and level != "error":
@@ -67,103 +137,28 @@ except Exception as e:
     log_verbose(f"Error configuring Tesseract: {e}", "warning")
     log_verbose("OCR functionality will be limited.", "warning")
 
-def is_garbage_line(line):
-    """Check if a line appears to be garbage/corrupted text from OCR errors."""
-    # Line is very short and not meaningful
-    if len(line.strip()) < 8:
-        return True
-
-    # Contains too many special characters or digits
-    if sum(c.isalnum() for c in line) / (len(line) + 1e-6) < 0.4:
-        return True
-
-    # Contains too many random capitalized words (common in OCR errors)
-    if len(re.findall(r'\b[A-Z]{2,}\b', line)) > 3:
-        return True
-
-    # Looks like a garbled line with mixed letters/digits/symbols
-    if re.search(r'[^\w\s]{2,}', line):
-        return True
-
-    return False
-
-def clean_text(text):
-    """Clean and normalize extracted text by removing common artifacts and formatting issues."""
-    if not text:
-        return ""
-    
-    # Remove page/slide numbers
-    text = re.sub(r'Page\s+\d+\s+of\s+\d+', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'Slide\s+\d+', '', text, flags=re.IGNORECASE)
-    
-    # Remove company watermarks (adjust pattern as needed)
-    text = re.sub(r'BAYANAT\s+\(?\d{4}\)?', '', text, flags=re.IGNORECASE)
-    
-    # Normalize whitespace
-    text = re.sub(r'\n{3,}', '\n\n', text)  # Replace 3+ newlines with 2
-    text = re.sub(r'\s{2,}', ' ', text)     # Replace multiple spaces with single space
-    
-    # Remove bullet points and numbering at start of lines
-    text = re.sub(r'^[\-\*\d\.\)]\s+', '', text, flags=re.MULTILINE)
-    
-    # Remove non-ASCII characters (keeping basic punctuation)
-    text = re.sub(r'[^\x00-\x7F]+', ' ', text)
-    
-    # Remove extra whitespace from line breaks
-    text = re.sub(r'\s*\n\s*', '\n', text)
-    
-    # Remove email addresses
-    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[email_redacted]', text)
-    
-     # Remove Table of Contents lines (based on dots and page numbers)
-    text = re.sub(r'\.{3,}\s*\d{1,3}', '', text)
-    
-    # Remove common confidential keywords
-    text = re.sub(r'Confidential!?|Internal Use Only|Draft Copy', '', text, flags=re.IGNORECASE)
-    
-     # Remove "Table of Contents" section titles
-    text = re.sub(r'Table of Contents', '', text, flags=re.IGNORECASE)
-    
-    # Filter out garbage lines using line-by-line analysis
-    lines = text.split('\n')
-    clean_lines = []
-    
-    for line in lines:
-        if not is_garbage_line(line):
-            clean_lines.append(line)
-        # Optional: Log removed garbage lines for debugging
-        # else:
-        #     print(f"🗑️ Removed garbage line: {line[:50]}...")
-    
-    text = '\n'.join(clean_lines)
-    
-    # Collapse multiple spaces and newlines
-    text = re.sub(r'\n{2,}', '\n', text)
-    text = re.sub(r'[ \t]{2,}', ' ', text)
-    
-    # Remove leading/trailing whitespace
-    return text.strip()
-
-def ocr_image(image: Image.Image):
+def _run_ocr(image, with_confidence=False):
+    empty = ("", 0.0) if with_confidence else ""
     if image is None:
         log_verbose("Skipped OCR: Invalid or None image input", "warning")
-        return ""
+        return empty
     
     try:
         # Check if tesseract is available
-        if not pytesseract.pytesseract.tesseract_cmd:
+        engine = get_ocr_engine(OCR_PSM)
+        if not engine.available:
             log_verbose("Skipped OCR: Tesseract not available", "warning")
-            return ""
+            return empty
         
         # Validate image dimensions
         if not hasattr(image, 'size') or len(image.size) != 2:
             log_verbose("Skipped OCR: Invalid image dimensions", "warning")
-            return ""
+            return empty
         
         width, height = image.size
         if width < 10 or height < 10:
             log_verbose("Skipped OCR: Image too small for text extraction", "warning")
-            return ""
+            return empty
         
         # Ensure image is in a compatible mode for OCR
         if image.mode not in ['RGB', 'L', 'RGBA']:
@@ -171,67 +166,285 @@ def ocr_image(image: Image.Image):
                 image = image.convert('RGB')
             except Exception as e:
                 log_verbose(f"Failed to convert image mode: {e}", "warning")
-                return ""
+                return empty
         
         # Perform OCR
-        result = pytesseract.image_to_string(image, config='--psm 6')
+        if with_confidence:
+            result, confidence = engine.image_to_text_and_confidence(image)
+            return result.strip(), confidence
+        result = engine.image_to_string(image)
         return result.strip()
         
     except Exception as e:
         log_verbose(f"OCR failed: {e}", "warning")
-        return ""
+        return empty
 
-def extract_pdf_ocr(path):
-    text_output = []
+def ocr_image(image: Image.Image):
+    return _run_ocr(image)
+
+def ocr_image_with_confidence(image: Image.Image):
+    """OCR an image and also return Tesseract's mean word confidence (0-100)."""
+    return _run_ocr(image, with_confidence=True)
+
+def _may_hold_table(page, page_num, planner=None):
+    """Cheap check before extract_tables.
+
+    pdfplumber's default table strategies build cells from the ruling edges of the
+    page's lines, rects and curves, so a page with fewer than two horizontal and two
+    vertical edges cannot hold a table. PDFium answers from the page's drawn paths
+    without the layout analysis pdfplumber would need to list them.
+    """
+    if planner is not None:
+        ruled = planner.may_hold_table(page_num)
+        if ruled is not None:
+            return ruled
+    if not (page.lines or page.rects or page.curves):
+        return False
+    horizontal = sum(1 for edge in page.edges if edge["orientation"] == "h")
+    return horizontal >= 2 and len(page.edges) - horizontal >= 2
+
+def _table_rows(table):
+    """Rows of an extracted table with cells stripped, dropping rows without content."""
+    rows = []
+    for row in table:
+        if row:
+            clean_row = [str(cell).strip() if cell else "" for cell in row]
+            if any(clean_row):  # Only add rows with content
+                rows.append(clean_row)
+    return rows
+
+def _extract_pdf_page_text(page, page_num, direct_text=None, tables=None, planner=None):
+    """Get a page's text from the PDF text layer, falling back to its tables.
+
+    Returns ``(page_text, method)``, the method being "direct", "table" or None when
+    the page gave no text.
+
+    ``direct_text`` is the page's text layer when the document was already parsed.
+    When ``tables`` is a list, every table found on the page is appended to it as
+    ``{"page": ..., "rows": [...]}``, also on pages whose text layer is enough.
+    ``planner`` (a PdfPagePlanner) provides the cheap table pre-check.
+    """
+    page_text = ""
+    method = None
     
+    # Try direct text extraction first
     try:
-        with pdfplumber.open(path) as pdf:
+        if direct_text is None:
+            direct_text = page.extract_text()
+        if direct_text and len(direct_text.strip()) > 10:
+            page_text = direct_text
+            method = "direct"
+    except Exception as e:
+        log_verbose(f"Failed direct text extraction on page {page_num + 1}: {e}", "warning")
+    
+    # Try table extraction if direct text is insufficient (or tables are saved on their own)
+    needs_table_text = not page_text or len(page_text.strip()) < 10
+    if needs_table_text or tables is not None:
+        try:
+            page_tables = []
+            if _may_hold_table(page, page_num, planner):
+                page_tables = [rows for rows in (_table_rows(table) for table in page.extract_tables() if table) if rows]
+            if tables is not None:
+                tables.extend({"page": page_num + 1, "rows": rows} for rows in page_tables)
+            if needs_table_text and page_tables:
+                page_text = "\n\n".join("\n".join(" | ".join(row) for row in rows) for rows in page_tables)
+                method = "table"
+        except Exception as e:
+            log_verbose(f"Failed table extraction on page {page_num + 1}: {e}", "warning")
+    
+    return page_text, method
+
+def _needs_pdf_page_ocr(page_text):
+    """OCR fallback is used only if tesseract is available and no text was found."""
+    return (not page_text or len(page_text.strip()) < 10) and get_ocr_engine(OCR_PSM).available
+
+def _ocr_pdf_page(page, page_num):
+    """Render a PDF page and OCR it."""
+    try:
+        log_verbose(f"Using OCR for page {page_num + 1} (low/no text content detected)", "process")
+        if OCR_ADAPTIVE_DPI:
+            return _ocr_pdf_page_adaptive(page, page_num)
+        image = page.to_image(resolution=OCR_RESOLUTION).original
+        if image is not None:
+            return ocr_image(image)
+    except Exception as e:
+        log_verbose(f"Failed to convert PDF page {page_num + 1} to image: {e}", "warning")
+    return ""
+
+def _ocr_pdf_page_adaptive(page, page_num):
+    """OCR at a low DPI first and re-render at OCR_RESOLUTION only if Tesseract is unsure."""
+    resolutions = sorted({min(OCR_MIN_RESOLUTION, OCR_RESOLUTION), OCR_RESOLUTION})
+    best_text, best_confidence, best_resolution = "", -1.0, resolutions[0]
+    
+    for resolution in resolutions:
+        image = page.to_image(resolution=resolution).original
+        if image is None:
+            continue
+        text, confidence = ocr_image_with_confidence(image)
+        del image
+        
+        if confidence > best_confidence:
+            best_text, best_confidence, best_resolution = text, confidence, resolution
+        if confidence >= OCR_CONFIDENCE_THRESHOLD:
+            break
+        if resolution != resolutions[-1]:
+            log_verbose(f"Page {page_num + 1}: confidence {confidence:.1f} at {resolution} DPI is below {OCR_CONFIDENCE_THRESHOLD}, re-rendering", "debug")
+    
+    log_verbose(f"Page {page_num + 1}: OCR at {best_resolution} DPI, mean confidence {max(best_confidence, 0.0):.1f}", "info")
+    return best_text
+
+def _pick_ocr_text(page_text, method, ocr_text):
+    """Keep the OCR result only if it found more text than the text layer. Returns (text, method)."""
+    if ocr_text and len(ocr_text.strip()) > len(page_text.strip()):
+        return ocr_text, "ocr"
+    return page_text, method
+
+# Each page worker keeps its own handle on the PDF it is rasterizing
+_page_worker_pdf = None
+
+def _init_pdf_page_worker(path, data=None):
+    """Open the PDF once per page worker instead of once per page.
+
+    ``data`` is the content of a PDF inside an archive, handed over so that no worker
+    decompresses the member again.
+    """
+    global _page_worker_pdf
+    # Tesseract would otherwise start one thread per core in every worker
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    _page_worker_pdf = pdfplumber.open(BytesIO(data) if data is not None else path)
+
+def _release_pdf_page(page):
+    """Drop a page's parsed layout objects so long documents do not accumulate them."""
+    try:
+        if hasattr(page, 'close'):
+            page.close()
+        else:
+            page.flush_cache()
+    except Exception as e:
+        log_verbose(f"Failed to release PDF page cache: {e}", "debug")
+
+def _ocr_pdf_page_worker(page_num):
+    """Render and OCR one page inside a page worker. Returns (text, seconds)."""
+    start_time = time.time()
+    page = _page_worker_pdf.pages[page_num]
+    try:
+        return _ocr_pdf_page(page, page_num), time.time() - start_time
+    finally:
+        _release_pdf_page(page)
+
+def _pdf_direct_texts(parsed, page_count):
+    """Per-page text layer from a parsed document, if it matches the PDF being read."""
+    if parsed and parsed.get("method") == "pdfplumber" and len(parsed["pages"]) == page_count:
+        return parsed["pages"]
+    return [None] * page_count
+
+def _read_pdf_page(planner, page, page_num, tables=None):
+    """Read one page the way the planner routes it. Returns (page_text, method, needs_ocr)."""
+    route, direct_text = planner.plan(page_num)
+    if route == "blank":
+        return "", None, False
+    if route == "scanned":
+        return "", None, _needs_pdf_page_ocr("")
+    page_text, method = _extract_pdf_page_text(page, page_num, direct_text, tables, planner)
+    return page_text, method, _needs_pdf_page_ocr(page_text)
+
+def _log_pdf_routes(path, planner):
+    if planner.backend == "auto":
+        routes = ", ".join(f"{route}: {count}" for route, count in sorted(planner.routes.items()))
+        log_verbose(f"{Path(path).name} pages by route - {routes}", "info")
+
+def iter_pdf_pages(path, page_workers=None, parsed=None, tables=None):
+    """Yield (page_num, page_text, details) for every page of a PDF, in page order.
+
+    The text layer is read in this process by the PDF_TEXT_BACKEND backend (see
+    pdf_backends.py; pdfplumber text is taken from ``parsed`` when the inspection
+    step already read it), falling back to pdfplumber's tables. Pages that need OCR are
+    rendered and recognised by ``page_workers`` processes (defaults to the
+    OCR_PAGE_WORKERS setting). At most ``page_workers`` pages are rasterized at
+    once, and only a small window of finished pages is held back while waiting
+    for an earlier page's OCR result. Each page's cached layout objects are
+    released as soon as the page has been read. Tables found along the way are
+    appended to ``tables`` when a list is given.
+
+    ``details`` holds the page's extraction ``method`` ("direct", "table", "ocr" or
+    "blank") and the ``seconds`` spent reading and recognising it.
+    """
+    if page_workers is None:
+        page_workers = OCR_PAGE_WORKERS
+    page_workers = resolve_worker_count(page_workers)
+    
+    with pdfplumber.open(document_input(path)) as pdf, \
+            PdfPagePlanner(path, parsed_pages=_pdf_direct_texts(parsed, len(pdf.pages))) as planner:
+        if page_workers <= 1:
             for page_num, page in enumerate(pdf.pages):
-                page_text = ""
-                
-                # Try direct text extraction first
+                start_time = time.time()
+                page_text, method, needs_ocr = _read_pdf_page(planner, page, page_num, tables)
+                if needs_ocr:
+                    page_text, method = _pick_ocr_text(page_text, method, _ocr_pdf_page(page, page_num))
+                _release_pdf_page(page)
+                yield page_num, page_text, {"method": method or "blank", "seconds": time.time() - start_time}
+            _log_pdf_routes(path, planner)
+            return
+        
+        executor = None
+        pending = deque()  # (page_num, page_text, method, seconds, OCR future or None), in page order
+        max_pending = page_workers * 4
+        
+        def finish_head():
+            page_num, page_text, method, seconds, future = pending.popleft()
+            if future is not None:
                 try:
-                    direct_text = page.extract_text()
-                    if direct_text and len(direct_text.strip()) > 10:
-                        page_text = direct_text
+                    ocr_text, ocr_seconds = future.result()
+                    page_text, method = _pick_ocr_text(page_text, method, ocr_text)
+                    seconds += ocr_seconds
                 except Exception as e:
-                    log_verbose(f"Failed direct text extraction on page {page_num + 1}: {e}", "warning")
-                
-                # Try table extraction if direct text is insufficient
-                if not page_text or len(page_text.strip()) < 10:
-                    try:
-                        tables = page.extract_tables()
-                        if tables:
-                            table_texts = []
-                            for table in tables:
-                                if table:
-                                    table_rows = []
-                                    for row in table:
-                                        if row:
-                                            clean_row = [str(cell).strip() if cell else "" for cell in row]
-                                            if any(clean_row):  # Only add rows with content
-                                                table_rows.append(" | ".join(clean_row))
-                                    if table_rows:
-                                        table_texts.append("\n".join(table_rows))
-                            if table_texts:
-                                page_text = "\n\n".join(table_texts)
-                    except Exception as e:
-                        log_verbose(f"Failed table extraction on page {page_num + 1}: {e}", "warning")
-                
-                # OCR fallback (only if tesseract is available and no text was found)
-                if (not page_text or len(page_text.strip()) < 10) and pytesseract.pytesseract.tesseract_cmd:
-                    try:
-                        log_verbose(f"Using OCR for page {page_num + 1} (low/no text content detected)", "process")
-                        image = page.to_image(resolution=300).original
-                        if image is not None:
-                            ocr_text = ocr_image(image)
-                            if ocr_text and len(ocr_text.strip()) > len(page_text.strip()):
-                                page_text = ocr_text
-                    except Exception as e:
-                        log_verbose(f"Failed to convert PDF page {page_num + 1} to image: {e}", "warning")
+                    log_verbose(f"OCR worker failed on page {page_num + 1}: {e}", "warning")
+            return page_num, page_text, {"method": method or "blank", "seconds": seconds}
+        
+        try:
+            for page_num, page in enumerate(pdf.pages):
+                start_time = time.time()
+                page_text, method, needs_ocr = _read_pdf_page(planner, page, page_num, tables)
+                _release_pdf_page(page)
+                future = None
+                if needs_ocr:
+                    if executor is None:
+                        log_verbose(f"Starting {page_workers} OCR page workers for {Path(path).name}", "process")
+                        executor = concurrent.futures.ProcessPoolExecutor(
+                            max_workers=page_workers,
+                            initializer=_init_pdf_page_worker,
+                            initargs=(str(path), read_member(path) if is_member_path(path) else None)
+                        )
+                    future = executor.submit(_ocr_pdf_page_worker, page_num)
+                pending.append((page_num, page_text, method, time.time() - start_time, future))
                 
-                if page_text:
-                    text_output.append(page_text)
+                # Release pages that are ready, and wait if too many are queued behind a slow one
+                while pending and (pending[0][4] is None or pending[0][4].done() or len(pending) > max_pending):
+                    yield finish_head()
+            
+            while pending:
+                yield finish_head()
+            _log_pdf_routes(path, planner)
+        finally:
+            if executor is not None:
+                for *_, future in pending:
+                    if future is not None:
+                        future.cancel()
+                executor.shutdown()
+
+def iter_pdf_units(path, parsed=None, tables=None):
+    """Yield one unit per PDF page that has text (see iter_document_units)."""
+    for page_num, page_text, details in iter_pdf_pages(path, parsed=parsed, tables=tables):
+        if page_text:
+            yield dict(details, unit="page", index=page_num + 1, text=page_text)
+
+def extract_pdf_ocr(path, parsed=None, tables=None):
+    text_output = []
+    
+    try:
+        for page_num, page_text, _ in iter_pdf_pages(path, parsed=parsed, tables=tables):
+            if page_text:
+                text_output.append(page_text)
                     
     except Exception as e:
         log_verbose(f"Failed to process PDF: {e}", "error")
@@ -239,263 +452,241 @@ def extract_pdf_ocr(path):
     
     return "\n\n".join(text_output).strip()
 
-def extract_docx_ocr(path):
-    doc = Document(path)
-    all_text = []
+class StreamingTextWriter:
+    """Write text to a file piece by piece, tracking the statistics of what was written.
+
+    Leading and trailing whitespace of the whole output is dropped, matching the
+    ``.strip()`` applied when the text is built in memory.
+    """
     
-    # Extract text from paragraphs
-    paragraphs = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-    if paragraphs:
-        all_text.extend(paragraphs)
+    def __init__(self, output_file):
+        self.output_file = Path(output_file)
+        self.file = None
+        self.pending_whitespace = ""
+        self.word_count = 0
+        self.char_count = 0
+        self.preview = ""
+        self.ends_in_word = False
     
-    # Extract text from tables
-    try:
-        for table in doc.tables:
-            table_text = []
-            for row in table.rows:
-                row_text = []
-                for cell in row.cells:
-                    cell_text = cell.text.strip()
-                    if cell_text:
-                        row_text.append(cell_text)
-                if row_text:
-                    table_text.append(" | ".join(row_text))
-            if table_text:
-                all_text.append("\n".join(table_text))
-    except Exception as e:
-        log_verbose(f"Failed to extract table content: {e}", "warning")
+    def __enter__(self):
+        self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.output_file, 'w', encoding='utf-8')
+        return self
     
-    # Extract text from headers
-    try:
-        for section in doc.sections:
-            if section.header:
-                header_text = []
-                for paragraph in section.header.paragraphs:
-                    if paragraph.text.strip():
-                        header_text.append(paragraph.text.strip())
-                if header_text:
-                    all_text.extend(header_text)
-    except Exception as e:
-        log_verbose(f"Failed to extract header content: {e}", "warning")
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        return False
+    
+    def write(self, text):
+        if not text:
+            return
+        if self.char_count == 0:
+            text = text.lstrip()
+        body = text.rstrip()
+        if not body:
+            self.pending_whitespace += text
+            return
+        
+        chunk = self.pending_whitespace + body
+        self.pending_whitespace = text[len(body):]
+        
+        words = len(chunk.split())
+        if self.ends_in_word and not chunk[0].isspace():
+            words -= 1  # The first word continues the previous write
+        self.word_count += words
+        self.char_count += len(chunk)
+        self.ends_in_word = True
+        if len(self.preview) <= 200:
+            self.preview += chunk[:201 - len(self.preview)]
+        
+        self.file.write(chunk)
+    
+    def stats(self):
+        preview = self.preview[:200] + "..." if self.char_count > 200 else self.preview
+        return {
+            "word_count": self.word_count,
+            "char_count": self.char_count,
+            "preview": preview
+        }
+
+def stream_text_to_file(pieces, output_file):
+    """Clean (when CLEAN_EXTRACTED_TEXT is on) and write text pieces straight into output_file.
+
+    Only the current piece (plus the rolling clean window) is kept in memory. The first
+    piece must already be stripped of leading whitespace, as the in-memory path strips
+    the whole text before cleaning. Returns the written text's statistics, or None if
+    no text was produced.
+    """
+    cleaner = TextCleaner(OCR_CLEAN_WINDOW_CHARS) if CLEAN_EXTRACTED_TEXT else None
+    writer = StreamingTextWriter(output_file)
     
-    # Extract text from footers
+    with writer:
+        for piece in pieces:
+            if cleaner is None:
+                writer.write(piece)
+            else:
+                writer.write(cleaner.feed(piece))
+        
+        if cleaner is not None:
+            writer.write(cleaner.finish())
+    
+    if writer.char_count == 0:
+        Path(output_file).unlink(missing_ok=True)
+        return None
+    return writer.stats()
+
+def _pdf_pieces(path, parsed=None, tables=None):
+    """A PDF's page texts joined by blank lines, as the in-memory path joins them."""
+    separator = None
+    for page_num, page_text, _ in iter_pdf_pages(path, parsed=parsed, tables=tables):
+        if not page_text:
+            continue
+        yield page_text.lstrip() if separator is None else separator + page_text
+        separator = "\n\n"
+
+def stream_pdf_to_file(path, output_file, parsed=None, tables=None):
+    """Extract a PDF straight into output_file one page at a time."""
     try:
-        for section in doc.sections:
-            if section.footer:
-                footer_text = []
-                for paragraph in section.footer.paragraphs:
-                    if paragraph.text.strip():
-                        footer_text.append(paragraph.text.strip())
-                if footer_text:
-                    all_text.extend(footer_text)
+        return stream_text_to_file(_pdf_pieces(path, parsed, tables), output_file)
     except Exception as e:
-        log_verbose(f"Failed to extract footer content: {e}", "warning")
-    
-    # Extract text from text boxes and shapes
+        log_verbose(f"Failed to process PDF: {e}", "error")
+        Path(output_file).unlink(missing_ok=True)
+        return None
+
+def _txt_pieces(path):
+    """A TXT file's blocks, with the leading whitespace of the file dropped."""
+    started = False
+    for block in iter_txt_blocks(path):
+        if not started:
+            block = block.lstrip()
+            started = bool(block)
+        yield block
+
+def stream_txt_to_file(path, output_file):
+    """Decode, clean and write a TXT file one block at a time, whatever its size."""
     try:
-        # This requires accessing the document's XML structure
-        from docx.oxml.ns import qn
-        from docx.oxml import parse_xml
-        
-        # Get all text from text boxes and shapes in the document
-        for element in doc.element.iter():
-            if element.tag.endswith('}t'):  # Text elements
-                if element.text and element.text.strip():
-                    # Check if this text is not already captured in paragraphs/tables
-                    text = element.text.strip()
-                    if text not in " ".join(all_text):
-                        all_text.append(text)
+        return stream_text_to_file(_txt_pieces(path), output_file)
     except Exception as e:
-        log_verbose(f"Failed to extract text from shapes/textboxes: {e}", "warning")
+        log_verbose(f"Failed to read {Path(path).name}: {e}", "error")
+        Path(output_file).unlink(missing_ok=True)
+        return None
+
+def ocr_embedded_image(image_data):
+    """OCR an image embedded in a DOCX/PPTX file; returns "" for images that cannot hold text."""
+    # Try to open the image
+    image = Image.open(BytesIO(image_data))
     
-    # Combine all extracted text
-    full_text = "\n".join(all_text)
+    # Validate image format and size
+    if image.format == 'WMF':
+        # WMF files are vector format, not suitable for OCR - skip silently
+        return ""
+    elif image.format not in ['JPEG', 'PNG', 'BMP', 'TIFF', 'GIF']:
+        log_verbose(f"Skipping unsupported image format: {image.format}", "warning")
+        return ""
+    
+    if image.size[0] < 50 or image.size[1] < 50:  # Skip very small images
+        return ""
+    
+    # Convert to RGB if necessary (for OCR compatibility)
+    if image.mode not in ['RGB', 'L']:
+        image = image.convert('RGB')
+    
+    return ocr_image(image)
+
+# OCR text of embedded images shared by every document this process handles
+# (only used when OCR_IMAGE_CACHE_SCOPE=corpus)
+_corpus_image_texts = {}
+
+def new_image_cache():
+    """Image OCR cache for one document, backed by the corpus-wide texts when enabled."""
+    if OCR_IMAGE_CACHE_SCOPE == 'corpus':
+        return ImageOCRCache(_corpus_image_texts)
+    return ImageOCRCache()
+
+def iter_docx_units(path, image_cache=None, parsed=None):
+    """Yield the DOCX text as one unit, then one unit per embedded image OCR read text from."""
+    if image_cache is None:
+        image_cache = new_image_cache()
+    start_time = time.time()
+    if parsed is None:
+        parsed = parse_docx(path)
+    
+    # Body paragraphs, tables and text boxes in document order, then headers and footers
+    yield {"unit": "document", "index": 1, "method": "direct", "seconds": time.time() - start_time,
+           "text": "\n".join(docx_text_blocks(parsed))}
     
     # OCR embedded images (e.g., scanned documents in .docx)
     try:
-        if hasattr(doc.part, '_rels') and doc.part._rels:
-            for rel_id in doc.part._rels:
-                rel = doc.part._rels[rel_id]
-                if hasattr(rel, 'target_ref') and "image" in rel.target_ref:
+        if parsed["images"]:
+            with PackageImages(path) as images:
+                for image_num, part_name in enumerate(parsed["images"], 1):
+                    start_time = time.time()
                     try:
-                        if not hasattr(rel, 'target_part') or rel.target_part is None:
-                            continue
-                        
-                        image_data = rel.target_part.blob
-                        if not image_data or len(image_data) == 0:
-                            continue
-                        
-                        # Try to open the image
-                        image = Image.open(BytesIO(image_data))
-                        
-                        # Validate image format and size
-                        if image.format == 'WMF':
-                            # WMF files are vector format, not suitable for OCR - skip silently
-                            continue
-                        elif image.format not in ['JPEG', 'PNG', 'BMP', 'TIFF', 'GIF']:
-                            log_verbose(f"Skipping unsupported image format: {image.format}", "warning")
-                            continue
-                        
-                        if image.size[0] < 50 or image.size[1] < 50:  # Skip very small images
+                        image_data = images.read(part_name)
+                        if not image_data:
                             continue
                         
-                        # Convert to RGB if necessary (for OCR compatibility)
-                        if image.mode not in ['RGB', 'L']:
-                            image = image.convert('RGB')
-                        
-                        ocr_text = ocr_image(image)
-                        if ocr_text and ocr_text.strip():
-                            full_text += "\n" + ocr_text.strip()
-                            
+                        ocr_text = image_cache.ocr(image_data, ocr_embedded_image)
                     except Exception as e:
                         log_verbose(f"Failed to extract image from DOCX: {e}", "warning")
                         continue
+                    
+                    if ocr_text and ocr_text.strip():
+                        yield {"unit": "image", "index": image_num, "method": "ocr",
+                               "seconds": time.time() - start_time, "text": ocr_text.strip()}
     except Exception as e:
         log_verbose(f"Failed to process DOCX images: {e}", "warning")
-    
-    return full_text.strip()
 
-def extract_pptx_ocr(path):
-    try:
-        prs = Presentation(path)
-        all_texts = []
+def extract_docx_ocr(path, image_cache=None, parsed=None):
+    return "\n".join(unit["text"] for unit in iter_docx_units(path, image_cache, parsed)).strip()
 
-        for slide_num, slide in enumerate(prs.slides):
+def iter_pptx_units(path, image_cache=None, parsed=None):
+    """Yield one unit per slide that has text: its text items and image OCR, one per line."""
+    if image_cache is None:
+        image_cache = new_image_cache()
+    if parsed is None:
+        parsed = parse_pptx(path)
+
+    with PackageImages(path) as images:
+        for slide_num, items in enumerate(parsed["slides"]):
+            start_time = time.time()
             slide_texts = []
+            methods = set()
             
-            # Extract text from all shapes with comprehensive approach
-            for shape in slide.shapes:
+            for item in items:
+                if item["kind"] != "image":
+                    slide_texts.append(item["text"])
+                    methods.add("direct")
+                    continue
+                
+                # Picture/Image - OCR
                 try:
-                    # Approach 1: Direct text extraction (works for most text shapes)
-                    if hasattr(shape, "text") and shape.text and shape.text.strip():
-                        slide_texts.append(shape.text.strip())
+                    image_stream = images.read(item["part"])
+                    if not image_stream:
                         continue
                     
-                    # Approach 2: Text frame extraction (backup method)
-                    if hasattr(shape, "text_frame") and shape.text_frame:
-                        try:
-                            if hasattr(shape.text_frame, "text") and shape.text_frame.text.strip():
-                                slide_texts.append(shape.text_frame.text.strip())
-                                continue
-                            
-                            # Extract from individual paragraphs in text frame
-                            paragraph_texts = []
-                            for paragraph in shape.text_frame.paragraphs:
-                                if paragraph.text and paragraph.text.strip():
-                                    paragraph_texts.append(paragraph.text.strip())
-                            if paragraph_texts:
-                                slide_texts.append("\n".join(paragraph_texts))
-                                continue
-                        except:
-                            pass
-                    
-                    # Approach 3: Handle specific shape types
-                    if shape.shape_type == 19:  # MSO_SHAPE_TYPE.TABLE
-                        try:
-                            if hasattr(shape, "table") and shape.table:
-                                table_text = []
-                                for row in shape.table.rows:
-                                    row_text = []
-                                    for cell in row.cells:
-                                        if cell.text and cell.text.strip():
-                                            row_text.append(cell.text.strip())
-                                    if row_text:
-                                        table_text.append(" | ".join(row_text))
-                                if table_text:
-                                    slide_texts.append("\n".join(table_text))
-                                    continue
-                        except Exception as table_e:
-                            log_verbose(f"Failed to extract table from slide {slide_num + 1}: {table_e}", "warning")
-                    
-                    elif shape.shape_type == 6:  # MSO_SHAPE_TYPE.GROUP
-                        try:
-                            if hasattr(shape, 'shapes'):  # Group shape
-                                group_texts = []
-                                for grouped_shape in shape.shapes:
-                                    # Try multiple methods for grouped shapes
-                                    group_text = None
-                                    
-                                    # Method 1: Direct text
-                                    if hasattr(grouped_shape, "text") and grouped_shape.text and grouped_shape.text.strip():
-                                        group_text = grouped_shape.text.strip()
-                                    # Method 2: Text frame
-                                    elif hasattr(grouped_shape, "text_frame") and grouped_shape.text_frame:
-                                        if hasattr(grouped_shape.text_frame, "text") and grouped_shape.text_frame.text.strip():
-                                            group_text = grouped_shape.text_frame.text.strip()
-                                        else:
-                                            # Method 3: Individual paragraphs in text frame
-                                            para_texts = []
-                                            try:
-                                                for para in grouped_shape.text_frame.paragraphs:
-                                                    if para.text and para.text.strip():
-                                                        para_texts.append(para.text.strip())
-                                                if para_texts:
-                                                    group_text = "\n".join(para_texts)
-                                            except:
-                                                pass
-                                    
-                                    if group_text:
-                                        group_texts.append(group_text)
-                                
-                                if group_texts:
-                                    slide_texts.append("\n".join(group_texts))
-                                    continue
-                        except Exception as group_e:
-                            log_verbose(f"Failed to extract text from grouped shapes in slide {slide_num + 1}: {group_e}", "warning")
-                    
-                    elif shape.shape_type == 13:  # Picture/Image - OCR
-                        try:
-                            # Check if shape actually has an image
-                            if not hasattr(shape, 'image') or shape.image is None:
-                                continue
-                            
-                            image_stream = shape.image.blob
-                            if not image_stream or len(image_stream) == 0:
-                                continue
-                            
-                            # Try to open the image
-                            image = Image.open(BytesIO(image_stream))
-                            
-                            # Validate image format and size
-                            if image.format == 'WMF':
-                                # WMF files are vector format, not suitable for OCR - skip silently
-                                continue
-                            elif image.format not in ['JPEG', 'PNG', 'BMP', 'TIFF', 'GIF']:
-                                log_verbose(f"Skipping unsupported image format: {image.format}", "warning")
-                                continue
-                            
-                            if image.size[0] < 50 or image.size[1] < 50:  # Skip very small images
-                                continue
-                            
-                            # Convert to RGB if necessary (for OCR compatibility)
-                            if image.mode not in ['RGB', 'L']:
-                                image = image.convert('RGB')
-                            
-                            ocr_text = ocr_image(image)
-                            if ocr_text and ocr_text.strip():
-                                slide_texts.append(f"[Image OCR]: {ocr_text.strip()}")
-                                
-                        except AttributeError:
-                            # Shape doesn't have image attribute
-                            continue
-                        except Exception as e:
-                            log_verbose(f"Failed to extract image from slide {slide_num + 1}: {e}", "warning")
-                            continue
-                
-                except AttributeError as attr_e:
-                    # Shape doesn't have expected attributes - this is normal, skip silently
-                    continue
+                    ocr_text = image_cache.ocr(image_stream, ocr_embedded_image)
+                    if ocr_text and ocr_text.strip():
+                        slide_texts.append(f"[Image OCR]: {ocr_text.strip()}")
+                        methods.add("ocr")
                 except Exception as e:
-                    # Only log unexpected errors
-                    if "shape does not contain a table" not in str(e):
-                        log_verbose(f"Failed to process shape in slide {slide_num + 1}: {e}", "warning")
+                    log_verbose(f"Failed to extract image from slide {slide_num + 1}: {e}", "warning")
                     continue
             
             # Add slide content if any text was found
             if slide_texts:
-                slide_content = f"--- Slide {slide_num + 1} ---\n" + "\n".join(slide_texts)
-                all_texts.append(slide_content)
-        
+                yield {"unit": "slide", "index": slide_num + 1,
+                       "method": methods.pop() if len(methods) == 1 else "mixed",
+                       "seconds": time.time() - start_time, "text": "\n".join(slide_texts)}
+
+def unit_heading(unit):
+    """Line put before a unit's text in the ``_extracted.txt`` file ("--- Slide N ---"), or ""."""
+    return f"--- Slide {unit['index']} ---" if unit["unit"] == "slide" else ""
+
+def extract_pptx_ocr(path, image_cache=None, parsed=None):
+    try:
+        all_texts = [unit_heading(unit) + "\n" + unit["text"]
+                     for unit in iter_pptx_units(path, image_cache, parsed)]
         return "\n\n".join(all_texts).strip()
         
     except Exception as e:
@@ -504,37 +695,271 @@ def extract_pptx_ocr(path):
 
 def extract_txt(path):
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read().strip()
-    except:
-        return ""  # fallback to OCR only if needed
+        return "".join(iter_txt_blocks(path)).strip()
+    except (OSError, LookupError) as e:
+        log_verbose(f"Failed to read {Path(path).name}: {e}", "error")
+        return ""
+
+def iter_txt_units(path):
+    """Yield a TXT file as blocks of about TXT_BLOCK_CHARS characters, cut at blank lines where possible."""
+    start_time = time.time()
+    index = 0
+    buffer = ""
+    for block in iter_txt_blocks(path):
+        buffer += block
+        if len(buffer) < TXT_BLOCK_CHARS:
+            continue
+        cut = buffer.rfind("\n\n")
+        if cut <= 0:
+            cut = buffer.rfind("\n")
+        if cut <= 0:
+            cut = len(buffer)
+        index += 1
+        yield {"unit": "block", "index": index, "method": "direct", "seconds": time.time() - start_time, "text": buffer[:cut]}
+        buffer = buffer[cut:]
+        start_time = time.time()
+    if buffer or index == 0:
+        yield {"unit": "block", "index": index + 1, "method": "direct", "seconds": time.time() - start_time, "text": buffer}
+
+def iter_document_units(file_path, image_cache=None, parsed=None, tables=None):
+    """Yield a document's text unit by unit, in document order.
 
-def extract_text_from_any_file(file_path):
+    Units are PDF pages, PPTX slides, TXT blocks, or the whole DOCX text followed by one
+    unit per OCRed DOCX image. Each is a dict with ``unit`` ("page", "slide", "block",
+    "document" or "image"), its 1-based ``index``, the extraction ``method`` ("direct", "table",
+    "ocr" or "mixed"), the ``seconds`` it took and its raw ``text``.
+    """
+    file_path = Path(file_path)
+    ext = file_path.suffix.lower()
+    if ext == ".pdf":
+        yield from iter_pdf_units(file_path, parsed, tables)
+    elif ext == ".docx":
+        yield from iter_docx_units(file_path, image_cache, parsed)
+    elif ext == ".pptx":
+        yield from iter_pptx_units(file_path, image_cache, parsed)
+    elif ext == ".txt":
+        yield from iter_txt_units(file_path)
+
+def extract_text_from_any_file(file_path, image_cache=None, parsed=None, tables=None):
     ext = file_path.suffix.lower()
 
     if ext == ".pdf":
-        return extract_pdf_ocr(file_path)
+        return extract_pdf_ocr(file_path, parsed, tables)
     elif ext == ".docx":
-        return extract_docx_ocr(file_path)
+        return extract_docx_ocr(file_path, image_cache, parsed)
     elif ext == ".pptx":
-        return extract_pptx_ocr(file_path)
+        return extract_pptx_ocr(file_path, image_cache, parsed)
     elif ext == ".txt":
         return extract_txt(file_path)
     else:
         return None
 
-def save_extracted_text(file_path, extracted_text, output_folder="./output/ocr_extracted"):
-    """Save extracted text to a file in the output folder."""
-    if not extracted_text or not extracted_text.strip():
+def output_stem(file_path, data_root=None):
+    """Name the output files of a document are built from.
+
+    Documents directly in ``data_root`` (or without one) keep their stem; documents in
+    its subfolders or archives get their relative folders prepended, joined by ``__``
+    (``data/a/report.pdf`` -> ``a__report``), so equally named documents don't share
+    output files.
+    """
+    file_path = Path(file_path)
+    if data_root is not None:
+        try:
+            folders = file_path.parent.relative_to(data_root).parts
+        except ValueError:
+            folders = ()
+        if folders:
+            return "__".join(folders + (file_path.stem,))
+    return file_path.stem
+
+def get_output_file_path(file_path, output_folder, data_root=None):
+    """Path of the text file written for an input document (same name but with .txt extension)."""
+    return Path(output_folder) / f"{output_stem(file_path, data_root)}_extracted.txt"
+
+def get_structured_file_path(file_path, output_folder, data_root=None):
+    """Path of the JSONL unit records written next to a document's text file."""
+    return Path(output_folder) / f"{output_stem(file_path, data_root)}_extracted.jsonl"
+
+def _unit_record(unit, start, end):
+    """Record for one extracted unit, without its text or document name (records are shared by identical files)."""
+    return {
+        "unit": unit["unit"],
+        "index": unit["index"],
+        "method": unit["method"],
+        "start": start,
+        "end": end,
+        "seconds": round(unit["seconds"], 3)
+    }
+
+def write_structured_text(file_path, units, output_folder="./output/ocr_extracted", data_root=None):
+    """Write a document's units as ``<name>_extracted.jsonl`` along with its ``_extracted.txt``.
+
+    Each unit is cleaned on its own (when CLEAN_EXTRACTED_TEXT is on) and units left
+    empty are dropped. The text file holds the unit texts separated by blank lines, each
+    after its ``unit_heading`` as in the other output modes, and ``start``/``end`` of
+    every record are the offsets of the unit's text in it. Both files
+    are written one unit at a time. Returns the text statistics with the records
+    (without text) under ``units``, or None if no text was produced.
+    """
+    text_file = get_output_file_path(file_path, output_folder, data_root)
+    structured_file = get_structured_file_path(file_path, output_folder, data_root)
+    writer = StreamingTextWriter(text_file)
+    document = Path(file_path).name
+    records = []
+    
+    try:
+        with writer, open(structured_file, 'w', encoding='utf-8') as f:
+            for unit in units:
+                text = clean_text(unit["text"]) if CLEAN_EXTRACTED_TEXT else unit["text"]
+                text = text.strip()
+                if not text:
+                    continue
+                
+                separator = "\n\n" if records else ""
+                heading = unit_heading(unit)
+                if heading and CLEAN_EXTRACTED_TEXT:
+                    heading = clean_text(heading).strip()
+                if heading:
+                    separator += heading + "\n"
+                start = writer.char_count + len(separator)
+                writer.write(separator + text)
+                record = _unit_record(unit, start, writer.char_count)
+                f.write(json.dumps(dict({"document": document}, **record, text=text), ensure_ascii=False) + "\n")
+                records.append(record)
+    except Exception as e:
+        log_verbose(f"Failed to extract {Path(file_path).name}: {e}", "error")
+        records = []
+    
+    if not records:
+        text_file.unlink(missing_ok=True)
+        structured_file.unlink(missing_ok=True)
         return None
+    return dict(writer.stats(), units=records)
+
+def restore_structured_file(file_path, text_file, records, output_folder="./output/ocr_extracted", data_root=None):
+    """Rebuild the JSONL unit records of a cached extraction from its restored text file."""
+    with open(text_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    document = Path(file_path).name
+    structured_file = get_structured_file_path(file_path, output_folder, data_root)
+    with open(structured_file, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(dict({"document": document}, **record, text=text[record["start"]:record["end"]]),
+                               ensure_ascii=False) + "\n")
+    return str(structured_file)
+
+def _markdown_cell(cell):
+    return cell.replace("|", "\\|").replace("\n", "<br>")
+
+def table_to_markdown(rows):
+    """Render table rows as a Markdown table, the first row being the header."""
+    width = max(len(row) for row in rows)
+    rows = [[_markdown_cell(cell) for cell in row] + [""] * (width - len(row)) for row in rows]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + " --- |" * width]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+    return "\n".join(lines)
+
+def write_table_files(file_path, tables, output_folder="./output/ocr_extracted", data_root=None):
+    """Save a document's tables as Markdown and/or CSV side files (OCR_TABLE_FILES).
+
+    Files go to ``<output_folder>/tables``: ``<name>_tables.md`` holds every table of
+    the document and ``<name>_page<N>_table<M>.csv`` one table each. Files from an
+    earlier run of the same document are replaced. Returns the paths written.
+    """
+    if OCR_TABLE_FILES not in ("markdown", "csv", "both"):
+        return []
+    
+    table_folder = Path(output_folder) / "tables"
+    stem = output_stem(file_path, data_root)
+    markdown_file = table_folder / f"{stem}_tables.md"
+    for old_file in table_folder.glob(f"{glob.escape(stem)}_page*_table*.csv"):
+        old_file.unlink(missing_ok=True)
+    markdown_file.unlink(missing_ok=True)
+    if not tables:
+        return []
+    
+    table_folder.mkdir(parents=True, exist_ok=True)
+    written = []
+    numbered = []
+    page_tables = {}
+    for table in tables:
+        page_tables[table["page"]] = page_tables.get(table["page"], 0) + 1
+        numbered.append((table["page"], page_tables[table["page"]], table["rows"]))
+    
+    if OCR_TABLE_FILES in ("markdown", "both"):
+        sections = [f"# Tables from {Path(file_path).name}"]
+        for page, number, rows in numbered:
+            sections.append(f"## Page {page}, table {number}\n\n{table_to_markdown(rows)}")
+        with open(markdown_file, 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(sections) + "\n")
+        written.append(str(markdown_file))
+    
+    if OCR_TABLE_FILES in ("csv", "both"):
+        for page, number, rows in numbered:
+            csv_file = table_folder / f"{stem}_page{page}_table{number}.csv"
+            with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+                csv.writer(f).writerows(rows)
+            written.append(str(csv_file))
     
-    # Apply cleaning only if enabled in environment settings
+    log_verbose(f"Saved {len(tables)} tables from {Path(file_path).name} to {table_folder}", "success")
+    return written
+
+def extraction_settings():
+    """Settings that change the extracted text; they are part of every extraction cache key."""
+    engine = get_ocr_engine(OCR_PSM)
+    return {
+        "extractor_version": EXTRACTOR_VERSION,
+        "clean_extracted_text": CLEAN_EXTRACTED_TEXT,
+        "ocr_available": engine.available,
+        "ocr_engine": engine.name,
+        "ocr_lang": engine.lang,
+        # Only tesserocr loads its models from OCR_TESSDATA_PATH
+        "ocr_tessdata_path": getattr(engine, "tessdata_path", None) or None,
+        "ocr_resolution": OCR_RESOLUTION,
+        "ocr_adaptive_dpi": [OCR_MIN_RESOLUTION, OCR_CONFIDENCE_THRESHOLD] if OCR_ADAPTIVE_DPI else None,
+        "ocr_psm": OCR_PSM,
+        "stream_pdf": OCR_STREAM_PDF,
+        "table_files": OCR_TABLE_FILES,
+        "output_format": OCR_OUTPUT_FORMAT,
+        "txt_fallback_encoding": TXT_FALLBACK_ENCODING,
+        "txt_block_chars": TXT_BLOCK_CHARS if OCR_OUTPUT_FORMAT == "jsonl" else None,
+        "pdf_text_backend": resolve_pdf_backend(),
+        "pdf_triage": ([PDF_TRIAGE_MIN_CHARS, PDF_TRIAGE_IMAGE_COVERAGE, PDF_TRIAGE_MIN_RULES]
+                       if resolve_pdf_backend() == "auto" else None)
+    }
+
+def _hash_document(file_path):
+    """Content hash used by the extraction cache and parsed-document lookup, or None if neither is on."""
+    if get_extraction_cache() is None and not SHARE_PARSED_DOCUMENTS:
+        return None
+    try:
+        return hash_file(file_path)
+    except OSError as e:
+        log_verbose(f"Could not hash {Path(file_path).name}: {e}", "warning")
+        return None
+
+def _extraction_cache_key(file_hash):
+    """Return (cache, key) for a file's hash, or (None, None) when the cache is disabled or unusable."""
+    cache = get_extraction_cache()
+    if cache is None or file_hash is None:
+        return None, None
+    return cache, cache.make_key(file_hash, extraction_settings())
+
+def finalize_text(extracted_text):
+    """Return the text to save (cleaned when CLEAN_EXTRACTED_TEXT is on) and its statistics."""
     if CLEAN_EXTRACTED_TEXT:
-        final_text = clean_text(extracted_text)
-        text_status = "cleaned"
-    else:
-        final_text = extracted_text
-        text_status = "raw"
+        return clean_text_with_stats(extracted_text)
+    return extracted_text, text_stats(extracted_text)
+
+def save_extracted_text(file_path, extracted_text, output_folder="./output/ocr_extracted", data_root=None):
+    """Save extracted text to a file in the output folder."""
+    if not extracted_text or not extracted_text.strip():
+        return None
+    return write_final_text(file_path, finalize_text(extracted_text)[0], output_folder, data_root)
+
+def write_final_text(file_path, final_text, output_folder="./output/ocr_extracted", data_root=None):
+    """Write already cleaned (or raw) text to the document's output file."""
+    text_status = "cleaned" if CLEAN_EXTRACTED_TEXT else "raw"
     
     if not final_text or not final_text.strip():
         log_verbose(f"No text remaining after {'cleaning' if CLEAN_EXTRACTED_TEXT else 'processing'} for {Path(file_path).name}", "warning")
@@ -544,10 +969,8 @@ def save_extracted_text(file_path, extracted_text, output_folder="./output/ocr_e
     output_path = Path(output_folder)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Create output filename (same name but with .txt extension)
     input_file = Path(file_path)
-    output_filename = f"{input_file.stem}_extracted.txt"
-    output_file = output_path / output_filename
+    output_file = get_output_file_path(input_file, output_path, data_root)
     
     # Save the text
     try:
@@ -559,64 +982,431 @@ def save_extracted_text(file_path, extracted_text, output_folder="./output/ocr_e
         log_verbose(f"Error saving extracted text for {input_file.name}: {e}", "error")
         return None
 
-def process_file_with_ocr(file_path, output_folder="./output/ocr_extracted"):
-    """Extract text from a single file and save it."""
+def _extraction_result(file_path, output_file, stats, cache_hit=False):
+    """Summary entry for a document whose text was saved."""
+    result = {
+        "input_file": str(file_path),
+        "output_file": output_file,
+        "word_count": stats["word_count"],
+        "char_count": stats["char_count"],
+        "success": True,
+        "preview": stats["preview"],
+        "text_cleaned": CLEAN_EXTRACTED_TEXT,
+        "cache_hit": cache_hit
+    }
+    if "tables" in stats:
+        result["tables"] = len(stats["tables"])
+    if "units" in stats:
+        result["structured_file"] = str(Path(output_file).with_suffix(".jsonl"))
+        result["units"] = len(stats["units"])
+    return result
+
+def _empty_result(file_path):
+    """Summary entry for a document that produced no text."""
+    return {
+        "input_file": str(file_path),
+        "output_file": None,
+        "word_count": 0,
+        "char_count": 0,
+        "success": False,
+        "preview": "",
+        "text_cleaned": CLEAN_EXTRACTED_TEXT
+    }
+
+def process_file_with_ocr(file_path, output_folder="./output/ocr_extracted", file_hash=None, data_root=None):
+    """Extract text from a single file and save it.
+
+    ``file_hash`` is the file's content hash when the caller already knows it (from the
+    corpus manifest), saving a second read of the file. ``data_root`` is the folder the
+    document was found in; its output files are named after the path below it (see
+    ``output_stem``).
+    """
     file_path = Path(file_path)
     
     log_verbose(f"Processing: {file_path.name}", "process")
     
+    # Unchanged documents are served from the extraction cache without re-extracting
+    file_hash = file_hash or _hash_document(file_path)
+    cache, cache_key = _extraction_cache_key(file_hash)
+    if cache is not None:
+        entry = cache.get(cache_key)
+        if entry:
+            saved_file = cache.restore(cache_key, get_output_file_path(file_path, output_folder, data_root))
+            if saved_file:
+                log_verbose(f"Reused cached extraction for {file_path.name} ({entry['word_count']} words)", "success")
+                if "tables" in entry:
+                    write_table_files(file_path, entry["tables"], output_folder, data_root)
+                if "units" in entry:
+                    restore_structured_file(file_path, saved_file, entry["units"], output_folder, data_root)
+                return _extraction_result(file_path, saved_file, entry, cache_hit=True)
+    
+    # PDF tables are collected while the text is extracted when they are also saved as side files
+    tables = [] if OCR_TABLE_FILES != "none" and file_path.suffix.lower() == ".pdf" else None
+    
+    # Text the inspection step already parsed is reused; only OCR and tables remain to do
+    parsed = load_parsed_document(file_path, file_hash) if file_hash else None
+    if parsed is not None:
+        log_verbose(f"Reusing parsed document from the inspection step for {file_path.name}", "debug")
+    
+    # Structured output is written unit by unit, so it never holds the whole document either
+    if OCR_OUTPUT_FORMAT == "jsonl":
+        image_cache = new_image_cache()
+        stats = write_structured_text(file_path, iter_document_units(file_path, image_cache, parsed, tables), output_folder, data_root)
+        if not stats:
+            log_verbose(f"No text extracted from {file_path.name}", "error")
+            return _empty_result(file_path)
+        
+        output_file = get_output_file_path(file_path, output_folder, data_root)
+        log_verbose(f"Extracted {stats['char_count']} characters ({stats['word_count']} words) in {len(stats['units'])} units from {file_path.name} to {output_file}", "success")
+        if tables is not None:
+            write_table_files(file_path, tables, output_folder, data_root)
+            stats = dict(stats, tables=tables)
+        if cache is not None:
+            cache.put_file(cache_key, output_file, stats)
+        
+        result = _extraction_result(file_path, str(output_file), stats)
+        if image_cache.hits or image_cache.misses:
+            result["image_ocr"] = image_cache.stats()
+        return result
+    
+    # Large PDFs can be written page by page instead of being held in memory; TXT files always are, block by block
+    is_txt = file_path.suffix.lower() == ".txt"
+    if is_txt or (OCR_STREAM_PDF and file_path.suffix.lower() == ".pdf"):
+        output_file = get_output_file_path(file_path, output_folder, data_root)
+        if is_txt:
+            stats = stream_txt_to_file(file_path, output_file)
+        else:
+            stats = stream_pdf_to_file(file_path, output_file, parsed, tables)
+        if not stats:
+            log_verbose(f"No text extracted from {file_path.name}", "error")
+            return _empty_result(file_path)
+        
+        log_verbose(f"Streamed {stats['char_count']} characters ({stats['word_count']} words) from {file_path.name} to {output_file}", "success")
+        if tables is not None:
+            write_table_files(file_path, tables, output_folder, data_root)
+            stats = dict(stats, tables=tables)
+        if cache is not None:
+            cache.put_file(cache_key, output_file, stats)
+        return _extraction_result(file_path, str(output_file), stats)
+    
     # Extract text using OCR
-    extracted_text = extract_text_from_any_file(file_path)
+    image_cache = new_image_cache()
+    extracted_text = extract_text_from_any_file(file_path, image_cache, parsed, tables)
     
     if extracted_text and extracted_text.strip():
-        # Save the extracted text (cleaning happens conditionally inside save_extracted_text)
-        saved_file = save_extracted_text(file_path, extracted_text, output_folder)
+        # Clean (if enabled) once; the statistics come from the same pass
+        final_text, stats = finalize_text(extracted_text)
+        saved_file = write_final_text(file_path, final_text, output_folder, data_root)
         
         if saved_file:
-            # Use final text (cleaned or raw) for statistics based on settings
-            final_text = clean_text(extracted_text) if CLEAN_EXTRACTED_TEXT else extracted_text
-            word_count = len(final_text.split()) if final_text else 0
-            char_count = len(final_text) if final_text else 0
+            log_verbose(f"Extracted {stats['char_count']} characters ({stats['word_count']} words) from {file_path.name} ({'cleaned' if CLEAN_EXTRACTED_TEXT else 'raw'} text)", "info")
+            if tables is not None:
+                write_table_files(file_path, tables, output_folder, data_root)
+                stats = dict(stats, tables=tables)
             
-            log_verbose(f"Extracted {char_count} characters ({word_count} words) from {file_path.name} ({'cleaned' if CLEAN_EXTRACTED_TEXT else 'raw'} text)", "info")
-
-            # Create preview from final text
-            preview = final_text[:200] + "..." if len(final_text) > 200 else final_text
+            if cache is not None:
+                cache.put(cache_key, final_text, stats)
             
-            return {
-                "input_file": str(file_path),
-                "output_file": saved_file,
-                "word_count": word_count,
-                "char_count": char_count,
-                "success": True,
-                "preview": preview,
-                "text_cleaned": CLEAN_EXTRACTED_TEXT
-            }
+            result = _extraction_result(file_path, saved_file, stats)
+            if image_cache.hits or image_cache.misses:
+                result["image_ocr"] = image_cache.stats()
+                log_verbose(f"Embedded images: {image_cache.hits + image_cache.misses}, OCRed {image_cache.misses}, reused {image_cache.hits}", "info")
+            return result
         else:
             log_verbose(f"Failed to save extracted text from {file_path.name}", "error")
-            return {
-                "input_file": str(file_path),
-                "output_file": None,
-                "word_count": 0,
-                "char_count": 0,
-                "success": False,
-                "preview": "",
-                "text_cleaned": CLEAN_EXTRACTED_TEXT
-            }
+            return _empty_result(file_path)
     else:
         log_verbose(f"No text extracted from {file_path.name}", "error")
-        return {
-            "input_file": str(file_path),
-            "output_file": None,
-            "word_count": 0,
-            "char_count": 0,
-            "success": False,
-            "preview": "",
-            "text_cleaned": CLEAN_EXTRACTED_TEXT
-        }
+        return _empty_result(file_path)
+
+def _failed_result(file_path, error):
+    """Summary entry for a file whose processing raised an exception."""
+    return {
+        "input_file": str(file_path),
+        "output_file": None,
+        "word_count": 0,
+        "char_count": 0,
+        "success": False,
+        "error": str(error),
+        "text_cleaned": CLEAN_EXTRACTED_TEXT
+    }
+
+def _process_file_timed(file_path, output_folder, file_hash=None, data_root=None):
+    """Process one file and tag the result with timing and the worker that handled it.
+
+    Runs both in-process and inside pool workers, so it must stay a module-level function.
+    """
+    start_time = time.time()
+    try:
+        result = process_file_with_ocr(file_path, output_folder, file_hash, data_root)
+    except Exception as e:
+        log_verbose(f"Error processing {Path(file_path).name}: {e}", "error")
+        result = _failed_result(file_path, e)
+    
+    result["processing_time"] = round(time.time() - start_time, 3)
+    result["worker_pid"] = os.getpid()
+    return result
+
+def _process_member_timed(file_path, data, mtime, output_folder, data_root=None):
+    """_process_file_timed for a document read out of an archive by the parent process."""
+    with provided_member(file_path, data, mtime):
+        return _process_file_timed(file_path, output_folder, data_root=data_root)
+
+def _stopped_result(file_path, status, error, elapsed, pid=None):
+    """Summary entry for a document whose isolated worker was killed or died."""
+    result = _failed_result(file_path, error)
+    result["status"] = status
+    result["processing_time"] = round(elapsed, 3)
+    result["worker_pid"] = pid
+    return result
+
+def _use_ocr_resolution(resolution):
+    """Lower the OCR resolution for the rest of this process (and the page workers it starts)."""
+    global OCR_RESOLUTION, OCR_MIN_RESOLUTION
+    OCR_RESOLUTION = resolution
+    OCR_MIN_RESOLUTION = min(OCR_MIN_RESOLUTION, resolution)
+    os.environ['OCR_RESOLUTION'] = str(OCR_RESOLUTION)
+    os.environ['OCR_MIN_RESOLUTION'] = str(OCR_MIN_RESOLUTION)
 
-def process_folder_with_ocr(data_folder, output_folder):
-    """Process all files in a folder using OCR and save results."""
+def _isolated_document_worker(conn, file_path, output_folder, resolution=None, member=None, data_root=None):
+    """Entry point of an isolated worker process: extract one document and send back its result."""
+    if resolution:
+        _use_ocr_resolution(resolution)
+    if member is not None:
+        result = _process_member_timed(file_path, *member, output_folder, data_root)
+    else:
+        result = _process_file_timed(file_path, output_folder, data_root=data_root)
+    conn.send(result)
+    conn.close()
+
+def _process_tree(pid):
+    """A process and all its descendants (pytesseract runs Tesseract as a child process)."""
+    try:
+        process = psutil.Process(pid)
+        return [process] + process.children(recursive=True)
+    except psutil.Error:
+        return []
+
+def _tree_rss(pid):
+    total = 0
+    for process in _process_tree(pid):
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+class IsolatedExtraction:
+    """One document being extracted in its own process, under the per-document limits."""
+
+    def __init__(self, file_path, output_folder, resolution=None, first_attempt=None, member=None, data_root=None):
+        self.file_path = file_path
+        self.resolution = resolution
+        # Result of the attempt this run retries at a lower resolution
+        self.first_attempt = first_attempt
+        # (data, mtime) of a document read out of an archive
+        self.member = member
+        self.peak_rss = 0
+        self.conn, child_conn = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=_isolated_document_worker,
+                                               args=(child_conn, str(file_path), output_folder, resolution, member, data_root))
+        self.process.start()
+        child_conn.close()
+        self.started = time.time()
+
+    def kill(self):
+        """Kill the worker together with any Tesseract processes it started."""
+        if PSUTIL_AVAILABLE:
+            for process in reversed(_process_tree(self.process.pid)[1:]):
+                try:
+                    process.kill()
+                except psutil.Error:
+                    pass
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def poll(self):
+        """The document's result once the worker is done or has been stopped, otherwise None."""
+        elapsed = time.time() - self.started
+        pid = self.process.pid
+        if self.conn.poll():
+            try:
+                result = self.conn.recv()
+            except EOFError:
+                result = None
+            if result is not None:
+                self.process.join()
+                self.conn.close()
+                if self.peak_rss:
+                    result["peak_rss_mb"] = round(self.peak_rss / (1024 * 1024), 1)
+                return result
+        if not self.process.is_alive():
+            self.process.join()
+            self.conn.close()
+            exit_code = self.process.exitcode
+            # SIGKILL from outside is almost always the operating system's out-of-memory killer
+            if hasattr(signal, 'SIGKILL') and exit_code == -signal.SIGKILL:
+                return _stopped_result(self.file_path, "oom", "Worker was killed by the operating system (out of memory)", elapsed, pid)
+            return _stopped_result(self.file_path, "crashed", f"Worker exited with code {exit_code}", elapsed, pid)
+        if OCR_DOCUMENT_TIMEOUT > 0 and elapsed > OCR_DOCUMENT_TIMEOUT:
+            self.kill()
+            return _stopped_result(self.file_path, "timeout", f"Extraction took longer than {OCR_DOCUMENT_TIMEOUT:g}s", elapsed, pid)
+        if OCR_DOCUMENT_MAX_RSS_MB > 0 and PSUTIL_AVAILABLE:
+            rss = _tree_rss(pid)
+            self.peak_rss = max(self.peak_rss, rss)
+            if rss > OCR_DOCUMENT_MAX_RSS_MB * 1024 * 1024:
+                self.kill()
+                return _stopped_result(self.file_path, "oom",
+                                       f"Extraction used {rss / (1024 * 1024):.0f} MB (limit {OCR_DOCUMENT_MAX_RSS_MB:g} MB)", elapsed, pid)
+        return None
+
+def run_documents_isolated(files, output_folder, workers=1, data_root=None):
+    """Extract documents in isolated processes, at most ``workers`` at a time.
+
+    A document that runs past OCR_DOCUMENT_TIMEOUT or OCR_DOCUMENT_MAX_RSS_MB is killed
+    and gets a "timeout" or "oom" status; with OCR_RETRY_RESOLUTION set it is tried once
+    more at that resolution. Returns a dict of results keyed by the given file paths.
+
+    ``files`` may also hold (member path, data, mtime) entries for documents read out of
+    an archive; it is consumed lazily, so a streamed archive is never read in full.
+    """
+    if OCR_DOCUMENT_MAX_RSS_MB > 0 and not PSUTIL_AVAILABLE:
+        log_verbose("OCR_DOCUMENT_MAX_RSS_MB needs psutil (pip install psutil); memory is not limited", "warning")
+    
+    queue = iter(files)
+    queue_done = False
+    running = []
+    results = {}
+    try:
+        while not queue_done or running:
+            while not queue_done and len(running) < workers:
+                document = next(queue, None)
+                if document is None:
+                    queue_done = True
+                elif isinstance(document, tuple):
+                    running.append(IsolatedExtraction(document[0], output_folder, member=document[1:], data_root=data_root))
+                else:
+                    running.append(IsolatedExtraction(document, output_folder, data_root=data_root))
+            
+            # Wake up as soon as a worker reports back or exits, or at the next limit check
+            multiprocessing.connection.wait([run.conn for run in running] + [run.process.sentinel for run in running],
+                                            timeout=ISOLATION_POLL_SECONDS)
+            
+            for run in list(running):
+                result = run.poll()
+                if result is None:
+                    continue
+                running.remove(run)
+                status = result.get("status")
+                if (status in ("timeout", "oom") and run.resolution is None
+                        and 0 < OCR_RETRY_RESOLUTION < OCR_RESOLUTION):
+                    log_verbose(f"{Path(run.file_path).name}: {result['error']}, retrying at {OCR_RETRY_RESOLUTION} DPI", "warning")
+                    running.append(IsolatedExtraction(run.file_path, output_folder, OCR_RETRY_RESOLUTION, result, run.member, data_root))
+                    continue
+                if status:
+                    log_verbose(f"{Path(run.file_path).name}: {result['error']}", "error")
+                if run.first_attempt is not None:
+                    result["retry_of"] = run.first_attempt["status"]
+                    result["ocr_resolution"] = run.resolution
+                    result["processing_time"] = round(result.get("processing_time", 0.0) + run.first_attempt["processing_time"], 3)
+                results[run.file_path] = result
+    finally:
+        for run in running:
+            run.kill()
+    
+    return results
+
+def process_file_isolated(file_path, output_folder="./output/ocr_extracted", data_root=None):
+    """process_file_with_ocr in an isolated worker under the per-document limits."""
+    return run_documents_isolated([file_path], output_folder, data_root=data_root)[file_path]
+
+def process_archive_with_ocr(archive_path, output_folder, workers=1, data_root=None):
+    """Extract every supported document inside a ZIP or TAR archive without unpacking it.
+
+    The archive is read once, front to back, and its members are handed to ``workers``
+    processes with only a few of them in memory at a time. Results come back in archive
+    order, under member paths such as ``data/export.zip/reports/q1.pdf``.
+    """
+    archive_path = Path(archive_path)
+    log_verbose(f"Reading documents from archive: {archive_path.name}", "process")
+    members = iter_archive_documents(archive_path, SUPPORTED_EXTENSIONS)
+    results = []
+    
+    try:
+        if OCR_ISOLATE_DOCUMENTS:
+            member_paths = []
+            
+            def tracked_members():
+                for member in members:
+                    member_paths.append(member[0])
+                    yield member
+            
+            isolated = run_documents_isolated(tracked_members(), output_folder, workers, data_root)
+            results = [isolated[file_path] for file_path in member_paths]
+        elif workers <= 1:
+            for file_path, data, mtime in members:
+                results.append(_process_member_timed(file_path, data, mtime, output_folder, data_root))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                tasks = ((file_path, data, mtime, output_folder, data_root) for file_path, data, mtime in members)
+                for (file_path, *_), future in submit_bounded(executor, _process_member_timed, tasks, workers * 2):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        log_verbose(f"Error processing {file_path.name}: {e}", "error")
+                        results.append(_failed_result(file_path, e))
+    except Exception as e:
+        # Unreadable or truncated archive: keep what was extracted before the damage
+        log_verbose(f"Error reading archive {archive_path.name}: {e}", "error")
+        results.append(_failed_result(archive_path, e))
+    
+    return results
+
+def _reusable_results(manifest, settings, paths):
+    """Earlier results of unchanged documents (lists for archives) whose output files are untouched."""
+    if manifest is None:
+        return {}
+    reused = {}
+    for path, result in manifest.reusable("extraction", settings, paths).items():
+        # Timing and image statistics belong to the run that did the work
+        entries = [dict({key: value for key, value in entry.items() if key not in ("processing_time", "worker_pid", "image_ocr")},
+                        manifest_hit=True) for entry in (result if isinstance(result, list) else [result])]
+        reused[path] = entries if isinstance(result, list) else entries[0]
+    return reused
+
+def log_image_cache_stats(results):
+    """Log how many embedded images were OCRed versus reused from the image cache."""
+    images = sum(r["image_ocr"]["images"] for r in results if "image_ocr" in r)
+    if not images:
+        return
+    hits = sum(r["image_ocr"]["cache_hits"] for r in results if "image_ocr" in r)
+    log_verbose(f"- Embedded images: {images}, OCRed {images - hits}, reused {hits} (hit rate {hits / images:.1%}, scope: {OCR_IMAGE_CACHE_SCOPE})")
+
+def log_worker_timing(results, elapsed):
+    """Log how many files and how much time each worker process spent."""
+    workers = {}
+    for result in results:
+        pid = result.get("worker_pid")
+        if pid is None:
+            continue
+        stats = workers.setdefault(pid, {"files": 0, "seconds": 0.0})
+        stats["files"] += 1
+        stats["seconds"] += result.get("processing_time", 0.0)
+    
+    busy_time = sum(stats["seconds"] for stats in workers.values())
+    log_verbose(f"- Wall time: {elapsed:.2f}s, worker time: {busy_time:.2f}s across {len(workers)} worker(s)")
+    for pid, stats in sorted(workers.items()):
+        log_verbose(f"  Worker {pid}: {stats['files']} files in {stats['seconds']:.2f}s")
+
+def process_folder_with_ocr(data_folder, output_folder, workers=None):
+    """Process all files in a folder using OCR and save results.
+
+    Files are processed by ``workers`` processes (defaults to the OCR_WORKERS setting);
+    the summary is always written in file-name order. Documents inside ZIP/TAR archives in
+    the folder (or ``data_folder`` being an archive itself) follow, read straight from the
+    archives when READ_ARCHIVES is on.
+    """
     data_path = Path(data_folder)
     results = []
     
@@ -628,32 +1418,110 @@ def process_folder_with_ocr(data_folder, output_folder):
     log_verbose(f"Saving extracted text to: {output_folder}")
     log_verbose(f"Text cleaning: {'Enabled' if CLEAN_EXTRACTED_TEXT else 'Disabled'}")
     
+    if data_path.is_file():
+        corpus = []
+        archives = [data_path] if READ_ARCHIVES and is_archive(data_path) else []
+    else:
+        # Nested folders are listed through the corpus manifest, which only hashes changed files
+        corpus = scan_corpus(data_path, extensions=tuple(SUPPORTED_EXTENSIONS) + (ARCHIVE_SUFFIXES if READ_ARCHIVES else ()))
+        archives = sorted((f.path for f in corpus if READ_ARCHIVES and is_archive(f.path)),
+                          key=lambda f: str(f).lower())
+    
     # Get all supported files (excluding temporary Microsoft Office files)
-    supported_extensions = {'.pdf', '.docx', '.pptx', '.txt'}
-    files_to_process = [f for f in data_path.iterdir() 
-                       if f.is_file() and f.suffix.lower() in supported_extensions
-                       and not f.name.startswith('~$')]  # Skip temporary Office files
+    file_hashes = {f.path: f.hash for f in corpus
+                   if f.path.suffix.lower() in SUPPORTED_EXTENSIONS
+                   and not f.path.name.startswith('~$')}  # Skip temporary Office files
+    files_to_process = list(file_hashes)
     
-    if not files_to_process:
+    if not files_to_process and not archives:
         log_verbose("No supported files found in the data folder", "warning")
         return results
     
-    # Process each file
-    for file_path in files_to_process:
-        try:
-            result = process_file_with_ocr(file_path, output_folder)
-            results.append(result)
-        except Exception as e:
-            log_verbose(f"Error processing {file_path.name}: {e}", "error")
-            results.append({
-                "input_file": str(file_path),
-                "output_file": None,
-                "word_count": 0,
-                "char_count": 0,
-                "success": False,
-                "error": str(e),
-                "text_cleaned": CLEAN_EXTRACTED_TEXT
-            })
+    # Sort so the summary order does not depend on directory listing or worker scheduling
+    files_to_process.sort(key=lambda f: str(f).lower())
+    
+    # Output files are named after the path below the data folder (an archive's folder when given one)
+    data_root = data_path.parent if data_path.is_file() else data_path
+    
+    # Documents unchanged since a run with the same settings keep their earlier result
+    manifest = get_corpus_manifest()
+    stage_settings = dict(extraction_settings(), output_folder=str(output_folder), output_names="relative")
+    reused = _reusable_results(manifest, stage_settings, files_to_process + archives)
+    pending = [file_path for file_path in files_to_process if file_path not in reused]
+    if reused:
+        log_verbose(f"{len(reused)} unchanged documents keep their earlier extraction", "info")
+    
+    if workers is None:
+        workers = OCR_WORKERS
+    workers = resolve_worker_count(workers)
+    file_workers = min(workers, max(1, len(pending)))
+    
+    start_time = time.time()
+    extracted = {}
+    
+    if OCR_ISOLATE_DOCUMENTS:
+        # Each document in its own process, killed if it runs past its time or memory limit
+        log_verbose(f"Processing {len(pending)} files in isolated workers ({file_workers} at a time)", "process")
+        extracted = run_documents_isolated(pending, output_folder, file_workers, data_root)
+    elif file_workers <= 1:
+        # Process each file in this process
+        for file_path in pending:
+            extracted[file_path] = _process_file_timed(file_path, output_folder, file_hashes[file_path], data_root)
+    else:
+        log_verbose(f"Processing {len(pending)} files with {file_workers} worker processes", "process")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=file_workers) as executor:
+            futures = [executor.submit(_process_file_timed, file_path, output_folder, file_hashes[file_path], data_root)
+                       for file_path in pending]
+            
+            # Collect in submission order so the summary is deterministic
+            for file_path, future in zip(pending, futures):
+                try:
+                    extracted[file_path] = future.result()
+                except Exception as e:
+                    # Worker crashed (e.g. killed by the OS) before it could report back
+                    log_verbose(f"Error processing {file_path.name}: {e}", "error")
+                    extracted[file_path] = _failed_result(file_path, e)
+    
+    results = [reused[file_path] if file_path in reused else extracted[file_path] for file_path in files_to_process]
+    
+    # Archive members are streamed out of each archive in turn
+    for archive_path in archives:
+        if archive_path in reused:
+            results.extend(reused[archive_path])
+            continue
+        extracted[archive_path] = process_archive_with_ocr(archive_path, output_folder, workers, data_root)
+        results.extend(extracted[archive_path])
+    
+    # Documents still sharing an output file (e.g. report.pdf and report.docx) overwrite each other's text;
+    # compared case-insensitively, as they would be on Windows and macOS
+    claimed = {}
+    for result in results:
+        if result.get("output_file"):
+            claimed.setdefault(result["output_file"].lower(), []).append(result["input_file"])
+    colliding = {output for output, inputs in claimed.items() if len(inputs) > 1}
+    for output in sorted(colliding):
+        log_verbose(f"{len(claimed[output])} documents write the same output file, only one text is kept: "
+                    f"{', '.join(claimed[output])}", "error")
+    
+    # Failed and colliding documents are not recorded, so the next run tries them again; neither are
+    # documents retried at OCR_RETRY_RESOLUTION, whose text is not what these settings would give
+    if manifest is not None:
+        recorded = []
+        for file_path, result in extracted.items():
+            entries = result if isinstance(result, list) else [result]
+            if all(entry["success"] and "retry_of" not in entry and entry["output_file"].lower() not in colliding
+                   for entry in entries):
+                outputs = [entry[key] for entry in entries for key in ("output_file", "structured_file") if entry.get(key)]
+                recorded.append((file_path, result, outputs))
+        manifest.record("extraction", stage_settings, recorded)
+    
+    elapsed = time.time() - start_time
+    
+    cache = get_extraction_cache()
+    if cache is not None:
+        cache.evict()
+    if SHARE_PARSED_DOCUMENTS:
+        evict_parsed_documents()
     
     # Save processing summary
     summary_file = Path(output_folder) / "ocr_processing_summary.json"
@@ -673,6 +1541,16 @@ def process_folder_with_ocr(data_folder, output_folder):
     log_verbose(f"- Successful extractions: {successful}")
     log_verbose(f"- Total words extracted: {total_words}")
     log_verbose(f"- Text cleaning: {'Enabled' if CLEAN_EXTRACTED_TEXT else 'Disabled'}")
+    log_verbose(f"- Extraction cache hits: {sum(1 for r in results if r.get('cache_hit'))}")
+    log_verbose(f"- Unchanged documents reused: {sum(1 for r in results if r.get('manifest_hit'))}")
+    if OCR_ISOLATE_DOCUMENTS:
+        stopped = [r for r in results if r.get('status')]
+        log_verbose(f"- Stopped by limits: {sum(1 for r in stopped if r['status'] == 'timeout')} timeout, "
+                    f"{sum(1 for r in stopped if r['status'] == 'oom')} oom, "
+                    f"{sum(1 for r in stopped if r['status'] == 'crashed')} crashed; "
+                    f"retried at lower resolution: {sum(1 for r in results if r.get('retry_of'))}")
+    log_image_cache_stats(results)
+    log_worker_timing(results, elapsed)
     
     return results
 
@@ -0,0 +1,150 @@
+"""Read documents straight out of ZIP and TAR archives, without unpacking them to disk.
+
+A document inside an archive is addressed by its member path: the archive's path joined
+with the member name, e.g. ``data/export.zip/reports/q1.pdf``. Member paths keep the usual
+name/stem/suffix handling, and ``document_input``/``open_document`` turn them into
+in-memory streams for pdfplumber, zipfile, python-docx and the other readers.
+"""
+import io
+import os
+import tarfile
+import time
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Read the documents inside .zip/.tar(.gz/.bz2/.xz) files found in the data folder
+READ_ARCHIVES = os.getenv('READ_ARCHIVES', 'true').lower() == 'true'
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# Member contents handed over by the code streaming the archive, keyed by member path
+_provided_members = {}
+
+def is_archive(path):
+    return Path(path).name.lower().endswith(ARCHIVE_SUFFIXES)
+
+def is_skipped_member(name):
+    """Temporary Office files (~$...) and macOS resource forks are not documents."""
+    base = name.rsplit('/', 1)[-1]
+    return base.startswith('~$') or base.startswith('._') or name.startswith('__MACOSX/')
+
+def _member_name(name):
+    """Member name as it appears in a member path ("./a//b.pdf" -> "a/b.pdf")."""
+    return "/".join(PurePosixPath(name.lstrip('/')).parts)
+
+def split_member_path(path):
+    """Return (archive path, member name) for a path inside an archive, or None for an ordinary path."""
+    parts = Path(path).parts
+    for i in range(1, len(parts)):
+        archive = Path(*parts[:i])
+        if is_archive(archive) and archive.is_file():
+            return archive, "/".join(parts[i:])
+    return None
+
+def is_member_path(path):
+    return str(path) in _provided_members or split_member_path(path) is not None
+
+def _zip_mtime(info):
+    return time.mktime(info.date_time + (0, 0, -1))
+
+def iter_archive_documents(archive_path, extensions):
+    """Yield (member path, data, mtime) for the documents in an archive, in archive order.
+
+    The archive is read front to back once (compressed tarballs as a stream), and only
+    members with one of ``extensions`` are decompressed. ``~$`` temporary files and macOS
+    metadata are skipped. Each member is held in memory only until the caller lets go of it.
+    """
+    archive_path = Path(archive_path)
+
+    def wanted(name):
+        return Path(name).suffix.lower() in extensions and not is_skipped_member(_member_name(name))
+
+    if archive_path.name.lower().endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as package:
+            for info in package.infolist():
+                if not info.is_dir() and wanted(info.filename):
+                    yield archive_path / _member_name(info.filename), package.read(info), _zip_mtime(info)
+    else:
+        with tarfile.open(archive_path, mode='r|*') as tar:
+            for member in tar:
+                if member.isfile() and wanted(member.name):
+                    yield archive_path / _member_name(member.name), tar.extractfile(member).read(), member.mtime
+
+def _read_from_archive(archive_path, name):
+    if archive_path.name.lower().endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as package:
+            for info in package.infolist():
+                if _member_name(info.filename) == name:
+                    return package.read(info)
+    else:
+        with tarfile.open(archive_path, mode='r|*') as tar:
+            for member in tar:
+                if member.isfile() and _member_name(member.name) == name:
+                    return tar.extractfile(member).read()
+    raise FileNotFoundError(f"{name} not found in {archive_path}")
+
+def read_member(path):
+    """Content of a document inside an archive.
+
+    Members not handed over with ``provided_member`` are read from their archive again on
+    every call; wrap the processing of such a document in ``provided_member`` to read it once.
+    """
+    key = str(path)
+    if key in _provided_members:
+        return _provided_members[key][0]
+    archive_path, name = split_member_path(path)
+    return _read_from_archive(archive_path, name)
+
+@contextmanager
+def provided_member(path, data, mtime=None):
+    """Serve a member's already read content to the readers while its document is processed."""
+    key = str(path)
+    _provided_members[key] = (data, mtime)
+    try:
+        yield
+    finally:
+        _provided_members.pop(key, None)
+
+def document_input(path):
+    """What to hand a reader: the path of an ordinary file, or an in-memory stream for an archive member."""
+    if is_member_path(path):
+        return io.BytesIO(read_member(path))
+    return str(path)
+
+def open_document(path):
+    """Open a document for binary reading, wherever it lives."""
+    source = document_input(path)
+    if isinstance(source, io.BytesIO):
+        return source
+    return open(source, 'rb')
+
+def document_stat(path):
+    """(size in bytes, modification time) of a document, wherever it lives."""
+    key = str(path)
+    if key in _provided_members:
+        data, mtime = _provided_members[key]
+        return len(data), mtime if mtime is not None else os.stat(split_member_path(path)[0]).st_mtime
+    member = split_member_path(path)
+    if member is not None:
+        return len(read_member(path)), os.stat(member[0]).st_mtime
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+def submit_bounded(executor, function, items, window):
+    """Submit function(*args) for each item, yielding (args, future) in order.
+
+    At most ``window`` items are submitted ahead of the caller, so the members of a
+    streamed archive are never all in memory at once.
+    """
+    pending = deque()
+    for args in items:
+        pending.append((args, executor.submit(function, *args)))
+        if len(pending) >= window:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
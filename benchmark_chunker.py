@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Chunker Benchmark
+Check that the streaming chunker (iter_text_chunks over iter_text_blocks) gives exactly
+the chunks of the previous split_text_into_chunks, and compare their speed and peak memory.
+Each chunker runs in a fresh process so their memory peaks do not mix.
+
+Usage:
+    python benchmark_chunker.py                   # 100 MB of generated text
+    python benchmark_chunker.py 20                # 20 MB of generated text
+    python benchmark_chunker.py path/to/file.txt  # an extracted text file
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import tempfile
+import subprocess
+from pathlib import Path
+
+from split_text_chunks import iter_text_chunks, iter_text_blocks
+
+CHUNK_SIZE = 500
+OVERLAP = 50
+
+WORDS = ("the of and services digital transformation provides company project data "
+         "analysis report contract payment terms client support network infrastructure "
+         "security cloud").split()
+
+# Previous implementation, kept verbatim as the reference output
+def legacy_split_text_into_chunks(text, chunk_size=500, overlap=50):
+    text = re.sub(r'\s+', ' ', text.strip())
+    words = text.split()
+
+    if len(words) <= chunk_size:
+        return [text]
+
+    chunks = []
+    step_size = chunk_size - overlap
+
+    for i in range(0, len(words), step_size):
+        chunk_words = words[i:i + chunk_size]
+        chunk_text = ' '.join(chunk_words)
+        chunks.append(chunk_text)
+
+        if i + chunk_size >= len(words):
+            break
+
+    return chunks
+
+def generate_file(path, megabytes, seed=1):
+    """Write extracted-looking text (sentences and paragraphs) without holding it in memory."""
+    rnd = random.Random(seed)
+    size = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while size < megabytes * 1024 * 1024:
+            line = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 18))) + rnd.choice([".", "", ":"])
+            line += rnd.choice(["\n", "\n", "\n\n", " \n"])
+            f.write(line)
+            size += len(line)
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+def run_chunker(method, path):
+    """Chunk the file with one method; prints its time, memory growth, chunk count and digest as JSON."""
+    baseline = peak_rss_mb()
+    digest = hashlib.sha256()
+    count = 0
+    start_time = time.time()
+
+    if method == "legacy":
+        # What build_chunks used to do: read the whole file, then split it
+        with open(path, "r", encoding="utf-8") as f:
+            chunks = legacy_split_text_into_chunks(f.read(), CHUNK_SIZE, OVERLAP)
+    else:
+        chunks = iter_text_chunks(iter_text_blocks(path), CHUNK_SIZE, OVERLAP)
+
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8") + b"\0")
+        count += 1
+
+    print(json.dumps({
+        "seconds": time.time() - start_time,
+        "memory_mb": peak_rss_mb() - baseline,
+        "chunks": count,
+        "digest": digest.hexdigest()
+    }))
+
+def measure(method, path):
+    output = subprocess.run([sys.executable, __file__, "--run", method, str(path)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--run":
+        run_chunker(sys.argv[2], sys.argv[3])
+        return
+
+    arg = sys.argv[1] if len(sys.argv) > 1 else "100"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if Path(arg).is_file():
+            path = Path(arg)
+            source = arg
+        else:
+            path = Path(tmp_dir) / "generated_extracted.txt"
+            generate_file(path, float(arg))
+            source = "generated text"
+
+        megabytes = os.path.getsize(path) / (1024 * 1024)
+        print("🧪 Chunker Benchmark")
+        print("=" * 50)
+        print(f"   Input: {source}, {megabytes:.1f} MB (chunk size {CHUNK_SIZE}, overlap {OVERLAP})")
+        print()
+
+        legacy = measure("legacy", path)
+        streaming = measure("streaming", path)
+
+    for name, result in (("legacy split_text_into_chunks", legacy), ("streaming iter_text_chunks", streaming)):
+        print(f"⚡ {name:30} {megabytes / result['seconds']:8.2f} MB/s   "
+              f"peak memory +{result['memory_mb']:.0f} MB   {result['chunks']} chunks")
+    print()
+
+    if legacy["digest"] != streaming["digest"] or legacy["chunks"] != streaming["chunks"]:
+        print("❌ Chunks differ from the previous split_text_into_chunks")
+        sys.exit(1)
+    print("✅ Chunks identical to the previous split_text_into_chunks")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+OCR Engine Benchmark
+Compare images/sec of the resident tesserocr engine against the pytesseract fallback.
+
+Usage:
+    python benchmark_ocr_engines.py                 # 50 generated text images
+    python benchmark_ocr_engines.py 200             # 200 generated text images
+    python benchmark_ocr_engines.py path/to/images  # every PNG/JPEG in a folder
+"""
+
+import sys
+import time
+from pathlib import Path
+from PIL import Image, ImageDraw
+
+# Importing the extractor configures the tesseract executable for pytesseract
+from OCR_Extractor import OCR_PSM
+from ocr_engine import create_ocr_engine, TESSEROCR_AVAILABLE
+
+SAMPLE_LINES = [
+    "Bayanat provides digital transformation services",
+    "Invoice 2024-117 total amount due 4,250.00 JOD",
+    "Section 3.2 Payment terms and conditions apply",
+    "Contact the support team for onboarding details",
+]
+
+def generate_images(count):
+    """Render simple black-on-white text images similar to scanned slides."""
+    images = []
+    for i in range(count):
+        image = Image.new('L', (1200, 300), color=255)
+        draw = ImageDraw.Draw(image)
+        for line_num in range(4):
+            text = f"{SAMPLE_LINES[(i + line_num) % len(SAMPLE_LINES)]} ({i})"
+            draw.text((40, 40 + line_num * 55), text, fill=0)
+        images.append(image.resize((2400, 600)))
+    return images
+
+def load_images(folder):
+    paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp'))
+    return [Image.open(p).convert('RGB') for p in paths]
+
+def run_engine(engine, images):
+    # Warm up once so model loading is not part of the steady-state rate
+    engine.image_to_string(images[0])
+
+    start_time = time.time()
+    texts = [engine.image_to_string(image) for image in images]
+    elapsed = time.time() - start_time
+    return texts, elapsed
+
+def main():
+    arg = sys.argv[1] if len(sys.argv) > 1 else "50"
+    if Path(arg).is_dir():
+        images = load_images(arg)
+        source = arg
+    else:
+        images = generate_images(int(arg))
+        source = "generated text images"
+
+    if not images:
+        print("❌ No images to benchmark")
+        return
+
+    print("🧪 OCR Engine Benchmark")
+    print("=" * 50)
+    print(f"   Images: {len(images)} ({source})")
+    print(f"   PSM: {OCR_PSM}")
+    print()
+
+    engines = [create_ocr_engine("pytesseract", OCR_PSM)]
+    if TESSEROCR_AVAILABLE:
+        engines.append(create_ocr_engine("tesserocr", OCR_PSM))
+    else:
+        print("⚠️ tesserocr not installed - only the pytesseract engine will be measured")
+        print("   Install with: pip install tesserocr")
+        print()
+
+    results = {}
+    for engine in engines:
+        if not engine.available:
+            print(f"❌ {engine.name}: tesseract not available")
+            continue
+        try:
+            texts, elapsed = run_engine(engine, images)
+        except Exception as e:
+            print(f"❌ {engine.name}: {e}")
+            continue
+        results[engine.name] = (texts, elapsed)
+        print(f"⚡ {engine.name:12s} {len(images) / elapsed:8.2f} images/sec ({elapsed:.2f}s total)")
+        engine.close()
+
+    if len(results) == 2:
+        base_texts, base_time = results["pytesseract"]
+        fast_texts, fast_time = results["tesserocr"]
+        same = sum(1 for a, b in zip(base_texts, fast_texts) if a.strip() == b.strip())
+        print()
+        print(f"📊 Speedup: {base_time / fast_time:.2f}x")
+        print(f"📊 Identical output: {same}/{len(images)} images")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+PDF Backend Benchmark
+Read the text layer of every PDF in a corpus with each available backend and with
+the per-page triage of PDF_TEXT_BACKEND=auto, then report speed, how many words
+each backend recovers compared with pdfplumber, and how auto mode routed the pages.
+OCR is not run; scanned pages are only counted.
+
+Usage:
+    python benchmark_pdf_backends.py              # PDFs in DATA_FOLDER_PATH (default: data)
+    python benchmark_pdf_backends.py path/to/pdfs
+
+The report is also saved as output/pdf_backend_report_<folder>.json.
+"""
+
+import os
+import sys
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from dotenv import load_dotenv
+
+from pdf_backends import (available_pdf_backends, open_pdf_backend, triage_page, PdfiumBackend,
+                          PDFIUM_AVAILABLE)
+
+load_dotenv()
+
+def read_all_pages(backend, path):
+    with open_pdf_backend(backend, path) as reader:
+        return [reader.page_text(page_num) for page_num in range(len(reader))]
+
+def read_auto(path):
+    """Text as auto mode reads it: triaged pages from PDFium, ruled pages from pdfplumber."""
+    routes = Counter()
+    texts = []
+    with PdfiumBackend(path) as reader, open_pdf_backend("pdfplumber", path) as plumber:
+        for page_num in range(len(reader)):
+            text, stats = reader.page_profile(page_num)
+            route = triage_page(stats)
+            routes[route] += 1
+            if route == "ruled":
+                text = plumber.page_text(page_num)
+            elif route != "text":
+                text = ""
+            texts.append(text)
+    return texts, routes
+
+def word_recall(reference, text):
+    """Share of the reference words (with multiplicity) that also appear in text."""
+    reference_words = Counter(reference.split())
+    if not reference_words:
+        return 1.0
+    return sum((reference_words & Counter(text.split())).values()) / sum(reference_words.values())
+
+def main():
+    folder = Path(sys.argv[1] if len(sys.argv) > 1 else os.getenv('DATA_FOLDER_PATH', 'data'))
+    pdfs = sorted(path for path in folder.glob("*.pdf") if path.is_file())
+    if not pdfs:
+        print(f"❌ No PDF files in {folder}")
+        return
+
+    backends = available_pdf_backends()
+    modes = backends + (["auto"] if PDFIUM_AVAILABLE else [])
+    totals = {mode: {"seconds": 0.0, "words": 0, "recall": 0.0, "failed": 0} for mode in modes}
+    routes = Counter()
+    pages = 0
+
+    print("🧪 PDF Backend Benchmark")
+    print("=" * 50)
+    print(f"   Corpus: {folder} ({len(pdfs)} PDFs)")
+    print(f"   Backends: {', '.join(modes)}")
+    print()
+
+    for path in pdfs:
+        texts = {}
+        for mode in modes:
+            start_time = time.time()
+            try:
+                if mode == "auto":
+                    page_texts, doc_routes = read_auto(path)
+                    routes.update(doc_routes)
+                else:
+                    page_texts = read_all_pages(mode, path)
+            except Exception as e:
+                print(f"⚠️ {mode} failed on {path.name}: {e}")
+                totals[mode]["failed"] += 1
+                continue
+            totals[mode]["seconds"] += time.time() - start_time
+            texts[mode] = "\n".join(page_texts)
+            if mode == "pdfplumber":
+                pages += len(page_texts)
+
+        reference = texts.get("pdfplumber", "")
+        for mode, text in texts.items():
+            totals[mode]["words"] += len(text.split())
+            totals[mode]["recall"] += word_recall(reference, text)
+
+    report = {"corpus": str(folder), "documents": len(pdfs), "pages": pages, "backends": {}, "auto_routes": dict(routes)}
+    print(f"{'backend':<12}{'seconds':>10}{'pages/s':>10}{'words':>10}{'recall':>9}")
+    for mode in modes:
+        total = totals[mode]
+        succeeded = len(pdfs) - total["failed"]
+        recall = total["recall"] / succeeded if succeeded else 0.0
+        pages_per_second = pages / total["seconds"] if total["seconds"] else 0.0
+        report["backends"][mode] = {
+            "seconds": round(total["seconds"], 3),
+            "pages_per_second": round(pages_per_second, 1),
+            "words": total["words"],
+            "word_recall_vs_pdfplumber": round(recall, 4),
+            "failed_documents": total["failed"]
+        }
+        print(f"{mode:<12}{total['seconds']:>10.2f}{pages_per_second:>10.1f}{total['words']:>10}{recall:>9.3f}")
+
+    if routes:
+        print()
+        print("📊 Auto mode routing: " + ", ".join(f"{route} {count}" for route, count in sorted(routes.items())))
+
+    output_folder = Path(os.getenv('OUTPUT_FOLDER_PATH', 'output'))
+    output_folder.mkdir(parents=True, exist_ok=True)
+    report_file = output_folder / f"pdf_backend_report_{folder.name}.json"
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"✅ Report saved to {report_file}")
+
+if __name__ == "__main__":
+    main()
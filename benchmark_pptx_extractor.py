@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+PPTX Extractor Benchmark
+Compare the python-pptx object model parse against the direct slide XML reader
+on a large generated deck (or your own file), and check that both give exactly
+the same slide items.
+
+Usage:
+    python benchmark_pptx_extractor.py                 # 400 generated slides
+    python benchmark_pptx_extractor.py 1000            # 1000 generated slides
+    python benchmark_pptx_extractor.py path/to/deck.pptx
+"""
+
+import io
+import sys
+import time
+import random
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+
+from office_xml_extractors import read_pptx
+from document_parser import _parse_pptx_object_model
+
+WORDS = ("the of and services digital transformation provides company project data "
+         "analysis report contract payment terms client support network infrastructure "
+         "security cloud").split()
+
+def sentence(rnd, low=6, high=20):
+    return " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(low, high)))
+
+def generate_pptx(path, slides, seed=1):
+    """Build a deck where each slide has a title, bullets, a table, a group and a picture."""
+    rnd = random.Random(seed)
+    buffer = io.BytesIO()
+    Image.new("RGB", (200, 100), "white").save(buffer, "PNG")
+    picture = buffer.getvalue()
+
+    prs = Presentation()
+    for index in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {index}: " + sentence(rnd, 2, 5)
+        body = slide.placeholders[1].text_frame
+        body.text = sentence(rnd)
+        for _ in range(4):
+            body.add_paragraph().text = sentence(rnd)
+
+        table = slide.shapes.add_table(4, 3, Inches(1), Inches(4), Inches(6), Inches(1.5)).table
+        for row in table.rows:
+            for cell in row.cells:
+                cell.text = sentence(rnd, 1, 3)
+
+        group = slide.shapes.add_group_shape()
+        for _ in range(3):
+            group.shapes.add_textbox(Inches(7), Inches(1), Inches(2), Inches(1)).text = sentence(rnd, 2, 6)
+        slide.shapes.add_picture(io.BytesIO(picture), Inches(7), Inches(5))
+    prs.save(path)
+
+def measure(function, path, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start_time = time.time()
+        result = function(path)
+        elapsed = time.time() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    arg = sys.argv[1] if len(sys.argv) > 1 else "400"
+    if Path(arg).is_file():
+        path = Path(arg)
+    else:
+        path = Path(tempfile.mkdtemp()) / "benchmark.pptx"
+        print(f"⚙️ Generating {int(arg)} slides...")
+        generate_pptx(path, int(arg))
+
+    print("🧪 PPTX Extractor Benchmark")
+    print("=" * 50)
+    print(f"   File: {path} ({path.stat().st_size / 1024:.0f} KB)")
+    print()
+
+    expected, object_model_time = measure(_parse_pptx_object_model, path)
+    parsed, reader_time = measure(read_pptx, path)
+
+    print(f"⚡ python-pptx object model  {object_model_time:8.2f}s")
+    print(f"⚡ direct slide XML reader   {reader_time:8.2f}s  ({object_model_time / max(reader_time, 1e-6):.1f}x)")
+    print()
+
+    same = sum(1 for a, b in zip(expected["slides"], parsed["slides"]) if a == b)
+    print(f"📊 Identical slides: {same}/{len(expected['slides'])}")
+    if expected != parsed:
+        print("❌ Slide items differ from the python-pptx path")
+        sys.exit(1)
+    print("✅ Output identical to the python-pptx path")
+
+if __name__ == "__main__":
+    main()
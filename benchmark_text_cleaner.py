@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Text Cleaner Benchmark
+Check that the single-pass TextCleaner produces exactly the output of the previous
+regex-by-regex clean_text, and compare their throughput in MB/s.
+
+Usage:
+    python benchmark_text_cleaner.py                # 8 MB of generated OCR-like text
+    python benchmark_text_cleaner.py 32             # 32 MB of generated text
+    python benchmark_text_cleaner.py path/to/texts  # every .txt file in a folder
+"""
+
+import re
+import sys
+import time
+import random
+from pathlib import Path
+
+from text_cleaner import TextCleaner, clean_text_with_stats
+
+# Previous implementation, kept verbatim as the reference output
+def legacy_is_garbage_line(line):
+    if len(line.strip()) < 8:
+        return True
+    if sum(c.isalnum() for c in line) / (len(line) + 1e-6) < 0.4:
+        return True
+    if len(re.findall(r'\b[A-Z]{2,}\b', line)) > 3:
+        return True
+    if re.search(r'[^\w\s]{2,}', line):
+        return True
+    return False
+
+def legacy_clean_text(text):
+    if not text:
+        return ""
+    text = re.sub(r'Page\s+\d+\s+of\s+\d+', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'Slide\s+\d+', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'BAYANAT\s+\(?\d{4}\)?', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r'\s{2,}', ' ', text)
+    text = re.sub(r'^[\-\*\d\.\)]\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'[^\x00-\x7F]+', ' ', text)
+    text = re.sub(r'\s*\n\s*', '\n', text)
+    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[email_redacted]', text)
+    text = re.sub(r'\.{3,}\s*\d{1,3}', '', text)
+    text = re.sub(r'Confidential!?|Internal Use Only|Draft Copy', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'Table of Contents', '', text, flags=re.IGNORECASE)
+    lines = text.split('\n')
+    text = '\n'.join(line for line in lines if not legacy_is_garbage_line(line))
+    text = re.sub(r'\n{2,}', '\n', text)
+    text = re.sub(r'[ \t]{2,}', ' ', text)
+    return text.strip()
+
+WORDS = ("the of and services digital transformation provides company project data "
+         "analysis report contract payment terms client support network infrastructure "
+         "security cloud").split()
+
+NOISE_LINES = [
+    "Page {n} of {m}",
+    "Slide {n}",
+    "BAYANAT ({year}) all rights reserved",
+    "- bullet item {words}",
+    "Section {n} ............ {m}",
+    "CONFIDENTIAL  Internal Use Only",
+    "Table of Contents",
+    "contact: john.doe@example.com for details",
+    "ÿþ ̈ ‚ ~~## @@ ¥",
+    "المحتوى العربي هنا مع بعض الكلمات",
+    "ABC DEF GHI JKL MNO",
+    "   \t  ",
+]
+
+def generate_text(megabytes, seed=1):
+    """Build OCR-like text: sentences mixed with headers, footers, TOC lines and noise."""
+    rnd = random.Random(seed)
+    parts = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        if rnd.random() < 0.65:
+            line = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 18))) + rnd.choice([".", "", ":"])
+        else:
+            line = rnd.choice(NOISE_LINES).format(
+                n=rnd.randint(1, 99), m=rnd.randint(1, 300), year=rnd.randint(1990, 2024),
+                words=" ".join(rnd.choice(WORDS) for _ in range(5)))
+        line += rnd.choice(["\n", "\n", "\n", "\n\n", "\n\n\n", " \n", "\n  "])
+        parts.append(line)
+        size += len(line)
+    return "".join(parts)
+
+def load_texts(folder):
+    return [p.read_text(encoding='utf-8', errors='replace') for p in sorted(Path(folder).glob("*.txt"))]
+
+def measure(function, texts):
+    start_time = time.time()
+    outputs = [function(text) for text in texts]
+    return outputs, time.time() - start_time
+
+def streamed(text, piece_chars=4096):
+    """Feed the text in page-sized pieces, as the streaming PDF path does."""
+    cleaner = TextCleaner(window_chars=65536)
+    parts = [cleaner.feed(text[i:i + piece_chars]) for i in range(0, len(text), piece_chars)]
+    parts.append(cleaner.finish())
+    return "".join(parts).strip()
+
+def legacy_with_stats(text):
+    # What process_file_with_ocr used to do: clean for saving, then clean again for counts
+    legacy_clean_text(text)
+    final_text = legacy_clean_text(text)
+    return final_text, len(final_text.split()), len(final_text)
+
+def main():
+    arg = sys.argv[1] if len(sys.argv) > 1 else "8"
+    if Path(arg).is_dir():
+        texts = load_texts(arg)
+        source = arg
+    else:
+        texts = [generate_text(float(arg))]
+        source = "generated OCR-like text"
+
+    if not texts:
+        print("❌ No texts to benchmark")
+        return
+
+    megabytes = sum(len(text.encode('utf-8')) for text in texts) / (1024 * 1024)
+    print("🧪 Text Cleaner Benchmark")
+    print("=" * 50)
+    print(f"   Texts: {len(texts)} ({source}), {megabytes:.1f} MB")
+    print()
+
+    expected, legacy_time = measure(legacy_clean_text, texts)
+    results, engine_time = measure(lambda text: clean_text_with_stats(text)[0], texts)
+    stream_results, stream_time = measure(streamed, texts)
+    _, legacy_stats_time = measure(legacy_with_stats, texts)
+    _, engine_stats_time = measure(clean_text_with_stats, texts)
+
+    print(f"⚡ legacy clean_text     {megabytes / legacy_time:8.2f} MB/s")
+    print(f"⚡ TextCleaner           {megabytes / engine_time:8.2f} MB/s")
+    print(f"⚡ TextCleaner streamed  {megabytes / stream_time:8.2f} MB/s")
+    print()
+    print(f"📊 Clean + statistics (per document in step 2): {legacy_stats_time:.2f}s -> {engine_stats_time:.2f}s "
+          f"({legacy_stats_time / engine_stats_time:.1f}x)")
+
+    same = sum(1 for a, b in zip(expected, results) if a == b)
+    same_streamed = sum(1 for a, b in zip(expected, stream_results) if a == b)
+    print(f"📊 Identical output: {same}/{len(texts)} texts, streamed {same_streamed}/{len(texts)}")
+    if same != len(texts) or same_streamed != len(texts):
+        print("❌ Output differs from the previous clean_text")
+        sys.exit(1)
+    print("✅ Output identical to the previous clean_text")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Persistent cache of per-chunk work (embeddings and QA pairs), keyed by the chunk's content.
+
+Chunks are identified by ``content_hash``, the SHA-256 of their text, rather than by their
+position in the document. When a revised document is chunked again, every chunk whose text
+did not change finds its embedding and QA pairs here, wherever it now sits in the file.
+"""
+import os
+import json
+import time
+import array
+import hashlib
+import sqlite3
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Chunk cache configuration
+CHUNK_CACHE_ENABLED = os.getenv('CHUNK_CACHE', 'true').lower() == 'true'
+CHUNK_CACHE_DB = os.getenv('CHUNK_CACHE_DB', './output/chunk_cache.sqlite')
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+
+# Bump when the cache tables change so an older database is rebuilt
+CHUNK_CACHE_VERSION = 1
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def chunk_content_hash(text):
+    """SHA-256 of a chunk's text, the chunk's identity in the cache."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class ChunkCache:
+    """SQLite cache: one row per (embedding model, chunk) and per (QA settings, chunk)."""
+
+    def __init__(self, db_path=CHUNK_CACHE_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # QA generation runs chunks one by one, possibly from the watch daemon's thread
+        self.db = sqlite3.connect(str(self.db_path), isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != CHUNK_CACHE_VERSION:
+            self.db.executescript("""
+                DROP TABLE IF EXISTS embeddings;
+                DROP TABLE IF EXISTS qa_pairs;
+            """)
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT, content_hash TEXT, embedding BLOB, created_at REAL,
+                PRIMARY KEY (model, content_hash));
+            CREATE TABLE IF NOT EXISTS qa_pairs (
+                settings TEXT, content_hash TEXT, pairs TEXT, created_at REAL,
+                PRIMARY KEY (settings, content_hash));
+            PRAGMA user_version = {CHUNK_CACHE_VERSION};
+        """)
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def _settings_key(settings):
+        return json.dumps(settings, sort_keys=True)
+
+    def get_embeddings(self, model, content_hashes):
+        """{content hash: embedding} for the given chunks that ``model`` has embedded before."""
+        content_hashes = list(dict.fromkeys(content_hashes))
+        found = {}
+        # SQLite limits the number of parameters of one statement
+        for i in range(0, len(content_hashes), 500):
+            batch = content_hashes[i:i + 500]
+            rows = self.db.execute(
+                f"SELECT content_hash, embedding FROM embeddings WHERE model = ? AND content_hash IN ({','.join('?' * len(batch))})",
+                [model, *batch])
+            for content_hash, blob in rows:
+                found[content_hash] = array.array('d', blob).tolist()
+        return found
+
+    def put_embeddings(self, model, embeddings):
+        """Store {content hash: embedding} for ``model``."""
+        now = time.time()
+        self.db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                            [(model, content_hash, array.array('d', embedding).tobytes(), now)
+                             for content_hash, embedding in embeddings.items()])
+
+    def get_qa_pairs(self, settings, content_hash):
+        """QA pairs generated for the chunk with these settings, or None."""
+        row = self.db.execute("SELECT pairs FROM qa_pairs WHERE settings = ? AND content_hash = ?",
+                              (self._settings_key(settings), content_hash)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_qa_pairs(self, settings, content_hash, pairs):
+        self.db.execute("INSERT OR REPLACE INTO qa_pairs VALUES (?, ?, ?, ?)",
+                        (self._settings_key(settings), content_hash, json.dumps(pairs, ensure_ascii=False), time.time()))
+
+# One cache connection per process
+_chunk_cache = None
+
+def get_chunk_cache():
+    """Return the process-wide chunk cache, or None when it is disabled or cannot be opened."""
+    global _chunk_cache
+    if not CHUNK_CACHE_ENABLED:
+        return None
+    if _chunk_cache is None:
+        try:
+            _chunk_cache = ChunkCache()
+        except (OSError, sqlite3.Error) as e:
+            log_verbose(f"Chunk cache unavailable ({e}); every chunk is processed", "warning")
+            return None
+    return _chunk_cache
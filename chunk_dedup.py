@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate chunk detection across the corpus, with MinHash signatures and LSH banding.
+
+Boilerplate (standard contract clauses, the company profile pasted into every proposal)
+comes out of chunking as many near-identical chunks. Each chunk gets a MinHash signature
+of its word shingles; the signature is cut into bands, and a chunk sharing a band with an
+earlier chunk is compared with it on the whole signature. When the estimated Jaccard
+similarity reaches CHUNK_DEDUP_THRESHOLD, the chunk is recorded as a duplicate of that
+earlier (canonical) chunk and QA generation does not send it to the model.
+
+Usage:
+    python chunk_dedup.py    # deduplicate every chunk file in QA_INPUT_FOLDER
+"""
+import os
+import json
+import zlib
+import sqlite3
+import functools
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+from chunk_cache import chunk_content_hash
+
+load_dotenv()
+
+# Deduplication configuration
+CHUNK_DEDUP_ENABLED = os.getenv('CHUNK_DEDUP', 'true').lower() == 'true'
+# Estimated Jaccard similarity of word shingles from which a chunk counts as a duplicate
+CHUNK_DEDUP_THRESHOLD = float(os.getenv('CHUNK_DEDUP_THRESHOLD', '0.85'))
+# "link": duplicates get the Q&A pairs of their canonical chunk; "drop": they get none
+CHUNK_DEDUP_MODE = os.getenv('CHUNK_DEDUP_MODE', 'link').lower()
+CHUNK_DEDUP_DB = os.getenv('CHUNK_DEDUP_DB', './output/chunk_dedup.sqlite')
+# Duplicates of the last full run and their canonical chunks, for review
+CHUNK_DEDUP_REPORT = os.getenv('CHUNK_DEDUP_REPORT', './output/chunk_duplicates.json')
+MINHASH_PERMUTATIONS = int(os.getenv('MINHASH_PERMUTATIONS', '128'))
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+
+# Words per shingle
+SHINGLE_WORDS = 5
+# Chance that a pair exactly at the threshold shares a band and is compared
+LSH_RECALL = 0.95
+MINHASH_SEED = 1
+# Shingles hashed in one NumPy operation (times MINHASH_PERMUTATIONS 8-byte values)
+MINHASH_BATCH_SHINGLES = 1 << 15
+MAX_HASH = np.uint64((1 << 32) - 1)
+MIX_BASE = np.uint64(0x100000001B3)
+
+# Bump when the index tables or the signatures change so an older database is rebuilt
+CHUNK_DEDUP_VERSION = 1
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def lsh_bands(threshold, num_perm):
+    """(bands, rows per band) for LSH over num_perm MinHash values.
+
+    Uses the most rows per band (the fewest candidate pairs to verify) that still makes a
+    pair at ``threshold`` a candidate with probability LSH_RECALL.
+    """
+    bands, rows = num_perm, 1
+    for r in range(1, num_perm + 1):
+        b = num_perm // r
+        if 1 - (1 - threshold ** r) ** b >= LSH_RECALL:
+            bands, rows = b, r
+    return bands, rows
+
+@functools.lru_cache(maxsize=None)
+def _permutations(num_perm):
+    """Coefficients (a, b) of the num_perm multiply-shift hash functions ((a * x + b) mod 2^64) >> 32."""
+    rng = np.random.RandomState(MINHASH_SEED)
+    a = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+def shingle_hashes(text, k=SHINGLE_WORDS):
+    """Unique 32-bit hashes of the text's k-word shingles, case-insensitive."""
+    words = text.lower().split()
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words))
+    k = min(k, len(words))
+    count = len(words) - k + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for j in range(k):
+        shingles = shingles * MIX_BASE + word_hashes[j:j + count]
+    return np.unique((shingles ^ (shingles >> np.uint64(32))) & MAX_HASH)
+
+def minhash_signatures(texts, num_perm=MINHASH_PERMUTATIONS):
+    """MinHash signatures of texts as a (len(texts), num_perm) uint32 array."""
+    a, b = _permutations(num_perm)
+    shingles = [shingle_hashes(text) for text in texts]
+    signatures = np.full((len(texts), num_perm), MAX_HASH, dtype=np.uint32)
+
+    start = 0
+    while start < len(texts):
+        # Hash the shingles of as many texts together as fit in one batch
+        end, size = start, 0
+        while end < len(texts) and (end == start or size + len(shingles[end]) <= MINHASH_BATCH_SHINGLES):
+            size += len(shingles[end])
+            end += 1
+        rows = [i for i in range(start, end) if len(shingles[i])]
+        if rows:
+            values = np.concatenate([shingles[i] for i in rows])
+            # Multiply-shift hashing wraps around 2^64 by design, and avoids a slow modulo
+            hashed = values[:, None] * a
+            hashed += b
+            hashed >>= np.uint64(32)
+            offsets = np.cumsum([0] + [len(shingles[i]) for i in rows[:-1]])
+            signatures[rows] = np.minimum.reduceat(hashed, offsets, axis=0)
+        start = end
+    return signatures
+
+def band_keys(signatures, bands, rows):
+    """One bucket key per band of each signature, as an int64 array of shape (len(signatures), bands)."""
+    banded = signatures[:, :bands * rows].reshape(len(signatures), bands, rows).astype(np.uint64)
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for r in range(rows):
+        keys = keys * MIX_BASE + banded[:, :, r]
+    return keys.view(np.int64)
+
+class ChunkDedupIndex:
+    """SQLite index of the corpus' chunks: their signatures, the band buckets of canonical
+    chunks, and for each chunk the canonical chunk it duplicates, if any."""
+
+    def __init__(self, db_path=CHUNK_DEDUP_DB, threshold=CHUNK_DEDUP_THRESHOLD, num_perm=MINHASH_PERMUTATIONS):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # QA generation may look chunks up from the watch daemon's thread
+        self.db = sqlite3.connect(str(self.db_path), isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+
+        settings = json.dumps({"threshold": threshold, "num_perm": num_perm, "shingle_words": SHINGLE_WORDS})
+        self.db.execute("CREATE TABLE IF NOT EXISTS settings (value TEXT)")
+        stored = self.db.execute("SELECT value FROM settings").fetchone()
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != CHUNK_DEDUP_VERSION or (stored and stored[0] != settings):
+            self.db.executescript("""
+                DROP TABLE IF EXISTS signatures;
+                DROP TABLE IF EXISTS chunks;
+                DROP TABLE IF EXISTS bands;
+                DELETE FROM settings;
+            """)
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS signatures (content_hash TEXT PRIMARY KEY, signature BLOB);
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_file TEXT, chunk_id TEXT, content_hash TEXT,
+                canonical_file TEXT, canonical_id TEXT, canonical_hash TEXT, similarity REAL,
+                PRIMARY KEY (chunk_file, chunk_id));
+            CREATE INDEX IF NOT EXISTS chunks_canonical ON chunks (canonical_file);
+            CREATE TABLE IF NOT EXISTS bands (band INTEGER, bucket INTEGER, chunk_file TEXT, chunk_id TEXT, content_hash TEXT);
+            CREATE INDEX IF NOT EXISTS bands_bucket ON bands (bucket, band);
+            CREATE INDEX IF NOT EXISTS bands_file ON bands (chunk_file);
+            PRAGMA user_version = {CHUNK_DEDUP_VERSION};
+        """)
+        if not self.db.execute("SELECT 1 FROM settings").fetchone():
+            self.db.execute("INSERT INTO settings VALUES (?)", (settings,))
+
+    def close(self):
+        self.db.close()
+
+    def _stored_signatures(self, content_hashes):
+        """{content hash: signature} for the given chunks that have been seen before."""
+        content_hashes = list(dict.fromkeys(content_hashes))
+        found = {}
+        # SQLite limits the number of parameters of one statement
+        for i in range(0, len(content_hashes), 500):
+            batch = content_hashes[i:i + 500]
+            rows = self.db.execute(
+                f"SELECT content_hash, signature FROM signatures WHERE content_hash IN ({','.join('?' * len(batch))})", batch)
+            for content_hash, blob in rows:
+                found[content_hash] = np.frombuffer(blob, dtype=np.uint32)
+        return found
+
+    def signatures(self, texts, content_hashes):
+        """Signatures of the texts, computed only for content not seen before."""
+        found = self._stored_signatures(content_hashes)
+        missing = {content_hash: text for text, content_hash in zip(texts, content_hashes) if content_hash not in found}
+        if missing:
+            computed = minhash_signatures(list(missing.values()), self.num_perm)
+            found.update(zip(missing, computed))
+            self.db.executemany("INSERT OR REPLACE INTO signatures VALUES (?, ?)",
+                                [(content_hash, found[content_hash].tobytes()) for content_hash in missing])
+        return np.array([found[content_hash] for content_hash in content_hashes], dtype=np.uint32).reshape(-1, self.num_perm)
+
+    def forget(self, chunk_file):
+        """Drop the chunks of a chunk file, and the duplicate links pointing at them."""
+        self.db.execute("DELETE FROM bands WHERE chunk_file = ?", (chunk_file,))
+        self.db.execute("DELETE FROM chunks WHERE chunk_file = ? OR canonical_file = ?", (chunk_file, chunk_file))
+
+    def reset(self):
+        """Forget every chunk (signatures are kept), before a full run over the corpus."""
+        self.db.executescript("DELETE FROM bands; DELETE FROM chunks;")
+
+    def _best_match(self, signature, keys):
+        """(chunk_file, chunk_id, content_hash, similarity) of the most similar canonical chunk sharing a band."""
+        wanted = set(enumerate(keys.tolist()))
+        rows = self.db.execute(
+            f"SELECT band, bucket, chunk_file, chunk_id, content_hash FROM bands WHERE bucket IN ({','.join('?' * len(keys))}) ORDER BY rowid",
+            keys.tolist())
+        candidates = list(dict.fromkeys(row[2:] for row in rows if row[:2] in wanted))
+        if not candidates:
+            return None
+        stored = self._stored_signatures([content_hash for _, _, content_hash in candidates])
+        best = None
+        for chunk_file, chunk_id, content_hash in candidates:
+            similarity = float(np.mean(stored[content_hash] == signature))
+            if best is None or similarity > best[3]:
+                best = (chunk_file, chunk_id, content_hash, similarity)
+        return best
+
+    def add_chunks(self, chunk_file, chunks):
+        """Index the chunks of one chunk file, in order, against every chunk indexed before.
+
+        A chunk at least CHUNK_DEDUP_THRESHOLD similar to an indexed canonical chunk is
+        recorded as its duplicate; any other chunk becomes canonical. Returns the duplicates
+        as dicts with the chunk, its canonical chunk and their similarity.
+        """
+        # Chunks without an id are numbered over the whole file, empty ones included, as QA generation does
+        chunks = [(chunk.get("chunk_id", f"chunk_{i}"), chunk) for i, chunk in enumerate(chunks, 1)
+                  if chunk.get("text", "").strip()]
+        texts = [chunk["text"] for _, chunk in chunks]
+        content_hashes = [chunk.get("content_hash") or chunk_content_hash(text) for (_, chunk), text in zip(chunks, texts)]
+
+        self.db.execute("BEGIN")
+        try:
+            self.forget(chunk_file)
+            signatures = self.signatures(texts, content_hashes)
+            keys = band_keys(signatures, self.bands, self.rows)
+            duplicates = []
+            for i, (chunk_id, _) in enumerate(chunks):
+                match = self._best_match(signatures[i], keys[i])
+                if match is not None and match[3] >= self.threshold:
+                    canonical_file, canonical_id, canonical_hash, similarity = match
+                    self.db.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    (chunk_file, chunk_id, content_hashes[i], canonical_file, canonical_id, canonical_hash, similarity))
+                    duplicates.append({"chunk_file": chunk_file, "chunk_id": chunk_id,
+                                       "duplicate_of": {"chunk_file": canonical_file, "chunk_id": canonical_id},
+                                       "similarity": round(similarity, 3)})
+                else:
+                    self.db.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, NULL, NULL, NULL, NULL)",
+                                    (chunk_file, chunk_id, content_hashes[i]))
+                    self.db.executemany("INSERT INTO bands VALUES (?, ?, ?, ?, ?)",
+                                        [(band, bucket, chunk_file, chunk_id, content_hashes[i])
+                                         for band, bucket in enumerate(keys[i].tolist())])
+            self.db.execute("COMMIT")
+        except sqlite3.Error:
+            self.db.execute("ROLLBACK")
+            raise
+        return duplicates
+
+    def duplicate_of(self, chunk_file, chunk_id, content_hash):
+        """The canonical chunk this chunk duplicates, as a dict, or None.
+
+        None as well when the chunk's text is not the one that was indexed.
+        """
+        row = self.db.execute(
+            "SELECT canonical_file, canonical_id, canonical_hash, similarity FROM chunks "
+            "WHERE chunk_file = ? AND chunk_id = ? AND content_hash = ? AND canonical_id IS NOT NULL",
+            (chunk_file, chunk_id, content_hash)).fetchone()
+        if row is None:
+            return None
+        return {"chunk_file": row[0], "chunk_id": row[1], "content_hash": row[2], "similarity": row[3]}
+
+# One index connection per process
+_chunk_dedup = None
+
+def get_chunk_dedup():
+    """Return the process-wide dedup index, or None when deduplication is disabled or the index cannot be opened."""
+    global _chunk_dedup
+    if not CHUNK_DEDUP_ENABLED:
+        return None
+    if _chunk_dedup is None:
+        try:
+            _chunk_dedup = ChunkDedupIndex()
+        except (OSError, sqlite3.Error) as e:
+            log_verbose(f"Chunk dedup index unavailable ({e}); every chunk goes to QA", "warning")
+            return None
+    return _chunk_dedup
+
+def load_chunk_file(chunk_file):
+    """Chunk records of a chunk file, or None when it is not a list of chunks."""
+    try:
+        with open(chunk_file, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+    except (OSError, ValueError) as e:
+        log_verbose(f"Cannot read {Path(chunk_file).name}: {e}", "warning")
+        return None
+    if not isinstance(chunks, list) or not all(isinstance(chunk, dict) for chunk in chunks):
+        return None
+    return chunks
+
+def dedup_chunk_file(chunk_file):
+    """Index one chunk file against the chunks seen before it. Returns its duplicates."""
+    index = get_chunk_dedup()
+    if index is None:
+        return []
+    chunks = load_chunk_file(chunk_file)
+    if chunks is None:
+        return []
+    duplicates = index.add_chunks(Path(chunk_file).name, chunks)
+    if duplicates:
+        log_verbose(f"{len(duplicates)}/{len(chunks)} chunks of {Path(chunk_file).name} are near-duplicates", "info")
+    return duplicates
+
+def deduplicate_chunk_files(input_dir=os.getenv("QA_INPUT_FOLDER", "./output/chunked_output")):
+    """Find near-duplicate chunks across every chunk file of the folder.
+
+    Files are indexed in name order, so the canonical chunk of a group is the first one in
+    that order. The duplicates and their canonical chunks are written to CHUNK_DEDUP_REPORT.
+    Returns the number of chunk files and of duplicates.
+    """
+    index = get_chunk_dedup()
+    if index is None:
+        return None
+
+    chunk_files = sorted(Path(input_dir).glob("*.json"))
+    print(f"🔁 Looking for near-duplicate chunks in {len(chunk_files)} files "
+          f"(similarity ≥ {index.threshold}, {index.bands} bands of {index.rows})")
+    index.reset()
+    duplicates = []
+    chunk_count = 0
+    for chunk_file in chunk_files:
+        chunks = load_chunk_file(chunk_file)
+        if chunks is None:
+            continue
+        chunk_count += len(chunks)
+        duplicates.extend(index.add_chunks(chunk_file.name, chunks))
+
+    report_path = Path(CHUNK_DEDUP_REPORT)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"threshold": index.threshold, "mode": CHUNK_DEDUP_MODE, "duplicates": duplicates}, f, indent=2, ensure_ascii=False)
+
+    print(f"   🔁 {len(duplicates)}/{chunk_count} chunks are near-duplicates of another chunk "
+          f"({'linked to' if CHUNK_DEDUP_MODE == 'link' else 'dropped in favour of'} their canonical chunk)")
+    log_verbose(f"Duplicate report saved to {report_path}", "success")
+    return {"files": len(chunk_files), "chunks": chunk_count, "duplicates": len(duplicates)}
+
+if __name__ == "__main__":
+    if not CHUNK_DEDUP_ENABLED:
+        print("⚠️ CHUNK_DEDUP is false; nothing to do")
+    else:
+        deduplicate_chunk_files()
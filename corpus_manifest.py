@@ -0,0 +1,263 @@
+"""Persistent manifest of the files in the corpus and of what each stage has done with them.
+
+Every stage lists its input folder through ``scan_corpus``: nested folders are walked with
+``os.scandir`` and each file's size and mtime are compared with the SQLite manifest, so only
+new or modified files are hashed and typed again. Stages record their result per file under
+the content hash and settings they ran with, and on the next run ``reusable`` hands back the
+results of files that have not changed, leaving only the changed files as work.
+"""
+import os
+import json
+import time
+import sqlite3
+import concurrent.futures
+from collections import namedtuple
+from pathlib import Path
+from dotenv import load_dotenv
+from extraction_cache import hash_file
+
+load_dotenv()
+
+# Manifest configuration
+CORPUS_MANIFEST_ENABLED = os.getenv('CORPUS_MANIFEST', 'true').lower() == 'true'
+CORPUS_MANIFEST_DB = os.getenv('CORPUS_MANIFEST_DB', './output/corpus_manifest.sqlite')
+# Walk sub-folders of the data folder (folders starting with "." are skipped)
+SCAN_RECURSIVE = os.getenv('SCAN_RECURSIVE', 'true').lower() == 'true'
+# Threads hashing new or modified files during a scan
+MANIFEST_HASH_WORKERS = int(os.getenv('MANIFEST_HASH_WORKERS', '4'))
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+
+# Bump when the manifest tables change so an older database is rebuilt
+MANIFEST_VERSION = 1
+
+# A file found by a scan; ``hash`` and ``type`` are None when the manifest is disabled
+CorpusFile = namedtuple('CorpusFile', ['path', 'size', 'mtime_ns', 'hash', 'type'])
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def _has_extension(name, extensions):
+    return extensions is None or name.lower().endswith(extensions)
+
+def walk_files(root, recursive=True, extensions=None):
+    """Yield (path, DirEntry) for the regular files under root, using os.scandir.
+
+    Symlinked folders are not followed, and folders starting with "." (snapshots,
+    version control) are skipped. ``extensions`` limits the files to those names.
+    """
+    extensions = tuple(extensions) if extensions is not None else None
+    stack = [str(root)]
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            if _has_extension(entry.name, extensions):
+                                yield entry.path, entry
+                        elif recursive and entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                            stack.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            log_verbose(f"Cannot read folder {folder}: {e}", "warning")
+
+def detect_type(path):
+    """Document type from the file's first bytes, so a misnamed file is recognised."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(512)
+    except OSError:
+        return "unreadable"
+
+    ext = Path(path).suffix.lower()
+    if b'%PDF-' in head[:1024]:
+        return "pdf"
+    if head.startswith(b'PK\x03\x04') or head.startswith(b'PK\x05\x06'):
+        return ext.lstrip('.') if ext in ('.docx', '.pptx') else "zip"
+    if head.startswith(b'\x1f\x8b') or head.startswith(b'BZh') or head.startswith(b'\xfd7zXZ\x00') \
+            or head[257:262] == b'ustar':
+        return "tar"
+    if not head or b'\x00' not in head:
+        return "text"
+    return "binary"
+
+def _fingerprint(path):
+    """(hash, type) of a new or modified file, or (None, "unreadable")."""
+    try:
+        return hash_file(path), detect_type(path)
+    except OSError:
+        return None, "unreadable"
+
+def _output_signature(path):
+    """[path, size, mtime_ns] of an output file, or None when it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [str(path), stat.st_size, stat.st_mtime_ns]
+
+class CorpusManifest:
+    """SQLite manifest: one row per file (size, mtime, hash, type) and one per file and stage."""
+
+    def __init__(self, db_path=CORPUS_MANIFEST_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.db_path), isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != MANIFEST_VERSION:
+            self.db.executescript("""
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS stages;
+            """)
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT, type TEXT, scanned_at REAL);
+            CREATE TABLE IF NOT EXISTS stages (
+                stage TEXT, settings TEXT, path TEXT, hash TEXT, result TEXT, outputs TEXT, updated_at REAL,
+                PRIMARY KEY (stage, path));
+            PRAGMA user_version = {MANIFEST_VERSION};
+        """)
+
+    def close(self):
+        self.db.close()
+
+    def scan(self, root, recursive=SCAN_RECURSIVE, extensions=None):
+        """List every file under root, hashing and typing only new or modified ones.
+
+        With ``extensions`` only files whose names end in one of them are listed. Rows of
+        files that have disappeared are dropped. Returns CorpusFile entries whose paths are
+        under ``root`` as given.
+        """
+        root = str(root)
+        root_abs = os.path.abspath(root)
+        extensions = tuple(extensions) if extensions is not None else None
+        prefix = os.path.join(root_abs, '')
+        known = {row[0]: row[1:] for row in self.db.execute(
+            "SELECT path, size, mtime_ns, hash, type FROM files WHERE path >= ? AND path < ?",
+            (prefix, prefix + '\U0010ffff'))}
+
+        found = []
+        changed = []
+        for path, entry in walk_files(root_abs, recursive, extensions):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            row = known.pop(path, None)
+            if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                found.append((path, stat.st_size, stat.st_mtime_ns, row[2], row[3]))
+            else:
+                changed.append((path, stat.st_size, stat.st_mtime_ns))
+
+        if changed:
+            log_verbose(f"Hashing {len(changed)} new or modified files", "process")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, MANIFEST_HASH_WORKERS)) as executor:
+                fingerprints = executor.map(_fingerprint, [path for path, _, _ in changed])
+                changed = [(path, size, mtime_ns, file_hash, file_type)
+                           for (path, size, mtime_ns), (file_hash, file_type) in zip(changed, fingerprints)]
+
+        # Files outside a non-recursive or filtered scan are not gone, only not looked at
+        removed = [path for path in known if (recursive or os.path.dirname(path) == root_abs)
+                   and _has_extension(path, extensions)]
+        now = time.time()
+        self.db.execute("BEGIN")
+        try:
+            # Unreadable files get no signature, so the next scan looks at them again
+            self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                                [(path, size if file_hash else -1, mtime_ns, file_hash, file_type, now)
+                                 for path, size, mtime_ns, file_hash, file_type in changed])
+            self.db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+            self.db.executemany("DELETE FROM stages WHERE path = ?", [(path,) for path in removed])
+            self.db.execute("COMMIT")
+        except sqlite3.Error:
+            self.db.execute("ROLLBACK")
+            raise
+
+        log_verbose(f"Scanned {len(found) + len(changed)} files under {root}: {len(changed)} new or modified, {len(removed)} removed", "info")
+        return [CorpusFile(Path(root) / os.path.relpath(path, root_abs), size, mtime_ns, file_hash, file_type)
+                for path, size, mtime_ns, file_hash, file_type in found + changed]
+
+    @staticmethod
+    def _settings_key(settings):
+        return json.dumps(settings, sort_keys=True)
+
+    def reusable(self, stage, settings, paths):
+        """Results ``stage`` recorded with these settings for files whose content has not changed since.
+
+        A result is only returned while the output files recorded with it are still the
+        ones that run wrote. Returns {path: result} for the given paths that have one.
+        """
+        wanted = {os.path.abspath(path): path for path in paths}
+        rows = self.db.execute(
+            "SELECT s.path, s.result, s.outputs FROM stages s JOIN files f ON f.path = s.path AND f.hash = s.hash "
+            "WHERE s.stage = ? AND s.settings = ?", (stage, self._settings_key(settings)))
+        return {wanted[path]: json.loads(result) for path, result, outputs in rows
+                if path in wanted and all(_output_signature(output) == [output, *signature]
+                                          for output, *signature in json.loads(outputs))}
+
+    def record(self, stage, settings, results):
+        """Store ``stage``'s result for each (path, result, output files) under the file's current hash."""
+        now = time.time()
+        settings_key = self._settings_key(settings)
+        self.db.execute("BEGIN")
+        try:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO stages SELECT ?, ?, path, hash, ?, ?, ? FROM files WHERE path = ? AND hash IS NOT NULL",
+                [(stage, settings_key, json.dumps(result), json.dumps([signature for signature in map(_output_signature, outputs) if signature]),
+                  now, os.path.abspath(path))
+                 for path, result, outputs in results])
+            self.db.execute("COMMIT")
+        except sqlite3.Error:
+            self.db.execute("ROLLBACK")
+            raise
+
+# One manifest connection per process; only the parent process of each stage uses it
+_corpus_manifest = None
+
+def get_corpus_manifest():
+    """Return the process-wide corpus manifest, or None when it is disabled or cannot be opened."""
+    global _corpus_manifest
+    if not CORPUS_MANIFEST_ENABLED:
+        return None
+    if _corpus_manifest is None:
+        try:
+            _corpus_manifest = CorpusManifest()
+        except (OSError, sqlite3.Error) as e:
+            log_verbose(f"Corpus manifest unavailable ({e}); scanning without it", "warning")
+            return None
+    return _corpus_manifest
+
+def scan_corpus(root, recursive=SCAN_RECURSIVE, extensions=None):
+    """Every file under root (ending in one of ``extensions``) as CorpusFile entries, through the manifest when it is enabled."""
+    manifest = get_corpus_manifest()
+    if manifest is not None:
+        try:
+            return manifest.scan(root, recursive, extensions)
+        except sqlite3.Error as e:
+            log_verbose(f"Corpus manifest scan failed ({e}); scanning without it", "warning")
+
+    root_abs = os.path.abspath(root)
+    files = []
+    for path, entry in walk_files(root_abs, recursive, extensions):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        files.append(CorpusFile(Path(root) / os.path.relpath(path, root_abs), stat.st_size, stat.st_mtime_ns, None, None))
+    return files
@@ -0,0 +1,367 @@
+import os
+import json
+import zipfile
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+import pdfplumber
+from docx import Document
+from pptx import Presentation
+from dotenv import load_dotenv
+from extraction_cache import hash_file
+from archive_reader import document_input, open_document
+from office_xml_extractors import read_docx, read_pptx
+
+load_dotenv()
+
+# Parsed documents written by the inspection step and read back by the extraction step
+SHARE_PARSED_DOCUMENTS = os.getenv('SHARE_PARSED_DOCUMENTS', 'true').lower() == 'true'
+PARSED_DOCUMENTS_DIR = os.getenv('PARSED_DOCUMENTS_DIR', './output/parsed_documents')
+# Least recently used parsed documents are deleted once the folder grows past this size
+PARSED_DOCUMENTS_MAX_MB = float(os.getenv('PARSED_DOCUMENTS_MAX_MB', '1024'))
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+# Read DOCX files in one streaming pass over their XML (python-docx is the fallback)
+DOCX_XML_READER = os.getenv('DOCX_XML_READER', 'true').lower() == 'true'
+# Read PPTX slides straight from their XML (python-pptx is the fallback)
+PPTX_XML_READER = os.getenv('PPTX_XML_READER', 'true').lower() == 'true'
+
+# Bump when the parsed document layout changes so older files are parsed again
+PARSER_VERSION = 2
+
+PARSED_EXTENSIONS = (".pdf", ".docx", ".pptx")
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def _release_page(page):
+    try:
+        if hasattr(page, 'close'):
+            page.close()
+        else:
+            page.flush_cache()
+    except Exception:
+        pass
+
+def _read_pdf_pages_pypdf2(path):
+    import PyPDF2
+    with open_document(path) as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        pages = []
+        for page in pdf_reader.pages:
+            try:
+                pages.append(page.extract_text() or "")
+            except Exception:
+                pages.append("")
+        return pages
+
+def parse_pdf(path):
+    """Read the text layer of every PDF page.
+
+    ``method`` records which library produced ``pages``: "pdfplumber", "PyPDF2"
+    when pdfplumber could not open the file, or "failed".
+    """
+    try:
+        pages = []
+        with pdfplumber.open(document_input(path)) as pdf:
+            for page_num, page in enumerate(pdf.pages):
+                try:
+                    pages.append(page.extract_text() or "")
+                except Exception as e:
+                    log_verbose(f"Failed direct text extraction on page {page_num + 1}: {e}", "warning")
+                    pages.append("")
+                _release_page(page)
+        return {"format": "pdf", "method": "pdfplumber", "pages": pages}
+    except Exception:
+        pass
+
+    # If pdfplumber fails completely, try PyPDF2 as fallback
+    try:
+        return {"format": "pdf", "method": "PyPDF2", "pages": _read_pdf_pages_pypdf2(path)}
+    except Exception:
+        return {"format": "pdf", "method": "failed", "pages": []}
+
+def _block_text(block):
+    if block["kind"] == "table":
+        return "\n".join(" | ".join(row) for row in block["rows"] if row)
+    return block["text"]
+
+def docx_text_blocks(parsed):
+    """Text of every block of a parsed DOCX: the body in document order, then headers and footers."""
+    blocks = parsed["blocks"] + parsed["headers"] + parsed["footers"]
+    return [text for text in (_block_text(block) for block in blocks) if text]
+
+def _paragraph_blocks(paragraphs, kind="paragraph"):
+    return [{"kind": kind, "text": p.text.strip()} for p in paragraphs if p.text.strip()]
+
+def _parse_docx_object_model(path):
+    """python-docx version of read_docx, for packages the XML reader cannot handle."""
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+
+    doc = Document(document_input(path))
+    parsed = {"format": "docx", "blocks": [], "headers": [], "footers": [], "images": []}
+
+    parsed["blocks"] = _paragraph_blocks(doc.paragraphs)
+
+    # Tables keep only their non-empty cells, row by row
+    try:
+        for table in doc.tables:
+            rows = []
+            for row in table.rows:
+                # A merged cell is listed once per grid column it spans; keep it once
+                cells = list({id(cell._tc): cell for cell in row.cells}.values())
+                rows.append([cell.text.strip() for cell in cells if cell.text.strip()])
+            if any(rows):
+                parsed["blocks"].append({"kind": "table", "rows": rows})
+    except Exception as e:
+        log_verbose(f"Failed to extract table content: {e}", "warning")
+
+    # Text boxes, skipping the VML copy kept for older readers
+    try:
+        fallback = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+        for textbox in doc.element.body.iter(qn('w:txbxContent')):
+            if any(ancestor.tag == fallback for ancestor in textbox.iterancestors()):
+                continue
+            paragraphs = [Paragraph(p, doc._body) for p in textbox.iter(qn('w:p'))]
+            parsed["blocks"].extend(_paragraph_blocks(paragraphs, "textbox"))
+    except Exception as e:
+        log_verbose(f"Failed to extract text from shapes/textboxes: {e}", "warning")
+
+    for section_part, key in (("header", "headers"), ("footer", "footers")):
+        try:
+            for section in doc.sections:
+                part = getattr(section, section_part)
+                if part:
+                    parsed[key].extend(_paragraph_blocks(part.paragraphs))
+        except Exception as e:
+            log_verbose(f"Failed to extract {section_part} content: {e}", "warning")
+
+    # Embedded images are recorded by package part name and read later only if OCR needs them
+    for rel in doc.part.rels.values():
+        if rel.is_external or "image" not in rel.target_ref:
+            continue
+        try:
+            parsed["images"].append(str(rel.target_part.partname))
+        except Exception as e:
+            log_verbose(f"Failed to extract image from DOCX: {e}", "warning")
+
+    return parsed
+
+def parse_docx(path):
+    """Collect the text blocks and embedded image part names of a DOCX file.
+
+    Body blocks are paragraphs, tables (rows of non-empty cells) and text box
+    paragraphs in document order; headers and footers are lists of blocks too.
+    """
+    if DOCX_XML_READER:
+        try:
+            return read_docx(path)
+        except (KeyError, ET.ParseError) as e:
+            log_verbose(f"XML reader could not parse {Path(path).name}, using python-docx: {e}", "warning")
+    return _parse_docx_object_model(path)
+
+def _shape_text(shape):
+    """Text of a shape or its text frame, or None."""
+    if hasattr(shape, "text") and shape.text and shape.text.strip():
+        return shape.text.strip()
+    if hasattr(shape, "text_frame") and shape.text_frame:
+        try:
+            if hasattr(shape.text_frame, "text") and shape.text_frame.text.strip():
+                return shape.text_frame.text.strip()
+            paragraph_texts = [p.text.strip() for p in shape.text_frame.paragraphs if p.text and p.text.strip()]
+            if paragraph_texts:
+                return "\n".join(paragraph_texts)
+        except Exception:
+            pass
+    return None
+
+def _parse_pptx_object_model(path):
+    """python-pptx version of read_pptx, for packages the XML reader does not recognise."""
+    prs = Presentation(document_input(path))
+    slides = []
+
+    for slide_num, slide in enumerate(prs.slides):
+        items = []
+        for shape in slide.shapes:
+            try:
+                # Direct text, falling back to the text frame's paragraphs
+                text = _shape_text(shape)
+                if text:
+                    items.append({"kind": "text", "text": text})
+                    continue
+
+                if shape.shape_type == 19:  # MSO_SHAPE_TYPE.TABLE
+                    try:
+                        if hasattr(shape, "table") and shape.table:
+                            table_text = []
+                            for row in shape.table.rows:
+                                row_text = [cell.text.strip() for cell in row.cells if cell.text and cell.text.strip()]
+                                if row_text:
+                                    table_text.append(" | ".join(row_text))
+                            if table_text:
+                                items.append({"kind": "table", "text": "\n".join(table_text)})
+                    except Exception as table_e:
+                        log_verbose(f"Failed to extract table from slide {slide_num + 1}: {table_e}", "warning")
+
+                elif shape.shape_type == 6:  # MSO_SHAPE_TYPE.GROUP
+                    try:
+                        if hasattr(shape, 'shapes'):
+                            group_texts = [t for t in (_shape_text(s) for s in shape.shapes) if t]
+                            if group_texts:
+                                items.append({"kind": "group", "text": "\n".join(group_texts)})
+                    except Exception as group_e:
+                        log_verbose(f"Failed to extract text from grouped shapes in slide {slide_num + 1}: {group_e}", "warning")
+
+                elif shape.shape_type == 13:  # Picture/Image
+                    rel_id = shape._element.blip_rId
+                    if rel_id:
+                        items.append({"kind": "image", "part": str(slide.part.related_part(rel_id).partname)})
+
+            except AttributeError:
+                # Shape doesn't have expected attributes - this is normal, skip silently
+                continue
+            except Exception as e:
+                if "shape does not contain a table" not in str(e):
+                    log_verbose(f"Failed to process shape in slide {slide_num + 1}: {e}", "warning")
+                continue
+        slides.append(items)
+
+    return {"format": "pptx", "slides": slides}
+
+def parse_pptx(path):
+    """Collect, per slide, the text items and picture part names of a PPTX file in shape order.
+
+    Items are dicts with a ``kind`` of "text" (a shape's own text), "table", "group"
+    or "image" (with the ``part`` name of the picture).
+    """
+    if PPTX_XML_READER:
+        try:
+            return read_pptx(path)
+        except (KeyError, ValueError, ET.ParseError) as e:
+            log_verbose(f"XML reader could not parse {Path(path).name}, using python-pptx: {e}", "warning")
+    return _parse_pptx_object_model(path)
+
+def parse_document(path):
+    """Parse a PDF, DOCX or PPTX file. Returns None for other file types."""
+    ext = Path(path).suffix.lower()
+    if ext == ".pdf":
+        return parse_pdf(path)
+    elif ext == ".docx":
+        return parse_docx(path)
+    elif ext == ".pptx":
+        return parse_pptx(path)
+    return None
+
+class PackageImages:
+    """Reads embedded images of a DOCX/PPTX package by part name, opening the ZIP once."""
+
+    def __init__(self, path):
+        self.package = zipfile.ZipFile(document_input(path))
+
+    def read(self, part_name):
+        return self.package.read(part_name.lstrip('/'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.package.close()
+
+def _parsed_document_path(file_hash):
+    return Path(PARSED_DOCUMENTS_DIR) / f"{file_hash}.json"
+
+def save_parsed_document(parsed, file_hash):
+    """Write a parsed document so the extraction step can reuse it."""
+    path = _parsed_document_path(file_hash)
+    entry = dict(parsed, parser_version=PARSER_VERSION, file_hash=file_hash)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_name, path)
+    except OSError as e:
+        log_verbose(f"Could not save parsed document {path.name}: {e}", "warning")
+
+def load_parsed_document(path, file_hash=None):
+    """Return the parsed document saved for this file's current content, or None."""
+    if not SHARE_PARSED_DOCUMENTS or Path(path).suffix.lower() not in PARSED_EXTENSIONS:
+        return None
+    try:
+        file_hash = file_hash or hash_file(path)
+        parsed_path = _parsed_document_path(file_hash)
+        with open(parsed_path, 'r', encoding='utf-8') as f:
+            parsed = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if parsed.get("parser_version") != PARSER_VERSION or parsed.get("file_hash") != file_hash:
+        return None
+    try:
+        # Touch the file so eviction treats it as recently used
+        os.utime(parsed_path)
+    except OSError:
+        pass
+    return parsed
+
+def evict_parsed_documents(max_mb=PARSED_DOCUMENTS_MAX_MB):
+    """Delete least recently used parsed documents until PARSED_DOCUMENTS_DIR fits within ``max_mb``."""
+    folder = Path(PARSED_DOCUMENTS_DIR)
+    if not folder.exists():
+        return 0
+
+    entries = []
+    total_size = 0
+    for path in folder.glob("*.json"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total_size += stat.st_size
+
+    max_bytes = int(max_mb * 1024 * 1024)
+    removed = 0
+    entries.sort()
+    for _, size, path in entries:
+        if total_size <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total_size -= size
+        removed += 1
+
+    if removed:
+        log_verbose(f"Evicted {removed} parsed documents ({total_size / (1024 * 1024):.1f} MB kept)", "info")
+    return removed
+
+def get_parsed_document(path, file_hash=None):
+    """Parse a document once and share the result, reusing an earlier parse of the same content."""
+    if not SHARE_PARSED_DOCUMENTS:
+        return parse_document(path)
+
+    try:
+        file_hash = file_hash or hash_file(path)
+    except OSError:
+        return parse_document(path)
+
+    parsed = load_parsed_document(path, file_hash)
+    if parsed is None:
+        parsed = parse_document(path)
+        if parsed is not None:
+            save_parsed_document(parsed, file_hash)
+    return parsed
@@ -0,0 +1,173 @@
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+from dotenv import load_dotenv
+from archive_reader import open_document
+
+load_dotenv()
+
+# Extraction cache configuration
+EXTRACTION_CACHE_ENABLED = os.getenv('EXTRACTION_CACHE', 'true').lower() == 'true'
+EXTRACTION_CACHE_DIR = os.getenv('EXTRACTION_CACHE_DIR', './output/extraction_cache')
+EXTRACTION_CACHE_MAX_MB = float(os.getenv('EXTRACTION_CACHE_MAX_MB', '2048'))
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+
+# Bump when the layout of cache entries changes so old entries are never read
+CACHE_FORMAT_VERSION = 1
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def hash_file(path, block_size=1024 * 1024):
+    """SHA-256 of a file's bytes, read in blocks so large files are never fully loaded."""
+    digest = hashlib.sha256()
+    with open_document(path) as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _atomic_write(path, write):
+    """Write through a temp file and rename, so readers never see a partial entry."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_name, path)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+class ExtractionCache:
+    """Persistent cache of extracted text, keyed by file content and extractor settings.
+
+    Each entry is a ``<key>.txt`` file holding the final (cleaned or raw) text and a
+    ``<key>.json`` file holding its statistics. Entries are evicted least recently
+    used first once the cache grows beyond ``max_mb``.
+    """
+
+    def __init__(self, cache_dir=EXTRACTION_CACHE_DIR, max_mb=EXTRACTION_CACHE_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def make_key(self, file_hash, settings):
+        """Combine the file's content hash with the settings that shape its extracted text."""
+        payload = json.dumps({"file": file_hash, "settings": settings, "format": CACHE_FORMAT_VERSION},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        folder = self.cache_dir / key[:2]
+        return folder / f"{key}.txt", folder / f"{key}.json"
+
+    def get(self, key):
+        """Return the stored statistics for ``key``, or None on a miss."""
+        text_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if not text_path.exists():
+                raise FileNotFoundError(text_path)
+            # Touch the entry so eviction treats it as recently used
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+
+        return entry
+
+    def put(self, key, text, stats):
+        """Store extracted text and its statistics."""
+        text_path, meta_path = self._paths(key)
+        try:
+            _atomic_write(text_path, lambda f: f.write(text.encode('utf-8')))
+            _atomic_write(meta_path, lambda f: f.write(json.dumps(stats).encode('utf-8')))
+        except OSError as e:
+            log_verbose(f"Could not write extraction cache entry: {e}", "warning")
+
+    def put_file(self, key, text_file, stats):
+        """Store an already written text file (copied block by block) and its statistics."""
+        text_path, meta_path = self._paths(key)
+
+        def copy_text(f):
+            with open(text_file, 'rb') as src:
+                shutil.copyfileobj(src, f)
+
+        try:
+            _atomic_write(text_path, copy_text)
+            _atomic_write(meta_path, lambda f: f.write(json.dumps(stats).encode('utf-8')))
+        except OSError as e:
+            log_verbose(f"Could not write extraction cache entry: {e}", "warning")
+
+    def restore(self, key, output_file):
+        """Copy a cached text into place as the extraction output. Returns the output path or None."""
+        text_path, _ = self._paths(key)
+        output_file = Path(output_file)
+        try:
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(text_path, output_file)
+            return str(output_file)
+        except OSError as e:
+            log_verbose(f"Could not restore cached text to {output_file}: {e}", "warning")
+            return None
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits within its size limit."""
+        if not self.cache_dir.exists():
+            return 0
+
+        entries = []
+        total_size = 0
+        for meta_path in self.cache_dir.glob("*/*.json"):
+            text_path = meta_path.with_suffix('.txt')
+            try:
+                size = meta_path.stat().st_size + (text_path.stat().st_size if text_path.exists() else 0)
+                entries.append((meta_path.stat().st_mtime, size, meta_path, text_path))
+            except OSError:
+                continue
+            total_size += size
+
+        removed = 0
+        entries.sort()
+        for _, size, meta_path, text_path in entries:
+            if total_size <= self.max_bytes:
+                break
+            for path in (meta_path, text_path):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total_size -= size
+            removed += 1
+
+        if removed:
+            log_verbose(f"Evicted {removed} extraction cache entries ({total_size / (1024 * 1024):.1f} MB kept)", "info")
+        return removed
+
+# One cache object per process (pool workers each get their own)
+_extraction_cache = None
+
+def get_extraction_cache():
+    """Return the process-wide extraction cache, or None when caching is disabled."""
+    global _extraction_cache
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache()
+    return _extraction_cache
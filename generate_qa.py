@@ -8,10 +8,15 @@ from typing import List, Dict, Any
 from dotenv import load_dotenv
 from ollama import Client
 from datetime import datetime
+from chunk_cache import get_chunk_cache, chunk_content_hash
+from chunk_dedup import get_chunk_dedup, deduplicate_chunk_files, CHUNK_DEDUP_MODE
 
 # Load environment variables
 load_dotenv()
 
+# Bump whenever the prompt changes, so cached Q&A pairs are generated again
+QA_PROMPT_VERSION = 1
+
 class QAGenerator:
     def __init__(self):
         """Initialize the Q&A Generator with configuration from .env file"""
@@ -21,6 +26,16 @@ class QAGenerator:
         self.ollama_model = os.getenv("QA_OLLAMA_MODEL", "mistral")
         self.qa_pairs_per_chunk = int(os.getenv("QA_PAIRS_PER_CHUNK", "3"))
         
+        # Q&A pairs of chunks already seen with the same text and settings are reused
+        self.cache = get_chunk_cache()
+        self.cache_settings = {"model": self.ollama_model, "pairs_per_chunk": self.qa_pairs_per_chunk,
+                               "prompt_version": QA_PROMPT_VERSION}
+        # Near-duplicate chunks found across the corpus are not sent to the model
+        self.dedup = get_chunk_dedup()
+        if self.dedup is not None and CHUNK_DEDUP_MODE == "link" and self.cache is None:
+            print("⚠️ CHUNK_DEDUP_MODE=link reads the canonical chunks' Q&A pairs from the chunk cache; "
+                  "with CHUNK_CACHE=false near-duplicates get no Q&A pairs, as with drop")
+        
         # Create output folder if it doesn't exist
         self.output_folder.mkdir(exist_ok=True)
         
@@ -235,6 +250,11 @@ Output format (must be valid JSON array):
             print(f"   ❌ Failed to process chunk: {e}")
             return []
 
+    def output_file_for(self, json_file_path: Path) -> Path:
+        """Path of the Q&A file written for a chunked JSON file"""
+        output_filename = json_file_path.stem.replace("_extracted_vectorized_st", "_qa_pairs")
+        return self.output_folder / f"{output_filename}.json"
+
     def process_file(self, json_file_path: Path) -> bool:
         """Process a single JSON file and generate Q&A pairs"""
         print(f"📁 Processing: {json_file_path.name}")
@@ -247,6 +267,8 @@ Output format (must be valid JSON array):
             print(f"   📊 Found {len(chunks)} chunks")
             
             qa_results = []
+            reused = 0
+            duplicates = 0
             
             # Process each chunk
             for i, chunk in enumerate(chunks, 1):
@@ -261,8 +283,33 @@ Output format (must be valid JSON array):
                     print(f"   ⚠️ Skipping empty chunk {chunk_id}")
                     continue
                 
-                # Generate Q&A pairs for this chunk
-                qas = self.generate_qa_pairs(chunk_text)
+                content_hash = chunk.get("content_hash") or chunk_content_hash(chunk_text)
+                duplicate = self.dedup.duplicate_of(json_file_path.name, chunk_id, content_hash) if self.dedup is not None else None
+                if duplicate is not None:
+                    # A near-duplicate is linked to the Q&A pairs of its canonical chunk, or dropped
+                    duplicates += 1
+                    qas = None
+                    if CHUNK_DEDUP_MODE == "link" and self.cache is not None:
+                        qas = self.cache.get_qa_pairs(self.cache_settings, duplicate["content_hash"])
+                    qas = qas or []
+                    action = f"Linking {len(qas)} Q&A pairs of" if qas else "Skipping near-duplicate of"
+                    print(f"   🔁 {action} {duplicate['chunk_id']} for chunk {chunk_id} (similarity {duplicate['similarity']:.2f})")
+                    generated = False
+                else:
+                    # Unchanged chunks (even at a new position in a revised document) keep their Q&A pairs
+                    qas = self.cache.get_qa_pairs(self.cache_settings, content_hash) if self.cache is not None else None
+                    generated = qas is None
+                    if generated:
+                        # Generate Q&A pairs for this chunk
+                        qas = self.generate_qa_pairs(chunk_text)
+                        if qas and self.cache is not None:
+                            self.cache.put_qa_pairs(self.cache_settings, content_hash, qas)
+                    else:
+                        reused += 1
+                        print(f"   ♻️ Reusing {len(qas)} Q&A pairs of unchanged chunk {chunk_id}")
+                
+                # Chunks of structured extractions know where they came from in the document
+                span = {key: chunk[key] for key in ("start_char", "end_char", "source_units") if key in chunk}
                 
                 # Add metadata to each Q&A pair
                 for qa in qas:
@@ -270,6 +317,9 @@ Output format (must be valid JSON array):
                         "source_file": source_file,
                         "chunk_id": chunk_id,
                         "chunk_index": chunk.get("chunk_index", i-1),
+                        "content_hash": content_hash,
+                        **({"duplicate_of": duplicate["chunk_id"]} if duplicate is not None else {}),
+                        **span,
                         "prompt": qa["prompt"],
                         "response": qa["response"],
                         "character_count": chunk.get("character_count", len(chunk_text)),
@@ -277,6 +327,9 @@ Output format (must be valid JSON array):
                         "generated_at": datetime.now().isoformat()
                     })
                 
+                if not generated:
+                    continue
+                
                 # Small delay and show system status between chunks
                 gpu_current = self.get_gpu_usage()
                 print(f"      💻 Current CPU: {psutil.cpu_percent(interval=0.1):.1f}%, Memory: {psutil.virtual_memory().percent:.1f}%")
@@ -286,13 +339,16 @@ Output format (must be valid JSON array):
                 time.sleep(1)  # Increased delay to see GPU usage
             
             # Save the results to a separate file for this document
-            output_filename = json_file_path.stem.replace("_extracted_vectorized_st", "_qa_pairs")
-            output_file = self.output_folder / f"{output_filename}.json"
+            output_file = self.output_file_for(json_file_path)
             
             with open(output_file, "w", encoding="utf-8") as f:
                 json.dump(qa_results, f, indent=2, ensure_ascii=False)
             
             print(f"   ✅ Saved {len(qa_results)} Q&A pairs to {output_file}")
+            if reused:
+                print(f"   ♻️ {reused}/{len(chunks)} chunks were unchanged and kept their Q&A pairs")
+            if duplicates:
+                print(f"   🔁 {duplicates}/{len(chunks)} chunks were near-duplicates and not sent to the model")
             print()
             return True
             
@@ -303,13 +359,17 @@ Output format (must be valid JSON array):
 
     def process_all_files(self):
         """Process all JSON files in the input folder"""
-        # Find all JSON files
-        json_files = list(self.input_folder.glob("*.json"))
+        # Find all JSON files, in the order near-duplicates are resolved (canonical chunks first)
+        json_files = sorted(self.input_folder.glob("*.json"))
         
         if not json_files:
             print(f"❌ No JSON files found in {self.input_folder}")
             return
         
+        if self.dedup is not None:
+            deduplicate_chunk_files(self.input_folder)
+            print()
+        
         print(f"🚀 Found {len(json_files)} files to process")
         print()
         
@@ -1,88 +1,94 @@
 import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
 from pathlib import Path
 from datetime import datetime
-import pdfplumber
-from docx import Document
-from pptx import Presentation
+import concurrent.futures
+import itertools
 import json
+import pdfplumber
 from dotenv import load_dotenv
 
-def get_file_metadata(file_path, verbose=True):
+# pypdfium2 (installed with pdfplumber) reads PDF text much faster for sampling
+try:
+    import pypdfium2
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+from document_parser import get_parsed_document, evict_parsed_documents, SHARE_PARSED_DOCUMENTS
+from office_xml_extractors import main_part_name, parse_word_part, _slide_items
+from pipeline_settings import resolve_worker_count, SUPPORTED_EXTENSIONS
+from corpus_manifest import scan_corpus, get_corpus_manifest
+from archive_reader import (READ_ARCHIVES, is_archive, iter_archive_documents, provided_member,
+                            split_member_path, document_input, document_stat,
+                            submit_bounded)
+from text_reader import iter_txt_blocks, count_words
+
+load_dotenv()
+
+# Inspection configuration
+# "full" reads every page; "fast" reads only until a file is known to be valid
+INSPECTION_MODE = os.getenv('INSPECTION_MODE', 'full').lower()
+# Pages (PDF) or slides (PPTX) sampled per file in fast mode before falling back to a full read
+INSPECTION_SAMPLE_PAGES = int(os.getenv('INSPECTION_SAMPLE_PAGES', '5'))
+# Number of parallel inspection processes ("auto" = one per CPU core)
+INSPECTION_WORKERS = os.getenv('INSPECTION_WORKERS', '1')
+
+# Files need more words than this to be valid for extraction
+MIN_VALID_WORDS = 30
+
+def _base_metadata(file_path):
+    member = split_member_path(file_path)
+    if member is not None:
+        # Archive members only record a modification time
+        size, mtime = document_stat(file_path)
+        return {
+            "filename": file_path.name,
+            "archive": str(member[0]),
+            "member": member[1],
+            "extension": file_path.suffix.lower(),
+            "size_kb": round(size / 1024, 2),
+            "created_at": datetime.fromtimestamp(mtime).isoformat(),
+            "modified_at": datetime.fromtimestamp(mtime).isoformat()
+        }
+    
+    stat = file_path.stat()
+    return {
+        "filename": file_path.name,
+        "extension": file_path.suffix.lower(),
+        "size_kb": round(stat.st_size / 1024, 2),
+        "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+        "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat()
+    }
+
+def get_file_metadata(file_path, verbose=True, file_hash=None):
     # Convert string path to Path object if needed
     if isinstance(file_path, str):
         file_path = Path(file_path)
     
     if verbose:
         print(f"\n📄 Processing file: {file_path.name}")
-        print(f"   Size: {round(os.path.getsize(file_path) / 1024, 2)} KB")
+        print(f"   Size: {round(document_stat(file_path)[0] / 1024, 2)} KB")
         print(f"   Type: {file_path.suffix.lower()}")
     
-    metadata = {
-        "filename": file_path.name,
-        "extension": file_path.suffix.lower(),
-        "size_kb": round(os.path.getsize(file_path) / 1024, 2),
-        "created_at": datetime.fromtimestamp(file_path.stat().st_ctime).isoformat(),
-        "modified_at": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
-    }
+    metadata = _base_metadata(file_path)
 
     try:
         ext = file_path.suffix.lower()
 
         # === PDF ===
         if ext == ".pdf":
-            text = ""
-            pages_count = 0
-            extraction_method = "none"
-            
-            # Try pdfplumber first (with error handling)
-            try:
-                with pdfplumber.open(file_path) as pdf:
-                    pages_count = len(pdf.pages)
-                    text_list = []
-                    
-                    for page in pdf.pages:
-                        try:
-                            page_text = page.extract_text()
-                            if page_text:
-                                text_list.append(page_text.strip())
-                        except Exception as page_error:
-                            # Skip problematic pages but continue with others
-                            continue
-                    
-                    if text_list:
-                        text = "\n".join(text_list)
-                        extraction_method = "pdfplumber"
-            except Exception as plumber_error:
-                # If pdfplumber fails completely, try PyPDF2 as fallback
-                try:
-                    import PyPDF2
-                    with open(file_path, 'rb') as file:
-                        pdf_reader = PyPDF2.PdfReader(file)
-                        pages_count = len(pdf_reader.pages)
-                        text_list = []
-                        
-                        for page in pdf_reader.pages:
-                            try:
-                                page_text = page.extract_text()
-                                if page_text:
-                                    text_list.append(page_text.strip())
-                            except Exception:
-                                continue
-                        
-                        if text_list:
-                            text = "\n".join(text_list)
-                            extraction_method = "PyPDF2"
-                except ImportError:
-                    # PyPDF2 not available, continue with empty text
-                    extraction_method = "failed"
-                except Exception:
-                    extraction_method = "failed"
+            # The parsed document is shared with the extraction step (see document_parser.py)
+            parsed = get_parsed_document(file_path, file_hash)
+            text = "\n".join(page.strip() for page in parsed["pages"] if page.strip())
+            extraction_method = parsed["method"]
             
             word_count = len(text.split()) if text.strip() else 0
-            metadata["pages"] = pages_count
+            metadata["pages"] = len(parsed["pages"])
             metadata["word_count"] = word_count
             
-            if word_count > 30:
+            if word_count > MIN_VALID_WORDS:
                 metadata["is_valid"] = True
             else:
                 metadata["is_valid"] = False
@@ -96,64 +102,41 @@ def get_file_metadata(file_path, verbose=True):
 
         # === DOCX ===
         elif ext == ".docx":
-            doc = Document(file_path)
-            texts = []
-            
-            # Extract text from paragraphs
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    texts.append(paragraph.text.strip())
+            parsed = get_parsed_document(file_path, file_hash)
             
-            # Extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            texts.append(cell.text.strip())
-            
-            # Extract text from headers and footers
-            for section in doc.sections:
-                # Headers
-                if section.header:
-                    for paragraph in section.header.paragraphs:
-                        if paragraph.text.strip():
-                            texts.append(paragraph.text.strip())
-                # Footers
-                if section.footer:
-                    for paragraph in section.footer.paragraphs:
-                        if paragraph.text.strip():
-                            texts.append(paragraph.text.strip())
+            # Paragraphs, table cells, headers and footers (text boxes are not counted)
+            texts = []
+            for block in parsed["blocks"] + parsed["headers"] + parsed["footers"]:
+                if block["kind"] == "table":
+                    for row in block["rows"]:
+                        texts.extend(row)
+                elif block["kind"] == "paragraph":
+                    texts.append(block["text"])
             
             text = "\n".join(texts)
             word_count = len(text.split()) if text.strip() else 0
             metadata["word_count"] = word_count
-            metadata["is_valid"] = word_count > 30
+            metadata["is_valid"] = word_count > MIN_VALID_WORDS
             if not metadata["is_valid"]:
                 metadata["notes"] = "Too few words in Word document"
 
         # === PPTX ===
         elif ext == ".pptx":
-            prs = Presentation(file_path)
-            texts = []
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        texts.append(shape.text.strip())
+            parsed = get_parsed_document(file_path, file_hash)
+            texts = [item["text"] for items in parsed["slides"] for item in items if item["kind"] == "text"]
             text = "\n".join(texts)
             word_count = len(text.split())
-            metadata["slides"] = len(prs.slides)
+            metadata["slides"] = len(parsed["slides"])
             metadata["word_count"] = word_count
-            metadata["is_valid"] = word_count > 30
+            metadata["is_valid"] = word_count > MIN_VALID_WORDS
             if not metadata["is_valid"]:
                 metadata["notes"] = "Too few words in PowerPoint file"
 
         # === TXT ===
         elif ext == ".txt":
-            with open(file_path, "r", encoding="utf-8") as f:
-                text = f.read()
-            word_count = len(text.split())
+            word_count = count_words(iter_txt_blocks(file_path))
             metadata["word_count"] = word_count
-            metadata["is_valid"] = word_count > 30
+            metadata["is_valid"] = word_count > MIN_VALID_WORDS
             if not metadata["is_valid"]:
                 metadata["notes"] = "Text file too short"
 
@@ -172,14 +155,156 @@ def get_file_metadata(file_path, verbose=True):
     return metadata
 
 
-def process_data_folder(data_folder_path: str, output_folder: str = None) -> list:
+def _sample_pdf(file_path, max_pages):
+    """Word count of the first pages of a PDF, stopping once it is valid. Returns (words, total pages)."""
+    word_count = 0
+    if PDFIUM_AVAILABLE:
+        pdf = pypdfium2.PdfDocument(document_input(file_path))
+        try:
+            for page_num in range(min(max_pages, len(pdf))):
+                page = pdf[page_num]
+                text_page = page.get_textpage()
+                word_count += len(text_page.get_text_range().split())
+                text_page.close()
+                page.close()
+                if word_count > MIN_VALID_WORDS:
+                    break
+            return word_count, len(pdf)
+        finally:
+            pdf.close()
+    
+    with pdfplumber.open(document_input(file_path)) as pdf:
+        for page in pdf.pages[:max_pages]:
+            word_count += len((page.extract_text() or "").split())
+            if word_count > MIN_VALID_WORDS:
+                break
+        return word_count, len(pdf.pages)
+
+def _sample_docx_words(package):
+    """Words of the body paragraphs and table cells, the blocks full mode counts (without headers and footers)."""
+    with package.open(main_part_name(package, "/word/document.xml").lstrip('/')) as xml_file:
+        blocks, _ = parse_word_part(xml_file)
+    word_count = 0
+    for block in blocks:
+        if block["kind"] == "table":
+            word_count += sum(len(cell.split()) for row in block["rows"] for cell in row)
+        elif block["kind"] == "paragraph":
+            word_count += len(block["text"].split())
+    return word_count
+
+def _sample_pptx_words(package, slide_names):
+    """Words of the text shapes of some slides, the items full mode counts, stopping once valid."""
+    word_count = 0
+    for name in slide_names:
+        with package.open(name) as xml_file:
+            items = _slide_items(ET.parse(xml_file).getroot(), {})
+        word_count += sum(len(item["text"].split()) for item in items if item["kind"] == "text")
+        if word_count > MIN_VALID_WORDS:
+            break
+    return word_count
+
+def _slide_number(name):
+    return int(re.search(r'(\d+)\.xml$', name).group(1))
+
+def sample_file_metadata(file_path):
+    """Fast inspection: read only as much of a file as it takes to show it is valid.
+
+    Files that do not reach the word threshold within INSPECTION_SAMPLE_PAGES pages
+    or slides are inspected in full, so ``is_valid`` matches full mode for them. DOCX and
+    PPTX samples count the same blocks as full mode (a subset of them), so a sampled
+    file is never valid when its full count is not.
+    """
+    file_path = Path(file_path)
+    metadata = _base_metadata(file_path)
+    ext = metadata["extension"]
+    
+    try:
+        if ext == ".pdf":
+            word_count, metadata["pages"] = _sample_pdf(file_path, INSPECTION_SAMPLE_PAGES)
+        elif ext == ".docx":
+            with zipfile.ZipFile(document_input(file_path)) as package:
+                word_count = _sample_docx_words(package)
+        elif ext == ".pptx":
+            with zipfile.ZipFile(document_input(file_path)) as package:
+                slides = sorted((name for name in package.namelist()
+                                 if re.fullmatch(r'ppt/slides/slide\d+\.xml', name)), key=_slide_number)
+                metadata["slides"] = len(slides)
+                word_count = _sample_pptx_words(package, slides[:INSPECTION_SAMPLE_PAGES])
+        elif ext == ".txt":
+            word_count = len(next(iter_txt_blocks(file_path, 64 * 1024), "").split())
+        else:
+            return get_file_metadata(file_path, verbose=False)
+    except Exception:
+        word_count = 0
+    
+    if word_count <= MIN_VALID_WORDS:
+        return get_file_metadata(file_path, verbose=False)
+    
+    # The count stops at the threshold, so it is a lower bound
+    metadata["word_count"] = word_count
+    metadata["is_valid"] = True
+    metadata["sampled"] = True
+    return metadata
+
+def _inspect_file(file_path, fast, file_hash=None):
+    """Inspect one file; runs both in-process and inside pool workers."""
+    try:
+        if fast:
+            return sample_file_metadata(file_path)
+        return get_file_metadata(str(file_path), file_hash=file_hash)
+    except Exception as e:
+        print(f"Error processing {Path(file_path).name}: {str(e)}")
+        return None
+
+def _inspect_member(file_path, data, mtime, fast):
+    """_inspect_file for a document read out of an archive by the parent process."""
+    with provided_member(file_path, data, mtime):
+        return _inspect_file(file_path, fast)
+
+def _inspect_archives(archives, fast, executor=None, window=1, reused=None, finished=None):
+    """Yield (member path, metadata) for the supported documents of each archive, read as a stream.
+
+    Archives in ``reused`` give back their recorded metadata instead; (archive, metadata
+    list, no output files) of every archive inspected without errors is appended to ``finished``.
+    """
+    for archive in archives:
+        if reused and archive in reused:
+            for metadata in reused[archive]:
+                yield archive / metadata["member"], metadata
+            continue
+        try:
+            tasks = ((file_path, data, mtime, fast)
+                     for file_path, data, mtime in iter_archive_documents(archive, SUPPORTED_EXTENSIONS))
+            if executor is None:
+                inspected = ((task[0], _inspect_member(*task)) for task in tasks)
+            else:
+                inspected = ((file_path, future.result())
+                             for (file_path, *_), future in submit_bounded(executor, _inspect_member, tasks, window))
+            members = []
+            for file_path, metadata in inspected:
+                members.append(metadata)
+                yield file_path, metadata
+            if finished is not None and None not in members:
+                finished.append((archive, members, []))
+        except Exception as e:
+            print(f"Error reading archive {archive.name}: {str(e)}")
+
+def inspect_file(file_path, mode=None):
+    """Inspect a single file in "full" or "fast" mode (defaults to INSPECTION_MODE). Returns None on error."""
+    return _inspect_file(file_path, (mode or INSPECTION_MODE) == "fast")
+
+def process_data_folder(data_folder_path: str, output_folder: str = None, mode: str = None, workers=None) -> list:
     """
     Processes all files in the data folder and collects their metadata.
-    Saves results incrementally to a JSON file as each file is processed.
+    Each result is appended to a JSONL log as soon as it is ready; the JSON
+    array file is written once at the end. Documents inside ZIP/TAR archives
+    (or ``data_folder_path`` being an archive) are read without unpacking them.
     
     Args:
         data_folder_path: Path to the data folder
         output_folder: Path to save the results (optional)
+        mode: "full" or "fast" (defaults to INSPECTION_MODE)
+        workers: Number of inspection processes (defaults to INSPECTION_WORKERS)
     
     Returns:
         List of metadata for all files
@@ -187,12 +312,36 @@ def process_data_folder(data_folder_path: str, output_folder: str = None) -> lis
     data_folder = Path(data_folder_path)
     results = []
     
-    if not data_folder.exists() or not data_folder.is_dir():
+    if data_folder.is_file() and READ_ARCHIVES and is_archive(data_folder):
+        files, archives, file_hashes = [], [data_folder], {}
+    elif not data_folder.exists() or not data_folder.is_dir():
         print(f"Error: {data_folder_path} is not a valid directory")
         return results
+    else:
+        # Nested folders are listed through the corpus manifest, which only hashes changed files
+        corpus = sorted(scan_corpus(data_folder), key=lambda f: str(f.path).lower())
+        file_hashes = {f.path: f.hash for f in corpus if not (READ_ARCHIVES and is_archive(f.path))}
+        files = list(file_hashes)
+        archives = [f.path for f in corpus if READ_ARCHIVES and is_archive(f.path)]
+    
+    fast = (mode or INSPECTION_MODE) == "fast"
+    
+    # Files unchanged since an inspection in the same mode keep their earlier metadata
+    manifest = get_corpus_manifest()
+    stage_settings = {"mode": "fast", "sample_pages": INSPECTION_SAMPLE_PAGES} if fast else {"mode": "full"}
+    reused = manifest.reusable("inspection", stage_settings, files + archives) if manifest is not None else {}
+    pending = [file_path for file_path in files if file_path not in reused]
+    finished = []
+    if reused:
+        print(f"{len(reused)} unchanged files keep their earlier inspection")
     
-    # Set up output file path if output folder is provided
+    workers = resolve_worker_count(INSPECTION_WORKERS if workers is None else workers)
+    if all(archive in reused for archive in archives):
+        workers = min(workers, max(1, len(pending)))
+    
+    # Set up output file paths if output folder is provided
     output_file = None
+    log_file = None
     if output_folder:
         output_path = Path(output_folder)
         output_path.mkdir(exist_ok=True, parents=True)
@@ -200,23 +349,54 @@ def process_data_folder(data_folder_path: str, output_folder: str = None) -> lis
         # Initialize with empty list
         with open(output_file, 'w') as f:
             json.dump([], f, indent=4)
+        log_file = open(output_path / f"step1-metadata_{data_folder.name}.jsonl", 'w', encoding='utf-8')
     
-    for file_path in data_folder.iterdir():
-        if file_path.is_file():
-            try:
-                metadata = get_file_metadata(str(file_path))
-                results.append(metadata)
-                print(f"Processed: {file_path.name}")
-                
-                # Save results incrementally after each file
-                if output_file:
-                    with open(output_file, 'w') as f:
-                        json.dump(results, f, indent=4)
-                    
-            except Exception as e:
-                print(f"Error processing {file_path.name}: {str(e)}")
+    executor = None
+    try:
+        hashes = [file_hashes[file_path] for file_path in pending]
+        if workers <= 1:
+            metadata_iter = map(_inspect_file, pending, [fast] * len(pending), hashes)
+        else:
+            print(f"Inspecting {len(pending)} files with {workers} worker processes ({'fast' if fast else 'full'} mode)")
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+            chunksize = max(1, len(pending) // (workers * 8))
+            metadata_iter = executor.map(_inspect_file, pending, [fast] * len(pending), hashes, chunksize=chunksize)
+        
+        def in_file_order():
+            for file_path in files:
+                if file_path in reused:
+                    yield file_path, reused[file_path]
+                else:
+                    metadata = next(metadata_iter)
+                    if metadata is not None:
+                        finished.append((file_path, metadata, []))
+                    yield file_path, metadata
+        
+        inspected = itertools.chain(in_file_order(), _inspect_archives(archives, fast, executor, workers * 2, reused, finished))
+        for file_path, metadata in inspected:
+            if metadata is None:
+                continue
+            results.append(metadata)
+            print(f"Processed: {file_path.name}")
+            
+            # Append each result to the log instead of rewriting the whole file
+            if log_file:
+                log_file.write(json.dumps(metadata) + "\n")
+                log_file.flush()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if log_file:
+            log_file.close()
+        if manifest is not None and finished:
+            manifest.record("inspection", stage_settings, finished)
+    
+    if SHARE_PARSED_DOCUMENTS and not fast:
+        evict_parsed_documents()
     
     if output_file:
+        with open(output_file, 'w') as f:
+            json.dump(results, f, indent=4)
         print(f"Results saved to {output_file}")
     
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,220 @@
+import os
+import atexit
+import hashlib
+import threading
+from io import BytesIO
+from PIL import Image
+import pytesseract
+from dotenv import load_dotenv
+
+# Try to import tesserocr (in-process Tesseract API), handle gracefully if not available
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+load_dotenv()
+
+# OCR engine configuration
+# Options: "auto" (tesserocr when installed, else pytesseract), "tesserocr", "pytesseract"
+OCR_ENGINE = os.getenv('OCR_ENGINE', 'auto').lower()
+OCR_LANGUAGE = os.getenv('OCR_LANGUAGE', 'eng')
+OCR_TESSDATA_PATH = os.getenv('OCR_TESSDATA_PATH', '')
+# Reuse OCR text of identical embedded images within a "document" or across the whole "corpus"
+OCR_IMAGE_CACHE_SCOPE = os.getenv('OCR_IMAGE_CACHE_SCOPE', 'document').lower()
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def as_pil_image(image):
+    """Accept a PIL image, raw encoded image bytes or a binary stream and return a PIL image."""
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return Image.open(BytesIO(bytes(image)))
+    if hasattr(image, 'read'):
+        return Image.open(image)
+    raise TypeError(f"Unsupported image input: {type(image).__name__}")
+
+class PytesseractEngine:
+    """Runs the tesseract executable once per image through pytesseract."""
+
+    name = "pytesseract"
+
+    def __init__(self, psm="6", lang=OCR_LANGUAGE):
+        self.config = f'--psm {psm}'
+        self.lang = lang
+
+    @property
+    def available(self):
+        return bool(pytesseract.pytesseract.tesseract_cmd)
+
+    def image_to_string(self, image):
+        return pytesseract.image_to_string(as_pil_image(image), lang=self.lang, config=self.config)
+
+    def image_to_text_and_confidence(self, image):
+        """OCR an image once and return (text, mean word confidence 0-100)."""
+        data = pytesseract.image_to_data(as_pil_image(image), lang=self.lang, config=self.config,
+                                         output_type=pytesseract.Output.DICT)
+        # Rebuild the text from the word boxes instead of running tesseract a second time
+        lines = {}
+        confidences = []
+        for i, word in enumerate(data['text']):
+            confidence = float(data['conf'][i])
+            if confidence < 0 or not word.strip():
+                continue
+            confidences.append(confidence)
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            lines.setdefault(key, []).append(word)
+
+        text_parts = []
+        previous_paragraph = None
+        for (block_num, par_num, line_num), words in lines.items():
+            if previous_paragraph is not None and previous_paragraph != (block_num, par_num):
+                text_parts.append("")
+            text_parts.append(" ".join(words))
+            previous_paragraph = (block_num, par_num)
+
+        mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        return "\n".join(text_parts), mean_confidence
+
+    def close(self):
+        pass
+
+class TesserocrEngine:
+    """Keeps Tesseract loaded in-process and passes images to it directly.
+
+    Each thread gets its own resident API handle (Tesseract handles are not thread
+    safe), created on first use and reused for every later image. Pool workers are
+    separate processes, so each worker ends up with exactly one handle.
+    """
+
+    name = "tesserocr"
+    available = True
+
+    def __init__(self, psm="6", lang=OCR_LANGUAGE, tessdata_path=OCR_TESSDATA_PATH):
+        self.psm = tesserocr.PSM(int(psm))
+        self.lang = lang
+        self.tessdata_path = tessdata_path
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+
+    def _api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            kwargs = {"lang": self.lang, "psm": self.psm}
+            if self.tessdata_path:
+                kwargs["path"] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+            with self._lock:
+                self._handles.append(api)
+        return api
+
+    def image_to_string(self, image):
+        image = as_pil_image(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        api = self._api()
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+    def image_to_text_and_confidence(self, image):
+        """OCR an image once and return (text, mean word confidence 0-100)."""
+        image = as_pil_image(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        api = self._api()
+        api.SetImage(image)
+        text = api.GetUTF8Text()
+        return text, float(api.MeanTextConf())
+
+    def close(self):
+        with self._lock:
+            for api in self._handles:
+                api.End()
+            self._handles.clear()
+        self._local = threading.local()
+
+class ImageOCRCache:
+    """Remembers the OCR text of embedded images by a hash of their bytes.
+
+    A logo or footer banner repeated on every slide is OCRed once and the text is
+    reused for every other copy. Pass a shared ``texts`` dict to let several
+    documents use the same cache while each keeps its own hit statistics.
+    """
+
+    def __init__(self, texts=None):
+        self.texts = {} if texts is None else texts
+        self.hits = 0
+        self.misses = 0
+
+    def ocr(self, image_data, ocr_function):
+        """Return ocr_function(image_data), computing it only for image bytes not seen before."""
+        key = hashlib.sha1(image_data).hexdigest()
+        if key in self.texts:
+            self.hits += 1
+            return self.texts[key]
+
+        self.misses += 1
+        text = ocr_function(image_data)
+        self.texts[key] = text
+        return text
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "images": lookups,
+            "ocr_runs": self.misses,
+            "cache_hits": self.hits,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+def create_ocr_engine(engine=OCR_ENGINE, psm="6"):
+    """Build an OCR engine by name, falling back to pytesseract when tesserocr cannot be used."""
+    if engine in ("auto", "tesserocr") and TESSEROCR_AVAILABLE:
+        try:
+            ocr_engine = TesserocrEngine(psm=psm)
+            ocr_engine._api()  # Load the language model now so a broken install falls back
+            log_verbose("Using resident tesserocr OCR engine", "info")
+            return ocr_engine
+        except Exception as e:
+            log_verbose(f"tesserocr could not be initialised ({e}), falling back to pytesseract", "warning")
+    elif engine == "tesserocr":
+        log_verbose("tesserocr not available. Install with: pip install tesserocr (falling back to pytesseract)", "warning")
+    log_verbose("Using pytesseract OCR engine (one tesseract process per image)", "info")
+    return PytesseractEngine(psm=psm)
+
+# Engines are created once per process and reused for every image
+_ocr_engines = {}
+_ocr_engines_lock = threading.Lock()
+
+def get_ocr_engine(psm="6", engine=None):
+    """Return the process-wide OCR engine for a page segmentation mode."""
+    engine = (engine or OCR_ENGINE).lower()
+    with _ocr_engines_lock:
+        key = (engine, str(psm))
+        if key not in _ocr_engines:
+            _ocr_engines[key] = create_ocr_engine(engine, psm)
+        return _ocr_engines[key]
+
+@atexit.register
+def _close_ocr_engines():
+    for ocr_engine in _ocr_engines.values():
+        ocr_engine.close()
@@ -0,0 +1,349 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from archive_reader import document_input
+
+# WordprocessingML is matched in both its transitional and strict namespaces
+W_NAMESPACES = (
+    "http://schemas.openxmlformats.org/wordprocessingml/2006/main",
+    "http://purl.oclc.org/ooxml/wordprocessingml/main",
+)
+R_NAMESPACES = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "http://purl.oclc.org/ooxml/officeDocument/relationships",
+)
+PACKAGE_RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+def _w(name):
+    return frozenset(f"{{{ns}}}{name}" for ns in W_NAMESPACES)
+
+_P = _w("p")
+_T = _w("t")
+_TABS = _w("tab") | _w("ptab")
+_BR = _w("br")
+_CR = _w("cr")
+_NO_BREAK_HYPHEN = _w("noBreakHyphen")
+_TBL = _w("tbl")
+_TR = _w("tr")
+_TC = _w("tc")
+_TXBX_CONTENT = _w("txbxContent")
+_CONTAINERS = _w("body") | _w("hdr") | _w("ftr")
+_HEADER_REFERENCE = _w("headerReference")
+_FOOTER_REFERENCE = _w("footerReference")
+_BR_TYPE = tuple(f"{{{ns}}}type" for ns in W_NAMESPACES)
+_R_ID = tuple(f"{{{ns}}}id" for ns in R_NAMESPACES)
+
+def _attribute(elem, names):
+    for name in names:
+        value = elem.get(name)
+        if value is not None:
+            return value
+    return None
+
+def read_relationships(package, part_name):
+    """Relationships of a package part as (id, type, target part name, external) tuples, in file order."""
+    folder, name = posixpath.split(part_name.lstrip('/'))
+    rels_name = posixpath.join(folder, "_rels", name + ".rels")
+    try:
+        root = ET.fromstring(package.read(rels_name))
+    except KeyError:
+        return []
+
+    relationships = []
+    for rel in root.iter(f"{{{PACKAGE_RELS_NS}}}Relationship"):
+        target = rel.get("Target", "")
+        external = rel.get("TargetMode") == "External"
+        if not external:
+            if target.startswith('/'):
+                target = posixpath.normpath(target)
+            else:
+                target = "/" + posixpath.normpath(posixpath.join(folder, target))
+        relationships.append((rel.get("Id"), rel.get("Type", ""), target, external))
+    return relationships
+
+def main_part_name(package, default):
+    """Name of the package's main document part, from the package relationships."""
+    for _, rel_type, target, external in read_relationships(package, "/"):
+        if rel_type.endswith("/officeDocument") and not external:
+            return target
+    return default
+
+def parse_word_part(xml_file):
+    """Read a document, header or footer part in a single streaming pass.
+
+    Returns ``(blocks, references)``. Blocks are in document order: paragraphs
+    (``{"kind": "paragraph", "text": ...}``), tables (``{"kind": "table", "rows":
+    [[cell, ...], ...]}`` with empty cells dropped) and text box paragraphs
+    (``{"kind": "textbox", "text": ...}``) right after the block that anchors them.
+    References are the (kind, relationship id) of every header and footer the
+    sections use.
+
+    Duplicates are avoided by structure rather than by comparing text: the VML
+    copy of a drawing (``mc:Fallback``) is skipped, each table cell is read once,
+    and text box paragraphs are never part of their host paragraph's text.
+    """
+    blocks = []
+    references = []
+    paragraphs = []     # text pieces of every open w:p, innermost last
+    textboxes = []      # text box paragraphs waiting for their host block to end
+    rows = cells = cell = None
+    table_depth = 0
+    textbox_depth = 0
+    fallback_depth = 0
+    container = None
+
+    def flush_textboxes():
+        for text in textboxes:
+            text = text.strip()
+            if text:
+                blocks.append({"kind": "textbox", "text": text})
+        textboxes.clear()
+
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        tag = elem.tag
+
+        if event == "start":
+            if tag == MC_FALLBACK:
+                fallback_depth += 1
+            elif fallback_depth:
+                continue
+            elif tag in _P:
+                paragraphs.append([])
+            elif tag in _TXBX_CONTENT:
+                textbox_depth += 1
+            elif tag in _TBL:
+                table_depth += 1
+                if table_depth == 1:
+                    rows = []
+            elif table_depth == 1 and tag in _TR:
+                cells = []
+            elif table_depth == 1 and tag in _TC:
+                cell = []
+            elif tag in _CONTAINERS:
+                container = elem
+            continue
+
+        if tag == MC_FALLBACK:
+            fallback_depth -= 1
+            elem.clear()
+            continue
+        if fallback_depth:
+            continue
+
+        if tag in _T:
+            if paragraphs:
+                paragraphs[-1].append(elem.text or "")
+        elif tag in _TABS:
+            if paragraphs:
+                paragraphs[-1].append("\t")
+        elif tag in _BR:
+            if paragraphs and _attribute(elem, _BR_TYPE) in (None, "textWrapping"):
+                paragraphs[-1].append("\n")
+        elif tag in _CR:
+            if paragraphs:
+                paragraphs[-1].append("\n")
+        elif tag in _NO_BREAK_HYPHEN:
+            if paragraphs:
+                paragraphs[-1].append("-")
+        elif tag in _P:
+            text = "".join(paragraphs.pop())
+            if textbox_depth:
+                textboxes.append(text)
+            elif table_depth:
+                if cell is not None:
+                    cell.append(text)
+            else:
+                text = text.strip()
+                if text:
+                    blocks.append({"kind": "paragraph", "text": text})
+                if not paragraphs:
+                    flush_textboxes()
+        elif tag in _TXBX_CONTENT:
+            textbox_depth -= 1
+        elif table_depth == 1 and tag in _TC:
+            cells.append("\n".join(cell).strip())
+            cell = None
+        elif table_depth == 1 and tag in _TR:
+            rows.append([text for text in cells if text])
+            cells = None
+        elif tag in _TBL:
+            table_depth -= 1
+            if table_depth == 0:
+                if any(rows):
+                    blocks.append({"kind": "table", "rows": rows})
+                flush_textboxes()
+        elif tag in _HEADER_REFERENCE or tag in _FOOTER_REFERENCE:
+            kind = "header" if tag in _HEADER_REFERENCE else "footer"
+            references.append((kind, _attribute(elem, _R_ID)))
+
+        # Finished top-level blocks are no longer needed in the tree
+        if container is not None and not paragraphs and table_depth == 0 and (tag in _P or tag in _TBL):
+            container.clear()
+
+    flush_textboxes()
+    return blocks, references
+
+def read_docx(path):
+    """Extract a DOCX file from its XML parts without building python-docx objects.
+
+    Returns the body blocks, the blocks of every header and footer the document
+    uses (each part read once), and the part names of the images related to the
+    main document, in the layout produced by ``document_parser.parse_docx``.
+    """
+    with zipfile.ZipFile(document_input(path)) as package:
+        document_part = main_part_name(package, "/word/document.xml")
+        with package.open(document_part.lstrip('/')) as xml_file:
+            blocks, references = parse_word_part(xml_file)
+
+        relationships = read_relationships(package, document_part)
+        targets = {rel_id: target for rel_id, _, target, external in relationships if not external}
+
+        parsed = {"format": "docx", "blocks": blocks, "headers": [], "footers": [], "images": []}
+        seen_parts = set()
+        for kind in ("header", "footer"):
+            for reference_kind, rel_id in references:
+                target = targets.get(rel_id)
+                if reference_kind != kind or target is None or target in seen_parts:
+                    continue
+                seen_parts.add(target)
+                with package.open(target.lstrip('/')) as xml_file:
+                    parsed[kind + "s"].extend(parse_word_part(xml_file)[0])
+
+        parsed["images"] = [target for _, rel_type, target, external in relationships
+                            if rel_type.endswith("/image") and not external]
+        return parsed
+
+P_NS = "http://schemas.openxmlformats.org/presentationml/2006/main"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+TABLE_URI = "http://schemas.openxmlformats.org/drawingml/2006/table"
+
+_PRESENTATION = f"{{{P_NS}}}presentation"
+_SLD_ID = f"{{{P_NS}}}sldId"
+_SP_TREE = f"{{{P_NS}}}spTree"
+_SHAPE_TAGS = frozenset(f"{{{P_NS}}}{name}" for name in ("sp", "grpSp", "graphicFrame", "cxnSp", "pic", "contentPart"))
+_SP = f"{{{P_NS}}}sp"
+_GRP_SP = f"{{{P_NS}}}grpSp"
+_GRAPHIC_FRAME = f"{{{P_NS}}}graphicFrame"
+_PIC = f"{{{P_NS}}}pic"
+_TX_BODY = f"{{{P_NS}}}txBody"
+_NV_PR = f"{{{P_NS}}}nvPr"
+_PH = f"{{{P_NS}}}ph"
+_BLIP_FILL = f"{{{P_NS}}}blipFill"
+_A_P = f"{{{A_NS}}}p"
+_A_R = f"{{{A_NS}}}r"
+_A_FLD = f"{{{A_NS}}}fld"
+_A_BR = f"{{{A_NS}}}br"
+_A_T = f"{{{A_NS}}}t"
+_A_BLIP = f"{{{A_NS}}}blip"
+_A_VIDEO_FILE = f"{{{A_NS}}}videoFile"
+_A_GRAPHIC_DATA = f"{{{A_NS}}}graphic/{{{A_NS}}}graphicData"
+_A_TBL = f"{{{A_NS}}}tbl"
+_A_TR = f"{{{A_NS}}}tr"
+_A_TC = f"{{{A_NS}}}tc"
+_A_TX_BODY = f"{{{A_NS}}}txBody"
+_EMBED = f"{{{R_NAMESPACES[0]}}}embed"
+
+def _text_body(tx_body):
+    """Text of a text body as python-pptx gives it: paragraphs joined by "\\n", line breaks as "\\v"."""
+    if tx_body is None:
+        return ""
+    paragraphs = []
+    for paragraph in tx_body.iterfind(_A_P):
+        pieces = []
+        for child in paragraph:
+            if child.tag == _A_R or child.tag == _A_FLD:
+                t = child.find(_A_T)
+                pieces.append(t.text or "" if t is not None else "")
+            elif child.tag == _A_BR:
+                pieces.append("\v")
+        paragraphs.append("".join(pieces))
+    return "\n".join(paragraphs)
+
+def _is_placeholder(shape):
+    return shape[0].find(f"{_NV_PR}/{_PH}") is not None if len(shape) else False
+
+def _shape_text(shape):
+    """Stripped text of a p:sp shape, or None for other shapes and empty text."""
+    if shape.tag != _SP:
+        return None
+    return _text_body(shape.find(_TX_BODY)).strip() or None
+
+def _table_text(graphic_frame):
+    graphic_data = graphic_frame.find(_A_GRAPHIC_DATA)
+    if graphic_data is None or graphic_data.get("uri") != TABLE_URI:
+        return None
+    table = graphic_data.find(_A_TBL)
+    if table is None:
+        return None
+    table_text = []
+    for row in table.iterfind(_A_TR):
+        row_text = [text for text in (_text_body(cell.find(_A_TX_BODY)).strip() for cell in row.iterfind(_A_TC)) if text]
+        if row_text:
+            table_text.append(" | ".join(row_text))
+    return "\n".join(table_text) or None
+
+def _picture_rel_id(picture):
+    """Relationship id of a picture's image, or None for placeholders, videos and unfilled pictures."""
+    if _is_placeholder(picture) or picture.find(f"*/{_NV_PR}/{_A_VIDEO_FILE}") is not None:
+        return None
+    blip = picture.find(f"{_BLIP_FILL}/{_A_BLIP}")
+    return blip.get(_EMBED) if blip is not None else None
+
+def _slide_items(root, targets):
+    """Text, table, group and image items of one slide, in shape order."""
+    sp_tree = root.find(f"{{{P_NS}}}cSld/{_SP_TREE}")
+    if sp_tree is None:
+        raise ValueError("slide has no shape tree")
+
+    items = []
+    for shape in sp_tree:
+        if shape.tag not in _SHAPE_TAGS:
+            continue
+        text = _shape_text(shape)
+        if text:
+            items.append({"kind": "text", "text": text})
+        elif shape.tag == _GRAPHIC_FRAME:
+            text = _table_text(shape)
+            if text:
+                items.append({"kind": "table", "text": text})
+        elif shape.tag == _GRP_SP:
+            # Only the group's direct text shapes, as in the object model path
+            group_texts = [t for t in (_shape_text(child) for child in shape if child.tag in _SHAPE_TAGS) if t]
+            if group_texts:
+                items.append({"kind": "group", "text": "\n".join(group_texts)})
+        elif shape.tag == _PIC:
+            target = targets.get(_picture_rel_id(shape))
+            if target is not None:
+                items.append({"kind": "image", "part": target})
+    return items
+
+def read_pptx(path):
+    """Extract a PPTX file by reading each slide's XML directly, one slide at a time.
+
+    Produces the same items as the python-pptx path in ``document_parser.parse_pptx``
+    (a shape's text, tables, the text shapes of groups and picture part names) without
+    building shape objects. Raises ValueError for packages it does not recognise so
+    the caller can use python-pptx instead.
+    """
+    with zipfile.ZipFile(document_input(path)) as package:
+        presentation_part = main_part_name(package, "/ppt/presentation.xml")
+        root = ET.fromstring(package.read(presentation_part.lstrip('/')))
+        if root.tag != _PRESENTATION:
+            raise ValueError(f"unexpected presentation element {root.tag}")
+
+        targets = {rel_id: target for rel_id, _, target, external in read_relationships(package, presentation_part)
+                   if not external}
+        slides = []
+        for slide_id in root.iter(_SLD_ID):
+            slide_part = targets.get(_attribute(slide_id, _R_ID))
+            if slide_part is None:
+                raise ValueError("slide relationship not found")
+
+            slide_targets = {rel_id: target for rel_id, _, target, external in read_relationships(package, slide_part)
+                             if not external}
+            with package.open(slide_part.lstrip('/')) as xml_file:
+                slide_root = ET.parse(xml_file).getroot()
+            slides.append(_slide_items(slide_root, slide_targets))
+
+        return {"format": "pptx", "slides": slides}
@@ -0,0 +1,311 @@
+import os
+from collections import Counter
+import pdfplumber
+from dotenv import load_dotenv
+from archive_reader import document_input
+
+# pypdfium2 (installed with pdfplumber) reads the text layer without layout analysis
+try:
+    import pypdfium2
+    import pypdfium2.raw as pdfium_c
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+# PyPDF2 is the pure-Python alternative
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PYPDF2_AVAILABLE = False
+
+load_dotenv()
+
+# PDF text backend configuration
+# Options: "pdfplumber" (layout-aware, default), "pypdf2", "pdfium" (layout-free, fastest),
+# or "auto" (triage every page and send it to the cheapest backend that can handle it)
+PDF_TEXT_BACKEND = os.getenv('PDF_TEXT_BACKEND', 'pdfplumber').lower()
+# Pages need more non-blank characters than this in their text layer to count as text pages
+PDF_TRIAGE_MIN_CHARS = int(os.getenv('PDF_TRIAGE_MIN_CHARS', '10'))
+# Share of the page covered by images above which a page without text is treated as scanned
+PDF_TRIAGE_IMAGE_COVERAGE = float(os.getenv('PDF_TRIAGE_IMAGE_COVERAGE', '0.5'))
+# Ruling lines on a page from which it is read with pdfplumber for its tables
+PDF_TRIAGE_MIN_RULES = int(os.getenv('PDF_TRIAGE_MIN_RULES', '4'))
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+
+# Width or height (in points) under which a drawn path counts as a ruling line
+RULE_THICKNESS = 2.0
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def release_page(page):
+    """Drop a pdfplumber page's parsed layout objects."""
+    try:
+        if hasattr(page, 'close'):
+            page.close()
+        else:
+            page.flush_cache()
+    except Exception as e:
+        log_verbose(f"Failed to release PDF page cache: {e}", "debug")
+
+class PdfBackend:
+    """A PDF opened for reading the text layer page by page."""
+
+    name = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        pass
+
+class PdfplumberBackend(PdfBackend):
+    """pdfplumber's layout-aware extract_text: keeps reading order and table rows, but is slow."""
+
+    name = "pdfplumber"
+
+    def __init__(self, path):
+        self.pdf = pdfplumber.open(document_input(path))
+
+    def __len__(self):
+        return len(self.pdf.pages)
+
+    def page_text(self, page_num):
+        page = self.pdf.pages[page_num]
+        try:
+            return page.extract_text() or ""
+        finally:
+            release_page(page)
+
+    def close(self):
+        self.pdf.close()
+
+class PyPDF2Backend(PdfBackend):
+    """PyPDF2's content stream text, in drawing order."""
+
+    name = "pypdf2"
+
+    def __init__(self, path):
+        self.reader = PyPDF2.PdfReader(document_input(path))
+
+    def __len__(self):
+        return len(self.reader.pages)
+
+    def page_text(self, page_num):
+        return self.reader.pages[page_num].extract_text() or ""
+
+class PdfiumBackend(PdfBackend):
+    """PDFium's text layer without layout analysis; also provides the cheap page triage."""
+
+    name = "pdfium"
+
+    def __init__(self, path):
+        self.pdf = pypdfium2.PdfDocument(document_input(path))
+
+    def __len__(self):
+        return len(self.pdf)
+
+    @staticmethod
+    def _text(page):
+        text_page = page.get_textpage()
+        try:
+            # PDFium ends lines with "\r\n" and marks hyphenation breaks with U+FFFE
+            text = text_page.get_text_range()
+            return text.replace("\r\n", "\n").replace("\r", "\n").replace("\ufffe", "")
+        finally:
+            text_page.close()
+
+    def page_text(self, page_num):
+        page = self.pdf[page_num]
+        try:
+            return self._text(page)
+        finally:
+            page.close()
+
+    def page_profile(self, page_num):
+        """Text of a page plus its triage statistics.
+
+        Statistics are the non-blank characters of the text layer, the share of the
+        page covered by images, the number of ruling lines and of other drawn paths.
+        """
+        page = self.pdf[page_num]
+        try:
+            text = self._text(page)
+            width, height = page.get_size()
+            image_area = 0.0
+            rules = 0
+            paths = 0
+            for obj in page.get_objects(filter=(pdfium_c.FPDF_PAGEOBJ_IMAGE, pdfium_c.FPDF_PAGEOBJ_PATH)):
+                left, bottom, right, top = obj.get_bounds()
+                if obj.type == pdfium_c.FPDF_PAGEOBJ_IMAGE:
+                    image_area += max(0.0, min(right, width) - max(left, 0.0)) * max(0.0, min(top, height) - max(bottom, 0.0))
+                elif min(right - left, top - bottom) <= RULE_THICKNESS < max(right - left, top - bottom):
+                    rules += 1
+                else:
+                    paths += 1
+            stats = {
+                "chars": len(text.strip()),
+                "image_coverage": min(1.0, image_area / (width * height)) if width and height else 0.0,
+                "rules": rules,
+                "paths": paths
+            }
+            return text, stats
+        finally:
+            page.close()
+
+    def may_hold_table(self, page_num):
+        """Cheap table pre-check from the page's drawn paths, without any layout analysis.
+
+        A table cell needs both horizontal and vertical ruling edges. A thin path can
+        only give edges in its own direction; any larger path (a rectangle, a grid)
+        can give both.
+        """
+        page = self.pdf[page_num]
+        try:
+            horizontal = vertical = False
+            for obj in page.get_objects(filter=(pdfium_c.FPDF_PAGEOBJ_PATH,)):
+                left, bottom, right, top = obj.get_bounds()
+                width, height = right - left, top - bottom
+                if height <= RULE_THICKNESS < width:
+                    horizontal = True
+                elif width <= RULE_THICKNESS < height:
+                    vertical = True
+                elif width > RULE_THICKNESS:
+                    return True
+                if horizontal and vertical:
+                    return True
+            return False
+        finally:
+            page.close()
+
+PDF_BACKENDS = {
+    "pdfplumber": PdfplumberBackend,
+    "pypdf2": PyPDF2Backend,
+    "pdfium": PdfiumBackend,
+}
+
+def available_pdf_backends():
+    """Names of the text backends that can be used in this environment."""
+    available = {"pdfplumber": True, "pypdf2": PYPDF2_AVAILABLE, "pdfium": PDFIUM_AVAILABLE}
+    return [name for name in PDF_BACKENDS if available[name]]
+
+def resolve_pdf_backend(backend=None):
+    """Return the configured backend name, falling back to pdfplumber when it cannot be used."""
+    backend = (backend or PDF_TEXT_BACKEND).lower()
+    if backend == "auto":
+        if PDFIUM_AVAILABLE:
+            return backend
+        log_verbose("PDF_TEXT_BACKEND=auto needs pypdfium2 for page triage, using pdfplumber", "warning")
+        return "pdfplumber"
+    if backend not in PDF_BACKENDS:
+        log_verbose(f"Unknown PDF_TEXT_BACKEND '{backend}', using pdfplumber", "warning")
+        return "pdfplumber"
+    if backend not in available_pdf_backends():
+        log_verbose(f"PDF backend '{backend}' is not installed, using pdfplumber", "warning")
+        return "pdfplumber"
+    return backend
+
+def open_pdf_backend(name, path):
+    return PDF_BACKENDS[name](path)
+
+def triage_page(stats):
+    """Route a page by its statistics.
+
+    Returns "text" (the text layer is enough), "ruled" (drawn table lines, so
+    pdfplumber reads the text and tables), "scanned" (images or drawings with no
+    usable text, so OCR) or "blank" (nothing drawn on the page at all).
+    """
+    if stats["chars"] > PDF_TRIAGE_MIN_CHARS:
+        return "ruled" if stats["rules"] >= PDF_TRIAGE_MIN_RULES else "text"
+    if stats["image_coverage"] >= PDF_TRIAGE_IMAGE_COVERAGE:
+        return "scanned"
+    if stats["rules"] >= PDF_TRIAGE_MIN_RULES:
+        return "ruled"
+    if not (stats["chars"] or stats["image_coverage"] or stats["rules"] or stats["paths"]):
+        return "blank"
+    return "scanned"
+
+class PdfPagePlanner:
+    """Decides how each page of one PDF is read.
+
+    ``plan(page_num)`` returns ``(route, text)``:
+
+    - "text": ``text`` comes from the configured (or, in auto mode, the fastest) backend;
+    - "pdfplumber": the page is read with pdfplumber, which can also fall back to its
+      tables; ``text`` is the pdfplumber text from ``parsed_pages`` or None;
+    - "scanned": no usable text layer, the page goes straight to OCR;
+    - "blank": nothing on the page, neither text extraction nor OCR is needed.
+
+    ``routes`` counts the pages sent each way.
+    """
+
+    def __init__(self, path, backend=None, parsed_pages=None):
+        self.path = path
+        self.backend = resolve_pdf_backend(backend)
+        self.parsed_pages = parsed_pages
+        self.routes = Counter()
+        self.reader = None
+        self._pdfium = None
+        if self.backend == "auto":
+            self.reader = PdfiumBackend(path)
+        elif self.backend != "pdfplumber":
+            self.reader = open_pdf_backend(self.backend, path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._pdfium is not None and self._pdfium is not self.reader:
+            self._pdfium.close()
+        self._pdfium = None
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def may_hold_table(self, page_num):
+        """PDFium's table pre-check for a page, or None when PDFium is not available."""
+        if not PDFIUM_AVAILABLE:
+            return None
+        if self._pdfium is None:
+            self._pdfium = self.reader if isinstance(self.reader, PdfiumBackend) else PdfiumBackend(self.path)
+        return self._pdfium.may_hold_table(page_num)
+
+    def _parsed_text(self, page_num):
+        if self.parsed_pages is None:
+            return None
+        return self.parsed_pages[page_num]
+
+    def plan(self, page_num):
+        if self.backend == "pdfplumber":
+            route, text = "pdfplumber", self._parsed_text(page_num)
+        elif self.backend != "auto":
+            route, text = "text", self.reader.page_text(page_num)
+        else:
+            text, stats = self.reader.page_profile(page_num)
+            route = triage_page(stats)
+            if route == "ruled":
+                route, text = "pdfplumber", self._parsed_text(page_num)
+            elif route != "text":
+                text = None
+        self.routes[route] += 1
+        return route, text
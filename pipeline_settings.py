@@ -0,0 +1,42 @@
+"""Settings shared by the pipeline steps, kept apart from the steps' heavy imports.
+
+Inspection and the watch daemon need the supported document types and the worker count
+parsing, but not Tesseract probing or the PDF backends that come with OCR_Extractor.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+
+# Document types the extractor handles
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.pptx', '.txt'}
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def resolve_worker_count(value):
+    """Turn a worker setting ("auto", "0", "8", 8) into a positive process count."""
+    if value is None:
+        return 1
+    if str(value).strip().lower() in ('auto', '0', ''):
+        return os.cpu_count() or 1
+    try:
+        return max(1, int(value))
+    except ValueError:
+        log_verbose(f"Invalid worker count '{value}', falling back to 1", "warning")
+        return 1
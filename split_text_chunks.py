@@ -7,7 +7,12 @@ import requests
 import numpy as np
 import concurrent.futures
 import time
+import zlib
 from threading import Lock
+from collections import deque
+from itertools import chain, islice
+from corpus_manifest import scan_corpus, get_corpus_manifest
+from chunk_cache import get_chunk_cache, chunk_content_hash
 
 # Try to import SentenceTransformers, handle gracefully if not available
 try:
@@ -17,6 +22,13 @@ except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
     print("⚠️  SentenceTransformers not available. Install with: pip install sentence-transformers")
 
+# transformers (installed with sentence-transformers) loads a tokenizer to size chunks for Ollama models
+try:
+    from transformers import AutoTokenizer
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+
 load_dotenv()
 
 # Configuration from environment variables
@@ -26,6 +38,32 @@ OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
 SENTENCE_TRANSFORMER_MODEL = os.getenv("SENTENCE_TRANSFORMER_MODEL", "all-MiniLM-L6-v2")
 MODELS_FOLDER_PATH = os.getenv("MODELS_FOLDER_PATH", "./models")
 
+# Characters of an extracted text file read at a time while it is chunked
+CHUNK_READ_CHARS = int(os.getenv("CHUNK_READ_CHARS", "1048576"))
+# Chunks embedded and written out together while a file is vectorized
+EMBEDDING_BATCH_CHUNKS = int(os.getenv("EMBEDDING_BATCH_CHUNKS", "256"))
+# Chunks of several files gathered before they are embedded together, sorted by length
+# (0 = embed each file on its own); a file with more chunks is embedded on its own
+EMBEDDING_POOL_CHUNKS = int(os.getenv("EMBEDDING_POOL_CHUNKS", "2048"))
+
+# "words" sizes chunks and overlap in whitespace words; "tokens" in the embedding model's
+# tokens, with chunks capped at its max sequence length so nothing is truncated away
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "words").lower()
+# Hugging Face tokenizer (name or local path) for sizing chunks when embeddings come from Ollama
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "")
+# Longest input the embedding model reads, in tokens (0 = the model's own max_seq_length)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "0"))
+# Words (or chunks) tokenized together in one call of the fast tokenizer
+TOKENIZE_BATCH = 2048
+
+# "fixed" starts a chunk every CHUNK_SIZE - CHUNK_OVERLAP words; "content" ends chunks where a
+# rolling hash of the text says so, so an edit only changes the chunks around it
+CHUNK_BOUNDARIES = os.getenv("CHUNK_BOUNDARIES", "fixed").lower()
+# Words the boundary hash looks at: a boundary depends on nothing further back
+CDC_WINDOW_WORDS = 8
+CDC_HASH_BASE = 0x100000001B3
+CDC_HASH_MASK = (1 << 64) - 1
+
 # Check for verbose mode
 VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
 DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
@@ -180,70 +218,443 @@ def get_sentence_transformer_embedding(text, model_name=SENTENCE_TRANSFORMER_MOD
         log_verbose(f"Error generating SentenceTransformer embedding: {e}", level="error")
         return None
 
-def split_text_into_chunks(text, chunk_size=500, overlap=50):
-    """Split text into overlapping chunks for better context preservation 📝"""
-    # Clean and normalize text first
-    text = re.sub(r'\s+', ' ', text.strip())  # Normalize whitespace
-    words = text.split()
+class ChunkTokenizer:
+    """The embedding model's tokenizer, sizing chunks in tokens and counting what the model would cut off."""
     
-    if len(words) <= chunk_size:
-        return [text]  # Return as single chunk if smaller than chunk_size
+    def __init__(self, tokenizer, max_seq_length, name):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.name = name
+        # [CLS]/[SEP] and the like take part of every input
+        self.special_tokens = tokenizer.num_special_tokens_to_add(pair=False)
+        # Chunk text (without special tokens) that fits in one input
+        self.budget = max_seq_length - self.special_tokens
     
-    chunks = []
-    step_size = chunk_size - overlap
+    def count(self, texts):
+        """Token counts of texts (without special tokens), tokenized in one batch."""
+        return [len(ids) for ids in self.tokenizer(list(texts), add_special_tokens=False, verbose=False)["input_ids"]]
+
+class TruncationReport:
+    """Chunks and tokens beyond the embedding model's max sequence length, which it never sees."""
     
-    for i in range(0, len(words), step_size):
-        chunk_words = words[i:i + chunk_size]
-        chunk_text = ' '.join(chunk_words)
-        chunks.append(chunk_text)
-        
-        # Stop if we've reached the end
-        if i + chunk_size >= len(words):
-            break
+    def __init__(self):
+        self.chunks = 0
+        self.truncated_chunks = 0
+        self.tokens = 0
+        self.truncated_tokens = 0
+    
+    def add(self, token_count, max_seq_length):
+        self.chunks += 1
+        self.tokens += token_count
+        if token_count > max_seq_length:
+            self.truncated_chunks += 1
+            self.truncated_tokens += token_count - max_seq_length
     
-    return chunks
+    def merge(self, other):
+        self.chunks += other.chunks
+        self.truncated_chunks += other.truncated_chunks
+        self.tokens += other.tokens
+        self.truncated_tokens += other.truncated_tokens
+    
+    def summary(self):
+        return (f"{self.truncated_chunks}/{self.chunks} chunks truncated "
+                f"({self.truncated_chunks / max(self.chunks, 1):.1%}), "
+                f"{self.truncated_tokens / max(self.tokens, 1):.1%} of tokens never embedded")
 
-def process_text_files_and_vectorize(input_dir=os.getenv("CHUNKED_INPUT_FOLDER_PATH"), output_dir=os.getenv("CHUNKED_OUTPUT_FOLDER_PATH"), embedding_type=None, model_name=None, chunk_size=500, overlap=50, max_workers=4, verbose=None):
-    """Process text files, split into chunks, and transform into vector embeddings! Each file gets its own JSON! 🚀"""
+# Tokenizers already loaded, by (embedding type, model)
+_chunk_tokenizers = {}
+
+def _load_chunk_tokenizer(embedding_type, model_name):
+    if CHUNK_TOKENIZER:
+        if not TRANSFORMERS_AVAILABLE:
+            log_verbose("CHUNK_TOKENIZER needs transformers. Install with: pip install transformers", level="warning")
+            return None
+        tokenizer = AutoTokenizer.from_pretrained(CHUNK_TOKENIZER, cache_dir=MODELS_FOLDER_PATH, use_fast=True)
+        # Tokenizers without a known limit report a huge placeholder
+        max_seq_length = CHUNK_MAX_TOKENS or (tokenizer.model_max_length if tokenizer.model_max_length < 1_000_000 else 0)
+        if not max_seq_length:
+            log_verbose(f"{CHUNK_TOKENIZER} has no max sequence length; set CHUNK_MAX_TOKENS", level="warning")
+            return None
+        name = CHUNK_TOKENIZER
+    elif embedding_type.lower() == "sentence_transformer" and SENTENCE_TRANSFORMERS_AVAILABLE:
+        model = get_sentence_transformer_model(model_name)
+        tokenizer = model.tokenizer
+        max_seq_length = CHUNK_MAX_TOKENS or model.max_seq_length
+        name = model_name
+    else:
+        return None
     
-    # Set defaults from environment if not provided
+    if not getattr(tokenizer, "is_fast", False):
+        log_verbose(f"The {name} tokenizer is not a fast tokenizer; token-sized chunking will be slow", level="warning")
+    return ChunkTokenizer(tokenizer, max_seq_length, name)
+
+def get_chunk_tokenizer(embedding_type=None, model_name=None):
+    """The tokenizer of the configured embedding model, or None when there is none to load.
+
+    SentenceTransformer models bring their own; for Ollama models CHUNK_TOKENIZER names
+    a Hugging Face tokenizer matching the model. Without one, CHUNK_UNIT=tokens falls
+    back to sizing chunks in words.
+    """
     if embedding_type is None:
         embedding_type = EMBEDDING_TYPE
     if model_name is None:
         model_name = OLLAMA_MODEL_NAME if embedding_type.lower() == "ollama" else SENTENCE_TRANSFORMER_MODEL
-    if verbose is None:
-        verbose = VERBOSE
     
-    start_time = time.time()
+    key = (embedding_type.lower(), model_name)
+    if key not in _chunk_tokenizers:
+        try:
+            _chunk_tokenizers[key] = _load_chunk_tokenizer(embedding_type, model_name)
+        except Exception as e:
+            log_verbose(f"Could not load a tokenizer for {model_name}: {e}", level="warning")
+            _chunk_tokenizers[key] = None
+        if _chunk_tokenizers[key] is None and CHUNK_UNIT == "tokens":
+            log_verbose(f"CHUNK_UNIT=tokens needs the tokenizer of {model_name} (set CHUNK_TOKENIZER for Ollama models); sizing chunks in words", level="warning")
+    return _chunk_tokenizers[key]
+
+def split_text_into_chunks(text, chunk_size=500, overlap=50):
+    """Split text into overlapping chunks for better context preservation 📝"""
+    # Text without words is still returned as one (empty) chunk
+    return list(iter_text_chunks([text], chunk_size, overlap)) or [""]
+
+def iter_text_blocks(file_path, block_chars=CHUNK_READ_CHARS):
+    """Read an extracted text file block by block."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_chars), ""):
+            yield block
+
+def iter_words(blocks):
+    """Yield the words of text given in blocks, joining words split across two blocks."""
+    carry = ""
+    for block in blocks:
+        if not block:
+            continue
+        words = (carry + block).split()
+        # A word touching the end of the block may continue in the next one
+        carry = words.pop() if words and not block[-1].isspace() else ""
+        yield from words
+    if carry:
+        yield carry
+
+def _sliding_windows(items, chunk_size, overlap):
+    """Yield the window of items of every chunk, holding no more than chunk_size items.
+
+    A full window is yielded every ``chunk_size - overlap`` items, then the items left
+    over unless the last full window already covered them. Each window is only valid
+    until the next one is requested.
+    """
+    step_size = chunk_size - overlap
+    window = deque()
+    emitted = False
     
-    # Get all text files from the input directory
-    input_path = Path(input_dir)
-    text_files = list(input_path.glob("*.txt"))
+    for item in items:
+        window.append(item)
+        if len(window) == chunk_size:
+            yield window
+            emitted = True
+            for _ in range(step_size):
+                window.popleft()
     
-    if not text_files:
-        log_verbose(f"No text files found in {input_dir}", level="error")
-        return []
+    if window and (not emitted or len(window) > overlap):
+        yield window
+
+def _with_token_counts(items, chunk_tokenizer, word=lambda item: item):
+    """Pair each item with the token count of its word, tokenizing TOKENIZE_BATCH words per call."""
+    for batch in _batched(items, TOKENIZE_BATCH):
+        yield from zip(batch, chunk_tokenizer.count(word(item) for item in batch))
+
+def _token_windows(counted_items, budget, overlap):
+    """Yield windows of (item, token count) pairs holding at most ``budget`` tokens.
+
+    Each window starts with the last items of the previous one, up to ``overlap`` tokens.
+    A single item longer than the budget gets a window of its own. Each window is only
+    valid until the next one is requested.
+    """
+    window = deque()
+    tokens = 0
+    fresh = False  # Items added since the last window was yielded
     
-    log_verbose(f"Found {len(text_files)} text files to process!")
-    log_verbose(f"Using embedding type: {embedding_type.upper()}")
-    log_verbose(f"Model: {model_name}")
+    for item, count in counted_items:
+        if window and tokens + count > budget:
+            yield window
+            fresh = False
+            tokens = _keep_overlap(window, overlap)
+        tokens = _make_room(window, tokens, count, budget)
+        window.append((item, count))
+        tokens += count
+        fresh = True
     
-    # Create output directory if it doesn't exist
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+    if fresh:
+        yield window
+
+def _keep_overlap(window, overlap):
+    """Drop all but the last items of a yielded window, up to ``overlap`` in size. Returns the size kept."""
+    kept = 0
+    keep = 0
+    for _, size in reversed(window):
+        if kept + size > overlap:
+            break
+        kept += size
+        keep += 1
+    while len(window) > keep:
+        window.popleft()
+    return kept
+
+def _make_room(window, size, item_size, max_size):
+    """Drop overlap items from the front until an item of item_size fits. Returns the new size."""
+    while window and size + item_size > max_size:
+        size -= window.popleft()[1]
+    return size
+
+def _content_windows(sized_items, target, max_size, overlap, word=lambda item: item):
+    """Yield windows of (item, size) pairs whose ends are chosen by the content.
+
+    A chunk ends after a word when a rolling hash of the last CDC_WINDOW_WORDS words hits
+    a fixed pattern and the chunk has at least ``target // 2`` of new text, or before the
+    word that would take it past ``max_size``. Boundaries depend only on nearby words, not
+    on their offset in the document, so inserting or deleting text moves only the
+    boundaries next to the edit. Chunks average about ``target`` in size, and each starts
+    with up to ``overlap`` of the previous one. Each window is only valid until the next
+    one is requested.
+    """
+    min_size = target // 2
+    divisor = max(1, target - min_size)
+    drop_factor = pow(CDC_HASH_BASE, CDC_WINDOW_WORDS, 1 << 64)
+    recent = deque()  # Hashes of the last CDC_WINDOW_WORDS words
+    rolling = 0
+    window = deque()
+    size = 0
+    new_size = 0  # Size added since the last window was yielded
     
-    # Check embedding system availability
+    for item, item_size in sized_items:
+        if new_size and size + item_size > max_size:
+            yield window
+            size = _keep_overlap(window, overlap)
+            new_size = 0
+        size = _make_room(window, size, item_size, max_size)
+        window.append((item, item_size))
+        size += item_size
+        new_size += item_size
+        
+        word_hash = zlib.crc32(word(item).encode('utf-8'))
+        recent.append(word_hash)
+        rolling = (rolling * CDC_HASH_BASE + word_hash) & CDC_HASH_MASK
+        if len(recent) > CDC_WINDOW_WORDS:
+            rolling = (rolling - recent.popleft() * drop_factor) & CDC_HASH_MASK
+        
+        if new_size >= min_size and (rolling >> 16) % divisor == 0:
+            yield window
+            size = _keep_overlap(window, overlap)
+            new_size = 0
+    
+    if new_size:
+        yield window
+
+def _windows(items, chunk_size, overlap, chunk_tokenizer, word=lambda item: item, boundaries="fixed"):
+    """Windows of items per chunk: chunk_size/overlap in words, or in tokens when a tokenizer is given.
+
+    With ``boundaries="content"`` chunks end where the content says (see _content_windows),
+    ranging from half to twice chunk_size and never past the tokenizer's budget.
+    """
+    if boundaries == "content":
+        if chunk_tokenizer is None:
+            sized_items = ((item, 1) for item in items)
+            target, max_size = chunk_size, 2 * chunk_size
+        else:
+            sized_items = _with_token_counts(items, chunk_tokenizer, word)
+            target = min(chunk_size, chunk_tokenizer.budget // 2)
+            max_size = min(2 * target, chunk_tokenizer.budget)
+        for window in _content_windows(sized_items, target, max_size, overlap, word):
+            yield [item for item, _ in window]
+    elif chunk_tokenizer is None:
+        yield from _sliding_windows(items, chunk_size, overlap)
+    else:
+        budget = min(chunk_size, chunk_tokenizer.budget)
+        for window in _token_windows(_with_token_counts(items, chunk_tokenizer, word), budget, overlap):
+            yield [item for item, _ in window]
+
+def iter_text_chunks(blocks, chunk_size=500, overlap=50, chunk_tokenizer=None, boundaries="fixed"):
+    """Chunk text given in blocks lazily, keeping only the words of the current chunk 📝
+
+    Gives the same chunks as joining the blocks and calling split_text_into_chunks, in
+    memory that does not grow with the length of the text. With a ChunkTokenizer,
+    ``chunk_size`` and ``overlap`` count the embedding model's tokens, and chunks never
+    exceed its max sequence length. ``boundaries="content"`` places chunk ends by content
+    instead of at fixed offsets.
+    """
+    for window in _windows(iter_words(blocks), chunk_size, overlap, chunk_tokenizer, boundaries=boundaries):
+        yield ' '.join(window)
+
+def iter_structured_records(file_path):
+    """Read the unit records of a structured extraction file (``_extracted.jsonl``) one line at a time."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _window_chunk(window):
+    """Chunk text, character span and source units of the words in the window."""
+    units = dict.fromkeys(word[3] for word in window)
+    return {
+        "text": ' '.join(word[0] for word in window),
+        "start_char": window[0][1],
+        "end_char": window[-1][2],
+        "source_units": [{"unit": unit, "index": index} for unit, index in units]
+    }
+
+def chunk_structured_records(records, chunk_size=500, overlap=50, chunk_tokenizer=None, boundaries="fixed"):
+    """Chunk structured extraction records as they are read, without joining the document first 📝
+
+    Gives the same chunk texts as split_text_into_chunks on the extracted text. Each
+    chunk also carries its character span in the ``_extracted.txt`` file and the pages,
+    slides or images it came from. A ChunkTokenizer sizes chunks in tokens and
+    ``boundaries`` places them, as in iter_text_chunks.
+    """
+    def words():  # (word, start, end, (unit, index))
+        for record in records:
+            unit = (record["unit"], record["index"])
+            for match in re.finditer(r'\S+', record["text"]):
+                yield match.group(), record["start"] + match.start(), record["start"] + match.end(), unit
+    
+    for window in _windows(words(), chunk_size, overlap, chunk_tokenizer, word=lambda word: word[0], boundaries=boundaries):
+        yield _window_chunk(window)
+
+def find_extracted_files(input_dir):
+    """Extraction outputs to chunk: structured ``.jsonl`` files, plus ``.txt`` files that have none.
+
+    The folder is listed through the corpus manifest; extraction writes it flat, so
+    sub-folders (such as ``tables``) are not looked into.
+    """
+    corpus = scan_corpus(input_dir, recursive=False, extensions=(".txt", ".jsonl"))
+    structured_files = [f.path for f in corpus if f.path.suffix == ".jsonl"]
+    structured_stems = {file_path.stem for file_path in structured_files}
+    return [f.path for f in corpus if f.path.suffix == ".txt" and f.path.stem not in structured_stems] + structured_files
+
+def _reusable_outputs(manifest, stage, settings, text_files):
+    """Earlier (output file, chunk count) of unchanged text files whose chunk file is untouched."""
+    if manifest is None:
+        return {}
+    return {file_path: (Path(result["output_file"]), result["chunk_count"])
+            for file_path, result in manifest.reusable(stage, settings, text_files).items()}
+
+def _chunk_records(file_path, source_file, pieces):
+    """Number the chunk pieces of a file and add their common fields."""
+    for i, piece in enumerate(pieces):
+        chunk_text = piece.pop("text")
+        chunk_data = {
+            "source_file": source_file,
+            "chunk_id": f"{file_path.stem}_chunk_{i}",
+            "chunk_index": i,
+            "text": chunk_text,
+            "content_hash": chunk_content_hash(chunk_text),
+            "character_count": len(chunk_text),
+            "word_count": len(chunk_text.split())
+        }
+        chunk_data.update(piece)
+        yield chunk_data
+
+def _with_chunk_token_counts(chunks, tokenizer, truncation=None):
+    """Add the model's token count (special tokens included) to each chunk record, counted in batches.
+
+    Chunks longer than the model's max sequence length are added to ``truncation``.
+    """
+    for batch in _batched(chunks, TOKENIZE_BATCH // 8):
+        for chunk, count in zip(batch, tokenizer.count(chunk["text"] for chunk in batch)):
+            chunk["token_count"] = count + tokenizer.special_tokens
+            if truncation is not None:
+                truncation.add(chunk["token_count"], tokenizer.max_seq_length)
+        yield from batch
+
+def iter_chunk_records(file_path, chunk_size=500, overlap=50, tokenizer=None, truncation=None):
+    """Yield the chunk records of one extraction output (text or structured) as the file is read.
+
+    With the embedding model's ChunkTokenizer, chunks are sized in its tokens when
+    CHUNK_UNIT is "tokens", every record gets its ``token_count``, and chunks the model
+    would truncate are counted in ``truncation``.
+    """
+    file_path = Path(file_path)
+    chunk_tokenizer = tokenizer if CHUNK_UNIT == "tokens" else None
+    
+    if file_path.suffix == ".jsonl":
+        pieces = chunk_structured_records(iter_structured_records(file_path), chunk_size, overlap, chunk_tokenizer, CHUNK_BOUNDARIES)
+        # Character offsets refer to the text file written next to the records
+        source_file = file_path.with_suffix(".txt").name
+    else:
+        pieces = ({"text": chunk_text} for chunk_text in iter_text_chunks(iter_text_blocks(file_path), chunk_size, overlap, chunk_tokenizer, CHUNK_BOUNDARIES))
+        source_file = file_path.name
+    
+    records = _chunk_records(file_path, source_file, pieces)
+    if tokenizer is not None:
+        records = _with_chunk_token_counts(records, tokenizer, truncation)
+    yield from records
+
+def build_chunks(file_path, chunk_size=500, overlap=50):
+    """Chunk one extraction output (text or structured) into chunk records, or None if it holds no text."""
+    file_chunks = list(iter_chunk_records(file_path, chunk_size, overlap))
+    
+    # Skip empty files
+    if not file_chunks:
+        log_verbose(f"Skipping empty file: {Path(file_path).name}", level="warning")
+        return None
+    
+    log_verbose(f"Created {len(file_chunks)} chunks from {Path(file_path).name}", level="success")
+    return file_chunks
+
+def write_json_array(path, items):
+    """Write items one at a time as the JSON array json.dump(items, indent=2) would write. Returns the item count.
+
+    The array goes to a temporary file that replaces ``path`` once complete, so a
+    failure part-way never leaves a truncated file. Nothing is written for no items.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for item in items:
+                f.write(",\n  " if count else "\n  ")
+                f.write(json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+                count += 1
+            f.write("\n]")
+        if count:
+            os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return count
+
+def write_chunk_file(file_path, output_file_path, chunks):
+    """Write a file's chunk records as they are produced. Returns the chunk count, or None for an empty file."""
+    chunk_count = write_json_array(output_file_path, chunks)
+    if not chunk_count:
+        log_verbose(f"Skipping empty file: {Path(file_path).name}", level="warning")
+        return None
+    log_verbose(f"Created {chunk_count} chunks from {Path(file_path).name}", level="success")
+    return chunk_count
+
+def _batched(items, size):
+    """Group items into lists of at most size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def check_embedding_backend(embedding_type, model_name, max_workers=4):
+    """Make sure the configured embedding system can be used before any file is chunked."""
     if embedding_type.lower() == "sentence_transformer":
         if not SENTENCE_TRANSFORMERS_AVAILABLE:
             log_verbose("SentenceTransformers not available! Install with: pip install sentence-transformers", level="error")
-            return []
+            return False
         try:
             # Test loading the model
             get_sentence_transformer_model(model_name)
             log_verbose(f"SentenceTransformer model ready!")
         except Exception as e:
             log_verbose(f"Error loading SentenceTransformer model: {e}", level="error")
-            return []
+            return False
     else:  # Ollama
         try:
             test_response = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
@@ -252,85 +663,272 @@ def process_text_files_and_vectorize(input_dir=os.getenv("CHUNKED_INPUT_FOLDER_P
                 log_verbose(f"Using {max_workers} parallel workers for faster processing")
             else:
                 log_verbose("Ollama is not responding properly!", level="error")
-                return []
+                return False
         except requests.exceptions.RequestException:
             log_verbose(f"Cannot connect to Ollama! Make sure it's running on {OLLAMA_URL}", level="error")
-            return []
+            return False
+    return True
+
+def _chunk_length(chunk):
+    """Length of a chunk as the embedding model sees it: its tokens when counted, else its characters."""
+    return chunk.get("token_count") or len(chunk["text"])
+
+def _embed_chunks(chunks, embedding_type, model_name, max_workers=4):
+    """Attach an embedding to each chunk record. Returns how many came from the chunk cache.
+
+    Each new text is embedded once, even when it repeats, in batches of EMBEDDING_BATCH_CHUNKS
+    texts of similar length, so the model pads each batch as little as possible.
+    """
+    # Chunks whose text was embedded before (in an earlier revision or another file) reuse that vector
+    cache = get_chunk_cache()
+    cache_model = f"{embedding_type.lower()}:{model_name}"
+    vectors = cache.get_embeddings(cache_model, [chunk["content_hash"] for chunk in chunks]) if cache is not None else {}
+    reused = sum(1 for chunk in chunks if chunk["content_hash"] in vectors)
+    
+    new_chunks = {chunk["content_hash"]: chunk for chunk in chunks if chunk["content_hash"] not in vectors}
+    for batch in _batched(sorted(new_chunks.values(), key=_chunk_length), EMBEDDING_BATCH_CHUNKS):
+        embeddings = get_embedding_batch([chunk["text"] for chunk in batch], embedding_type, model_name, max_workers)
+        log_verbose(f"Generated {len(embeddings)} embeddings!", level="success")
+        new_vectors = {chunk["content_hash"]: embedding for chunk, embedding in zip(batch, embeddings)}
+        if cache is not None:
+            # Zero vectors stand in for failed requests and are not kept
+            cache.put_embeddings(cache_model, {content_hash: emb for content_hash, emb in new_vectors.items() if emb is not None and any(emb)})
+        vectors.update(new_vectors)
+    
+    # Attach embeddings to chunks
+    for chunk in chunks:
+        if chunk["content_hash"] in vectors:
+            chunk["embedding"] = vectors[chunk["content_hash"]]
+    return reused
+
+def _vectorized_output_path(file_path, output_dir, embedding_type):
+    embedding_suffix = "ollama" if embedding_type.lower() == "ollama" else "st"
+    return Path(output_dir) / f"{Path(file_path).stem}_vectorized_{embedding_suffix}.json"
+
+def _report_vectorized(output_file_path, chunk_count, reused_embeddings, tokenizer, file_truncation, truncation=None):
+    log_verbose(f"Saved {chunk_count} vectorized chunks to: {output_file_path.name}", level="success")
+    if reused_embeddings:
+        log_verbose(f"Reused {reused_embeddings}/{chunk_count} cached embeddings of unchanged chunks")
+    if tokenizer is not None:
+        log_verbose(f"Truncation at {tokenizer.max_seq_length} tokens: {file_truncation.summary()}",
+                    level="warning" if file_truncation.truncated_chunks else "info")
+        if truncation is not None:
+            truncation.merge(file_truncation)
+
+def _chunk_file_records(file_path, embedding_type, model_name, chunk_size, overlap):
+    """(chunk record iterator, tokenizer, TruncationReport) of one extracted file."""
+    # Split text into chunks with metadata, as the file is read
+    tokenizer = get_chunk_tokenizer(embedding_type, model_name)
+    unit = "tokens" if CHUNK_UNIT == "tokens" and tokenizer is not None else "words"
+    log_verbose(f"Splitting text into chunks (size: {chunk_size} {unit}, overlap: {overlap})...", level="process")
+    file_truncation = TruncationReport()
+    return iter_chunk_records(file_path, chunk_size, overlap, tokenizer, file_truncation), tokenizer, file_truncation
+
+def _stream_vectorized_file(file_path, output_dir, chunks, embedding_type, model_name, max_workers, tokenizer, file_truncation, truncation=None):
+    """Embed chunk records a batch at a time and write them to the file's JSON as they are embedded."""
+    reused_embeddings = 0
+    
+    def embedded_chunks():
+        nonlocal reused_embeddings
+        # Vectorize chunks a batch at a time using the configured embedding method
+        for batch in _batched(chunks, EMBEDDING_BATCH_CHUNKS):
+            reused_embeddings += _embed_chunks(batch, embedding_type, model_name, max_workers)
+            yield from batch
+    
+    # Save each file's chunks to its own JSON, written as the batches are embedded
+    output_file_path = _vectorized_output_path(file_path, output_dir, embedding_type)
+    log_verbose("Generating embeddings... Universal magic! ✨", level="process")
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    chunk_count = write_chunk_file(file_path, output_file_path, embedded_chunks())
+    if chunk_count is None:
+        return None
+    
+    _report_vectorized(output_file_path, chunk_count, reused_embeddings, tokenizer, file_truncation, truncation)
+    return output_file_path, chunk_count
+
+def vectorize_text_file(file_path, output_dir, embedding_type, model_name, chunk_size=500, overlap=50, max_workers=4, truncation=None):
+    """Chunk and embed one extracted file (.txt or .jsonl) into its own JSON. Returns (output path, chunk count), or None for an empty file.
+
+    Chunks the embedding model would truncate are reported, and added to ``truncation`` when given.
+    """
+    chunks, tokenizer, file_truncation = _chunk_file_records(Path(file_path), embedding_type, model_name, chunk_size, overlap)
+    return _stream_vectorized_file(Path(file_path), output_dir, chunks, embedding_type, model_name, max_workers,
+                                   tokenizer, file_truncation, truncation)
+
+class EmbeddingScheduler:
+    """Embeds the chunks of many files together, in batches of chunks of similar length.
+
+    The chunks of small files wait in a pool until EMBEDDING_POOL_CHUNKS of them have
+    gathered. The pool's new texts are then sorted by length and embedded
+    EMBEDDING_BATCH_CHUNKS at a time, so batches are full and pad little however small each
+    document is; the vectors are scattered back and each file's JSON is written. A file
+    with more chunks than the pool is embedded and written on its own, as it is read.
+    """
+    
+    def __init__(self, output_dir, embedding_type, model_name, max_workers=4, pool_chunks=EMBEDDING_POOL_CHUNKS, truncation=None):
+        self.output_dir = Path(output_dir)
+        self.embedding_type = embedding_type
+        self.model_name = model_name
+        self.max_workers = max_workers
+        self.pool_chunks = pool_chunks
+        self.truncation = truncation
+        # (file path, chunk records, tokenizer, TruncationReport) of files waiting in the pool
+        self.pending = []
+        self.pooled = 0
+        # (file path, output path, chunk count) of files written since the last take_finished()
+        self.finished = []
+    
+    def add(self, file_path, chunk_size=500, overlap=50):
+        """Chunk one extracted file and queue it for embedding; embeds the pool once it is full."""
+        file_path = Path(file_path)
+        chunks, tokenizer, file_truncation = _chunk_file_records(file_path, self.embedding_type, self.model_name, chunk_size, overlap)
+        head = list(islice(chunks, self.pool_chunks + 1))
+        
+        if len(head) > self.pool_chunks:
+            # Too large to pool: its own batches are full anyway
+            result = _stream_vectorized_file(file_path, self.output_dir, chain(head, chunks), self.embedding_type, self.model_name,
+                                             self.max_workers, tokenizer, file_truncation, self.truncation)
+            if result is not None:
+                self.finished.append((file_path, *result))
+            return
+        if not head:
+            log_verbose(f"Skipping empty file: {file_path.name}", level="warning")
+            return
+        
+        log_verbose(f"Created {len(head)} chunks from {file_path.name}, waiting to be embedded with other files", level="success")
+        self.pending.append((file_path, head, tokenizer, file_truncation))
+        self.pooled += len(head)
+        if self.pooled >= self.pool_chunks:
+            self.flush()
+    
+    def flush(self):
+        """Embed every pooled chunk together and write the pooled files.
+
+        A file leaves the pool once its JSON is written. Files that fail are logged by
+        name and dropped; they are not recorded, so the next run tries them again.
+        """
+        if not self.pending:
+            return
+        
+        chunks = [chunk for _, file_chunks, _, _ in self.pending for chunk in file_chunks]
+        log_verbose(f"Generating embeddings for {len(chunks)} chunks of {len(self.pending)} files... Universal magic! ✨", level="process")
+        try:
+            reused_embeddings = _embed_chunks(chunks, self.embedding_type, self.model_name, self.max_workers)
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            for file_path, _, _, _ in self.pending:
+                log_verbose(f"Error embedding {file_path.name}: {str(e)}", level="error")
+            self.pending, self.pooled = [], 0
+            return
+        if reused_embeddings:
+            log_verbose(f"Reused {reused_embeddings}/{len(chunks)} cached embeddings of unchanged chunks")
+        
+        # Scatter the vectors back: every file still gets its own JSON
+        while self.pending:
+            file_path, file_chunks, tokenizer, file_truncation = self.pending[0]
+            output_file_path = _vectorized_output_path(file_path, self.output_dir, self.embedding_type)
+            try:
+                chunk_count = write_json_array(output_file_path, file_chunks)
+                _report_vectorized(output_file_path, chunk_count, 0, tokenizer, file_truncation, self.truncation)
+                self.finished.append((file_path, output_file_path, chunk_count))
+            except Exception as e:
+                log_verbose(f"Error writing embeddings of {file_path.name}: {str(e)}", level="error")
+            self.pending.pop(0)
+            self.pooled -= len(file_chunks)
+    
+    def take_finished(self):
+        """(file path, output path, chunk count) of the files written since the last call."""
+        finished, self.finished = self.finished, []
+        return finished
+
+def process_text_files_and_vectorize(input_dir=os.getenv("CHUNKED_INPUT_FOLDER_PATH"), output_dir=os.getenv("CHUNKED_OUTPUT_FOLDER_PATH"), embedding_type=None, model_name=None, chunk_size=500, overlap=50, max_workers=4, verbose=None):
+    """Process text files, split into chunks, and transform into vector embeddings! Each file gets its own JSON! 🚀"""
+    
+    # Set defaults from environment if not provided
+    if embedding_type is None:
+        embedding_type = EMBEDDING_TYPE
+    if model_name is None:
+        model_name = OLLAMA_MODEL_NAME if embedding_type.lower() == "ollama" else SENTENCE_TRANSFORMER_MODEL
+    if verbose is None:
+        verbose = VERBOSE
+    
+    start_time = time.time()
+    
+    # Get all extracted files from the input directory
+    text_files = find_extracted_files(input_dir)
+    
+    if not text_files:
+        log_verbose(f"No text files found in {input_dir}", level="error")
+        return []
+    
+    log_verbose(f"Found {len(text_files)} text files to process!")
+    log_verbose(f"Using embedding type: {embedding_type.upper()}")
+    log_verbose(f"Model: {model_name}")
+    
+    # Create output directory if it doesn't exist
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    # Text files unchanged since a run with the same settings keep their vectorized JSON
+    manifest = get_corpus_manifest()
+    stage_settings = {"output_dir": str(output_dir), "embedding_type": embedding_type.lower(), "model": model_name,
+                      "chunk_size": chunk_size, "overlap": overlap, "chunk_unit": CHUNK_UNIT,
+                      "tokenizer": CHUNK_TOKENIZER, "max_tokens": CHUNK_MAX_TOKENS,
+                      "boundaries": CHUNK_BOUNDARIES}
+    reused = _reusable_outputs(manifest, "vectorize", stage_settings, text_files)
+    if reused:
+        log_verbose(f"{len(reused)} unchanged text files keep their earlier embeddings")
+    
+    # Check embedding system availability
+    if len(reused) < len(text_files) and not check_embedding_backend(embedding_type, model_name, max_workers):
+        return []
     
     all_processed_files = []
     total_chunks_processed = 0
+    finished = []
+    truncation = TruncationReport()
+    # Chunks of small files are embedded together across files; each file still gets its own JSON
+    scheduler = EmbeddingScheduler(output_path, embedding_type, model_name, max_workers, EMBEDDING_POOL_CHUNKS, truncation)
+    
+    def collect_finished():
+        nonlocal total_chunks_processed
+        for file_path, output_file_path, chunk_count in scheduler.take_finished():
+            total_chunks_processed += chunk_count
+            all_processed_files.append(output_file_path)
+            finished.append((file_path, {"output_file": str(output_file_path), "chunk_count": chunk_count}, [output_file_path]))
     
     # Process each text file separately
-    for file_idx, file_path in enumerate(text_files, 1):
-        log_verbose(f"\nProcessing file {file_idx}/{len(text_files)}: {file_path.name}")
-        file_start_time = time.time()
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                text_content = f.read()
-            
-            # Skip empty files
-            if not text_content.strip():
-                log_verbose(f"Skipping empty file: {file_path.name}", level="warning")
+    try:
+        for file_idx, file_path in enumerate(text_files, 1):
+            if file_path in reused:
+                output_file_path, chunk_count = reused[file_path]
+                total_chunks_processed += chunk_count
+                all_processed_files.append(output_file_path)
                 continue
             
-            # Split text into chunks
-            log_verbose(f"Splitting text into chunks (size: {chunk_size}, overlap: {overlap})...", level="process")
-            file_chunks_text = split_text_into_chunks(text_content, chunk_size, overlap)
-            
-            # Create chunks with metadata
-            file_chunks = []
-            for i, chunk_text in enumerate(file_chunks_text):
-                chunk_data = {
-                    "source_file": file_path.name,
-                    "chunk_id": f"{file_path.stem}_chunk_{i}",
-                    "chunk_index": i,
-                    "text": chunk_text,
-                    "character_count": len(chunk_text),
-                    "word_count": len(chunk_text.split())
-                }
-                file_chunks.append(chunk_data)
-            
-            log_verbose(f"Created {len(file_chunks)} chunks from {file_path.name}", level="success")
-            
-            # Vectorize chunks for this file using the configured embedding method
-            log_verbose("Generating embeddings... Universal magic! ✨", level="process")
-            texts = [chunk["text"] for chunk in file_chunks]
-            
-            # Use the universal embedding function
-            embeddings = get_embedding_batch(texts, embedding_type, model_name, max_workers)
-            
-            log_verbose(f"Generated {len(embeddings)} embeddings!", level="success")
-            
-            # Attach embeddings to chunks
-            for i, emb in enumerate(embeddings):
-                if i < len(file_chunks):  # Safety check
-                    file_chunks[i]["embedding"] = emb
-            
-            # Save each file's chunks to its own JSON
-            embedding_suffix = "ollama" if embedding_type.lower() == "ollama" else "st"
-            output_filename = f"{file_path.stem}_vectorized_{embedding_suffix}.json"
-            output_file_path = output_path / output_filename
-            
-            log_verbose("Saving vectorized chunks to JSON...", level="process")
-            with open(output_file_path, "w", encoding="utf-8") as f:
-                json.dump(file_chunks, f, indent=2, ensure_ascii=False)
-            
-            file_time = time.time() - file_start_time
-            total_chunks_processed += len(file_chunks)
-            
-            log_verbose(f"Saved {len(file_chunks)} vectorized chunks to: {output_filename}", level="success")
-            log_verbose(f"File processing time: {file_time:.2f} seconds", level="info")
-            all_processed_files.append(output_file_path)
+            log_verbose(f"\nProcessing file {file_idx}/{len(text_files)}: {file_path.name}")
+            file_start_time = time.time()
             
-        except Exception as e:
-            log_verbose(f"Error processing {file_path.name}: {str(e)}", level="error")
-            continue
+            try:
+                scheduler.add(file_path, chunk_size, overlap)
+                file_time = time.time() - file_start_time
+                log_verbose(f"File processing time: {file_time:.2f} seconds", level="info")
+            except Exception as e:
+                log_verbose(f"Error processing {file_path.name}: {str(e)}", level="error")
+            collect_finished()
+        
+        scheduler.flush()
+        collect_finished()
+    finally:
+        if manifest is not None and finished:
+            manifest.record("vectorize", stage_settings, finished)
     
     total_time = time.time() - start_time
     log_verbose(f"\n🎉 WOOHOO! Processed {len(all_processed_files)} files!")
     log_verbose(f"Using {embedding_type.upper()} embeddings with model: {model_name}")
     log_verbose(f"Total chunks processed: {total_chunks_processed}")
+    if truncation.chunks:
+        log_verbose(f"Truncated by the embedding model: {truncation.summary()}")
     log_verbose(f"Total processing time: {total_time:.2f} seconds")
     log_verbose(f"Average speed: {total_chunks_processed/total_time:.1f} chunks/second")
     log_verbose("🌟 Each file now has its own vectorized JSON with your chosen embedding method!")
@@ -342,9 +940,8 @@ def process_text_files_only(input_dir=os.getenv("CHUNKED_INPUT_FOLDER_PATH"), ou
     
     start_time = time.time()
     
-    # Get all text files from the input directory
-    input_path = Path(input_dir)
-    text_files = list(input_path.glob("*.txt"))
+    # Get all extracted files from the input directory
+    text_files = find_extracted_files(input_dir)
     
     if not text_files:
         log_verbose(f"No text files found in {input_dir}", level="error")
@@ -357,59 +954,57 @@ def process_text_files_only(input_dir=os.getenv("CHUNKED_INPUT_FOLDER_PATH"), ou
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
+    # Text files unchanged since a run with the same settings keep their chunk JSON
+    manifest = get_corpus_manifest()
+    stage_settings = {"output_dir": str(output_dir), "chunk_size": chunk_size, "overlap": overlap, "chunk_unit": CHUNK_UNIT,
+                      "tokenizer": CHUNK_TOKENIZER, "max_tokens": CHUNK_MAX_TOKENS,
+                      "boundaries": CHUNK_BOUNDARIES}
+    reused = _reusable_outputs(manifest, "chunks_only", stage_settings, text_files)
+    
+    # The embedding model's tokenizer is only loaded to size chunks in tokens or when named explicitly
+    tokenizer = get_chunk_tokenizer() if (CHUNK_UNIT == "tokens" or CHUNK_TOKENIZER) and len(reused) < len(text_files) else None
+    
     all_processed_files = []
     total_chunks_processed = 0
+    finished = []
+    truncation = TruncationReport()
     
     # Process each text file separately
-    for file_idx, file_path in enumerate(text_files, 1):
-        log_verbose(f"\nProcessing file {file_idx}/{len(text_files)}: {file_path.name}")
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                text_content = f.read()
-            
-            # Skip empty files
-            if not text_content.strip():
-                log_verbose(f"Skipping empty file: {file_path.name}", level="warning")
+    try:
+        for file_idx, file_path in enumerate(text_files, 1):
+            if file_path in reused:
+                output_file_path, chunk_count = reused[file_path]
+                total_chunks_processed += chunk_count
+                all_processed_files.append(output_file_path)
                 continue
             
-            # Split text into chunks
-            file_chunks_text = split_text_into_chunks(text_content, chunk_size, overlap)
-            
-            # Create chunks with metadata (no embeddings)
-            file_chunks = []
-            for i, chunk_text in enumerate(file_chunks_text):
-                chunk_data = {
-                    "source_file": file_path.name,
-                    "chunk_id": f"{file_path.stem}_chunk_{i}",
-                    "chunk_index": i,
-                    "text": chunk_text,
-                    "character_count": len(chunk_text),
-                    "word_count": len(chunk_text.split())
-                    # No embedding field for speed
-                }
-                file_chunks.append(chunk_data)
+            log_verbose(f"\nProcessing file {file_idx}/{len(text_files)}: {file_path.name}")
             
-            log_verbose(f"Created {len(file_chunks)} chunks from {file_path.name}", level="success")
-            
-            # Save each file's chunks to its own JSON
-            output_filename = f"{file_path.stem}_chunks_only.json"
-            output_file_path = output_path / output_filename
-            
-            with open(output_file_path, "w", encoding="utf-8") as f:
-                json.dump(file_chunks, f, indent=2, ensure_ascii=False)
-            
-            total_chunks_processed += len(file_chunks)
-            log_verbose(f"Saved {len(file_chunks)} text chunks to: {output_filename}", level="success")
-            all_processed_files.append(output_file_path)
-            
-        except Exception as e:
-            log_verbose(f"Error processing {file_path.name}: {str(e)}", level="error")
-            continue
+            try:
+                # Split text into chunks with metadata (no embeddings), saving each file's chunks to its own JSON as they are made
+                output_filename = f"{file_path.stem}_chunks_only.json"
+                output_file_path = output_path / output_filename
+                chunk_count = write_chunk_file(file_path, output_file_path, iter_chunk_records(file_path, chunk_size, overlap, tokenizer, truncation))
+                if chunk_count is None:
+                    continue
+                
+                total_chunks_processed += chunk_count
+                log_verbose(f"Saved {chunk_count} text chunks to: {output_filename}", level="success")
+                all_processed_files.append(output_file_path)
+                finished.append((file_path, {"output_file": str(output_file_path), "chunk_count": chunk_count}, [output_file_path]))
+                
+            except Exception as e:
+                log_verbose(f"Error processing {file_path.name}: {str(e)}", level="error")
+                continue
+    finally:
+        if manifest is not None and finished:
+            manifest.record("chunks_only", stage_settings, finished)
     
     total_time = time.time() - start_time
     log_verbose(f"\n🎉 LIGHTNING FAST! Processed {len(all_processed_files)} files!")
     log_verbose(f"Total chunks processed: {total_chunks_processed}")
+    if truncation.chunks:
+        log_verbose(f"Truncated by the embedding model: {truncation.summary()}")
     log_verbose(f"Total processing time: {total_time:.2f} seconds")
     log_verbose(f"Average speed: {total_chunks_processed/total_time:.1f} chunks/second")
     log_verbose("🏃‍♂️ Text-only chunking complete!")
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Encoding detection tests for text_reader.py
+Run with pytest, or directly: python test_text_reader.py
+"""
+import codecs
+from text_reader import detect_text_encoding, iter_txt_blocks, DETECT_BYTES
+
+def test_short_cp1252_file_ending_in_non_ascii():
+    """A whole file shorter than DETECT_BYTES cannot end inside a UTF-8 character."""
+    encoding = detect_text_encoding("Short note: café".encode('cp1252'))
+    assert codecs.lookup(encoding).name != 'utf-8'
+
+def test_prefix_cut_inside_utf8_character():
+    """A prefix cut from a longer file may end in the middle of a character."""
+    prefix = ("a" * (DETECT_BYTES - 1) + "é").encode('utf-8')[:DETECT_BYTES]
+    assert detect_text_encoding(prefix) == 'utf-8'
+
+def test_short_utf8_file():
+    assert detect_text_encoding("Short note: café".encode('utf-8')) == 'utf-8'
+
+def test_short_cp1252_file_is_read_back(tmp_path):
+    path = tmp_path / "note.txt"
+    path.write_bytes("Short note: café".encode('cp1252'))
+    assert "".join(iter_txt_blocks(path)) == "Short note: café"
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_short_cp1252_file_ending_in_non_ascii()
+    test_prefix_cut_inside_utf8_character()
+    test_short_utf8_file()
+    with tempfile.TemporaryDirectory() as folder:
+        test_short_cp1252_file_is_read_back(Path(folder))
+    print("✅ All text reader tests passed")
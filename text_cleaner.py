@@ -0,0 +1,220 @@
+import re
+
+# Every rule is compiled once at import time.
+# Rules that can span line breaks run over whole windows of text:
+_PAGE_NUMBER = re.compile(r'Page\s+\d+\s+of\s+\d+', re.IGNORECASE)
+_SLIDE_NUMBER = re.compile(r'Slide\s+\d+', re.IGNORECASE)
+_WATERMARK = re.compile(r'BAYANAT\s+\(?\d{4}\)?', re.IGNORECASE)
+_WHITESPACE_RUN = re.compile(r'\s{2,}')
+_BULLET = re.compile(r'^[\-\*\d\.\)]\s+', re.MULTILINE)
+_NON_ASCII = re.compile(r'[^\x00-\x7F]+')
+
+# Rules applied line by line once lines are final:
+_EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_TOC_LEADER = re.compile(r'\.{3,}\s*\d{1,3}')
+_CONFIDENTIAL = re.compile(r'Confidential!?|Internal Use Only|Draft Copy', re.IGNORECASE)
+_TOC_TITLE = re.compile(r'Table of Contents', re.IGNORECASE)
+_SPACE_RUN = re.compile(r'[ \t]{2,}')
+
+# Garbage line checks
+_CAPS_WORD = re.compile(r'\b[A-Z]{2,}\b')
+_SYMBOL_RUN = re.compile(r'[^\w\s]{2,}')
+_NON_ALNUM_BYTES = bytes(c for c in range(128) if not chr(c).isalnum())
+
+# Header/footer rules with a lowercase keyword every match must contain
+_HEADER_RULES = [(_PAGE_NUMBER, 'page'), (_SLIDE_NUMBER, 'slide'), (_WATERMARK, 'bayanat')]
+
+# A line break that no rule can match across or change: a single newline between two
+# ASCII letters, where the second cannot start "Page", "Slide" or "BAYANAT"
+_SAFE_CUT = re.compile(r'[A-Za-z]\n(?=[AC-OQ-RT-Zac-oq-rt-z])')
+
+DEFAULT_WINDOW_CHARS = 256 * 1024
+
+def is_garbage_line(line):
+    """Check if a line appears to be garbage/corrupted text from OCR errors."""
+    # Line is very short and not meaningful
+    if len(line.strip()) < 8:
+        return True
+
+    # Contains too many special characters or digits
+    if sum(c.isalnum() for c in line) / (len(line) + 1e-6) < 0.4:
+        return True
+
+    # Contains too many random capitalized words (common in OCR errors)
+    if len(_CAPS_WORD.findall(line)) > 3:
+        return True
+
+    # Looks like a garbled line with mixed letters/digits/symbols
+    if _SYMBOL_RUN.search(line):
+        return True
+
+    return False
+
+def _is_garbage_ascii(line):
+    """is_garbage_line for ASCII-only lines, counting alphanumerics in C instead of per character."""
+    if len(line.strip()) < 8:
+        return True
+    alnum = len(line.encode('ascii').translate(None, _NON_ALNUM_BYTES))
+    if alnum / (len(line) + 1e-6) < 0.4:
+        return True
+    if _SYMBOL_RUN.search(line):
+        return True
+    return len(_CAPS_WORD.findall(line)) > 3
+
+class TextCleaner:
+    """Single-pass cleaner producing exactly the output of the rule list in clean_text.
+
+    Text is taken one window at a time. Windows are cut at line breaks that no rule
+    can match across (see ``_SAFE_CUT``), so every window can be normalized on its
+    own while it is still in cache. The normalized lines then stream through the
+    line rules, the garbage filter and the final space collapse in one loop. A table
+    of contents leader ("....... 12") can join a line to the next one, so the last
+    line is held back until the next line is known.
+
+    ``feed`` returns the cleaned text that is complete so far and ``finish`` the
+    rest. The pieces concatenate to the cleaned document, apart from the leading
+    and trailing whitespace that ``clean_text`` strips.
+    """
+
+    def __init__(self, window_chars=DEFAULT_WINDOW_CHARS):
+        self.window_chars = window_chars
+        self._buffer = ""
+        self._pending = None
+        self._emitted = False
+
+    def feed(self, text):
+        """Add raw text; returns the cleaned text of every window that is complete."""
+        self._buffer += text
+        if len(self._buffer) < self.window_chars:
+            return ""
+
+        out = []
+        pos = 0
+        while len(self._buffer) - pos >= self.window_chars:
+            match = _SAFE_CUT.search(self._buffer, pos + self.window_chars - 1)
+            if match is None:
+                break
+            cut = match.start() + 1
+            self._clean_lines(self._normalize(self._buffer[pos:cut]), out)
+            pos = cut + 1
+        self._buffer = self._buffer[pos:]
+        return "".join(out)
+
+    def finish(self):
+        """Clean whatever is still buffered and end the document."""
+        out = []
+        if self._buffer:
+            self._clean_lines(self._normalize(self._buffer), out)
+            self._buffer = ""
+        if self._pending is not None:
+            self._emit(self._pending, out)
+            self._pending = None
+        return "".join(out)
+
+    @staticmethod
+    def _normalize(text):
+        """Apply the rules that may span line breaks to one window."""
+        ascii_only = text.isascii()
+        lowered = text.lower() if ascii_only else None
+
+        # Remove page/slide numbers and company watermarks. Case-insensitive matching
+        # can involve non-ASCII letters, so the keyword check only applies to ASCII text.
+        for pattern, keyword in _HEADER_RULES:
+            if ascii_only and keyword not in lowered:
+                continue
+            text, count = pattern.subn('', text)
+            if count and ascii_only:
+                lowered = text.lower()
+
+        # Normalize whitespace ("\n{3,}" -> "\n\n" is implied: such runs end up as one space)
+        text = _WHITESPACE_RUN.sub(' ', text)
+
+        # Remove bullet points and numbering at start of lines
+        text = _BULLET.sub('', text)
+
+        # Remove non-ASCII characters (keeping basic punctuation)
+        if not ascii_only:
+            text = _NON_ASCII.sub(' ', text)
+        return text
+
+    @staticmethod
+    def _lines(text):
+        """Split normalized text into lines, dropping whitespace around line breaks.
+
+        Same as replacing every whitespace run that holds a line break with a single
+        newline and splitting on it.
+        """
+        pieces = text.split('\n')
+        if len(pieces) == 1:
+            return pieces
+        lines = [pieces[0].rstrip()]
+        for piece in pieces[1:-1]:
+            piece = piece.strip()
+            if piece:
+                lines.append(piece)
+        lines.append(pieces[-1].lstrip())
+        return lines
+
+    def _clean_lines(self, text, out):
+        """Run normalized lines through the line rules, holding back the last one."""
+        for line in self._lines(text):
+            # Remove email addresses
+            if '@' in line:
+                line = _EMAIL.sub('[email_redacted]', line)
+
+            pending = self._pending
+            if pending is not None:
+                # "Contents ....\n12" is one table of contents leader spanning the break
+                if pending.endswith('...') and line[:1].isdigit():
+                    self._pending = pending + '\n' + line
+                    continue
+                self._emit(pending, out)
+            self._pending = line
+
+    def _emit(self, text, out):
+        # Remove Table of Contents lines (based on dots and page numbers)
+        if '...' in text:
+            text = _TOC_LEADER.sub('', text)
+
+        for line in text.split('\n'):
+            lowered = line.lower()
+            # Remove common confidential keywords
+            if 'confidential' in lowered or 'internal use only' in lowered or 'draft copy' in lowered:
+                line = _CONFIDENTIAL.sub('', line)
+                lowered = line.lower()
+            # Remove "Table of Contents" section titles
+            if 'table of contents' in lowered:
+                line = _TOC_TITLE.sub('', line)
+
+            # Filter out garbage lines
+            if _is_garbage_ascii(line):
+                continue
+
+            # Collapse multiple spaces
+            if '  ' in line or '\t' in line:
+                line = _SPACE_RUN.sub(' ', line)
+
+            if self._emitted:
+                out.append('\n')
+            out.append(line)
+            self._emitted = True
+
+def clean_text_with_stats(text, window_chars=DEFAULT_WINDOW_CHARS):
+    """Clean text and return it with its statistics (word_count, char_count, preview)."""
+    cleaner = TextCleaner(window_chars)
+    cleaned = (cleaner.feed(text or "") + cleaner.finish()).strip()
+    return cleaned, text_stats(cleaned)
+
+def text_stats(text):
+    """Word count, character count and a 200 character preview of a final text."""
+    return {
+        "word_count": len(text.split()) if text else 0,
+        "char_count": len(text) if text else 0,
+        "preview": text[:200] + "..." if len(text) > 200 else text
+    }
+
+def clean_text(text):
+    """Clean and normalize extracted text by removing common artifacts and formatting issues."""
+    if not text:
+        return ""
+    return clean_text_with_stats(text)[0]
@@ -0,0 +1,122 @@
+"""Read plain-text documents block by block in whatever encoding they were saved in.
+
+The encoding is judged from the first bytes of the file (byte order mark, UTF-16 without
+one, UTF-8, then charset-normalizer), and the file is then decoded incrementally, so a
+multi-GB export never has to fit in memory and a Windows-1256 or UTF-16 file is not lost.
+"""
+import io
+import os
+import codecs
+from pathlib import Path
+from dotenv import load_dotenv
+from archive_reader import open_document
+
+# charset-normalizer (installed with requests) tells single-byte code pages apart
+try:
+    from charset_normalizer import from_bytes
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+
+load_dotenv()
+
+# Characters of a TXT file decoded (and cleaned) at a time
+TXT_BLOCK_CHARS = int(os.getenv('TXT_BLOCK_CHARS', '1048576'))
+# Encoding used for TXT files that are not Unicode when charset-normalizer cannot tell
+TXT_FALLBACK_ENCODING = os.getenv('TXT_FALLBACK_ENCODING', 'cp1252')
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+
+# Bytes looked at to detect the encoding
+DETECT_BYTES = 64 * 1024
+# charset-normalizer candidates this close to the best one count as a tie
+CHAOS_TIE = 0.05
+
+# UTF-32 marks first: the UTF-32-LE mark starts with the UTF-16-LE one
+_BYTE_ORDER_MARKS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def detect_text_encoding(prefix):
+    """Encoding of a text file judged from its first bytes."""
+    for mark, encoding in _BYTE_ORDER_MARKS:
+        if prefix.startswith(mark):
+            return encoding
+
+    # Without a mark, UTF-16 shows as NULs in every other byte (its spaces and ASCII letters);
+    # a stray NUL in a log file is not enough
+    even_nuls, odd_nuls = prefix[0::2].count(0), prefix[1::2].count(0)
+    if odd_nuls > len(prefix) // 32 and not even_nuls:
+        return 'utf-16-le'
+    if even_nuls > len(prefix) // 32 and not odd_nuls:
+        return 'utf-16-be'
+
+    try:
+        # Not final when the prefix is cut from a longer file: it may end inside a character
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=len(prefix) < DETECT_BYTES)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    if CHARSET_NORMALIZER_AVAILABLE:
+        matches = list(from_bytes(prefix))
+        if matches:
+            # Short samples often fit several code pages equally well; exports mostly come
+            # from Windows, so the configured code page and then the Windows ones win ties
+            tied = [match.encoding for match in matches if match.chaos <= matches[0].chaos + CHAOS_TIE]
+            fallback = codecs.lookup(TXT_FALLBACK_ENCODING).name
+            for encoding in tied:
+                if codecs.lookup(encoding).name == fallback:
+                    return encoding
+            for encoding in tied:
+                if codecs.lookup(encoding).name.startswith('cp125'):
+                    return encoding
+            return matches[0].encoding
+    return TXT_FALLBACK_ENCODING
+
+def iter_txt_blocks(path, block_chars=TXT_BLOCK_CHARS):
+    """Yield the text of a TXT file block by block, decoded in its detected encoding.
+
+    Line endings are normalized to "\\n" and a byte order mark is dropped. Bytes that are
+    invalid in the detected encoding become U+FFFD instead of failing the whole file.
+    """
+    with open_document(path) as raw:
+        encoding = detect_text_encoding(raw.read(DETECT_BYTES))
+        raw.seek(0)
+        log_verbose(f"Reading {Path(path).name} as {encoding}", "debug")
+        with io.TextIOWrapper(raw, encoding=encoding, errors='replace') as f:
+            for block in iter(lambda: f.read(block_chars), ''):
+                yield block
+
+def count_words(blocks):
+    """Word count of text given in blocks, counting words split across two blocks once."""
+    count = 0
+    in_word = False
+    for block in blocks:
+        if not block:
+            continue
+        words = len(block.split())
+        if in_word and words and not block[0].isspace():
+            words -= 1
+        count += words
+        in_word = not block[-1].isspace()
+    return count
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Watch-folder daemon
+Watches DATA_FOLDER_PATH and runs every new or modified document through
+inspection → extraction → chunking → dedup → QA as soon as it has finished being written,
+one document at a time, so each document's QA pairs are ready without waiting for
+a whole batch. Progress is kept in a state file so a restart only picks up what
+changed (or failed) while the daemon was away.
+
+Usage:
+    python watch_daemon.py           # watch until Ctrl+C
+    python watch_daemon.py --once    # process what is new or modified, then exit
+"""
+
+import os
+import sys
+import json
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from dotenv import load_dotenv
+
+from extraction_cache import hash_file
+from inspection_agent import inspect_file
+from OCR_Extractor import process_file_with_ocr, process_file_isolated, OCR_ISOLATE_DOCUMENTS
+from pipeline_settings import SUPPORTED_EXTENSIONS
+from split_text_chunks import (check_embedding_backend, vectorize_text_file, EMBEDDING_TYPE,
+                               OLLAMA_MODEL_NAME, SENTENCE_TRANSFORMER_MODEL)
+from chunk_dedup import dedup_chunk_file, get_chunk_dedup, CHUNK_DEDUP_ENABLED
+from document_parser import evict_parsed_documents, SHARE_PARSED_DOCUMENTS
+
+load_dotenv()
+
+# Watch configuration
+# "auto" uses inotify where the OS provides it and polls the folder otherwise
+WATCH_BACKEND = os.getenv('WATCH_BACKEND', 'auto').lower()
+# Seconds between folder scans in polling mode (and the longest wait between checks with inotify)
+WATCH_POLL_SECONDS = float(os.getenv('WATCH_POLL_SECONDS', '2'))
+# A file must stay unchanged this long before it is processed, so partial writes are skipped
+WATCH_DEBOUNCE_SECONDS = float(os.getenv('WATCH_DEBOUNCE_SECONDS', '5'))
+WATCH_STATE_FILE = os.getenv('WATCH_STATE_FILE', './output/watch_state.json')
+# Run the QA step (needs Ollama); set to false to stop after chunking
+WATCH_QA = os.getenv('WATCH_QA', 'true').lower() == 'true'
+VERBOSE = os.getenv('VERBOSE_OUTPUT', 'false').lower() == 'true'
+
+# Names written by editors and downloaders while a file is still incomplete
+PARTIAL_SUFFIXES = ('.tmp', '.part', '.partial', '.crdownload', '.download')
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")
+
+def log_verbose(message, level="info"):
+    """Log message only if verbose mode is enabled"""
+    if not VERBOSE and level != "error":
+        return
+
+    prefix = {
+        "info": "ℹ️",
+        "success": "✅",
+        "warning": "⚠️",
+        "error": "❌",
+        "debug": "🔍",
+        "process": "⚙️"
+    }.get(level, "ℹ️")
+
+    print(f"{prefix} {message}")
+
+def is_watched_name(name):
+    """Documents the pipeline handles, leaving out Office lock files and partial downloads."""
+    lower = name.lower()
+    if name.startswith(('~$', '.')) or lower.endswith(PARTIAL_SUFFIXES):
+        return False
+    return Path(lower).suffix in SUPPORTED_EXTENSIONS
+
+def file_signature(path):
+    """(size, mtime in ns) of a file, or None if it is gone."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def scan_folder(folder):
+    """Signatures of the watched documents directly inside ``folder``."""
+    signatures = {}
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return signatures
+    for entry in entries:
+        if not is_watched_name(entry.name):
+            continue
+        try:
+            if entry.is_file():
+                stat = entry.stat()
+                signatures[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            continue
+    return signatures
+
+class PollingWatcher:
+    """Detects changes by comparing folder listings; works on every platform."""
+
+    name = "polling"
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.snapshot = scan_folder(folder)
+
+    def wait(self, timeout):
+        """Names added, changed or removed since the last call."""
+        time.sleep(max(0.0, timeout))
+        snapshot = scan_folder(self.folder)
+        changed = {name for name in snapshot.keys() | self.snapshot.keys()
+                   if snapshot.get(name) != self.snapshot.get(name)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    """Linux inotify through libc, so events arrive without scanning the folder."""
+
+    name = "inotify"
+
+    def __init__(self, folder):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    def wait(self, timeout):
+        """Names with events since the last call, or None when the queue overflowed and a rescan is needed."""
+        ready, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        names = set()
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                return None
+            if name and not mask & IN_ISDIR:
+                names.add(name)
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+def open_watcher(folder, backend=None):
+    """Open the configured watcher, falling back to polling when inotify cannot be used."""
+    backend = (backend or WATCH_BACKEND).lower()
+    if backend in ("auto", "inotify"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            level = "warning" if backend == "inotify" else "debug"
+            log_verbose(f"inotify not available ({e}), polling {folder} every {WATCH_POLL_SECONDS}s", level)
+    return PollingWatcher(folder)
+
+def load_watch_state(path):
+    """Per-document records from earlier runs, keyed by file name."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("documents", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def save_watch_state(path, documents):
+    """Write the state through a temp file so a crash never leaves it half written."""
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"updated_at": datetime.now().isoformat(), "documents": documents}, f, indent=2)
+        os.replace(tmp_name, path)
+    except OSError as e:
+        log_verbose(f"Could not save watch state {path}: {e}", "warning")
+
+class WatchDaemon:
+    """Runs documents through the pipeline one at a time as they appear or change.
+
+    A document is picked up once its size and modification time have been stable
+    for WATCH_DEBOUNCE_SECONDS. Documents whose content hash matches a completed
+    run are skipped; failed documents are retried when they change or when the
+    daemon restarts.
+    """
+
+    def __init__(self, data_folder=None, state_file=None, watcher=None):
+        self.data_folder = Path(data_folder or os.getenv("DATA_FOLDER_PATH", "./data"))
+        self.ocr_output_folder = os.getenv("OCR_OUTPUT_FOLDER_PATH", "./output/ocr_output")
+        self.chunk_output_folder = os.getenv("CHUNKED_OUTPUT_FOLDER_PATH", "./output/chunked_output")
+        self.embedding_type = EMBEDDING_TYPE
+        self.embedding_model = OLLAMA_MODEL_NAME if self.embedding_type == "ollama" else SENTENCE_TRANSFORMER_MODEL
+        self.state_file = state_file or WATCH_STATE_FILE
+        self.documents = load_watch_state(self.state_file)
+        self.watcher = watcher
+        # name -> {"first_seen", "changed_at", "signature"} for files waiting to settle
+        self.pending = {}
+        self._embeddings_ready = False
+        self._qa_generator = None
+
+    def _is_current(self, name, signature):
+        """Whether the stored record already covers this exact file content."""
+        record = self.documents.get(name)
+        if not record or record.get("status") != "done":
+            return False
+        if (record.get("size"), record.get("mtime_ns")) == signature:
+            return True
+        try:
+            file_hash = hash_file(self.data_folder / name)
+        except OSError:
+            return False
+        if file_hash != record.get("hash"):
+            return False
+        # Touched or copied over with identical bytes: remember the new signature only
+        record["size"], record["mtime_ns"] = signature
+        return True
+
+    def _forget(self, name):
+        self.pending.pop(name, None)
+        record = self.documents.pop(name, None)
+        if record is not None:
+            log_verbose(f"{name} was removed from the data folder", "info")
+            # Its chunks must not stay canonical for documents processed later
+            chunk_file = record.get("outputs", {}).get("chunks")
+            index = get_chunk_dedup() if chunk_file else None
+            if index is not None:
+                index.forget(Path(chunk_file).name)
+            save_watch_state(self.state_file, self.documents)
+
+    def note_change(self, name, now=None):
+        """Start (or restart) the debounce clock for a file that has changed."""
+        if not is_watched_name(name):
+            return
+        signature = file_signature(self.data_folder / name)
+        if signature is None:
+            self._forget(name)
+            return
+        now = time.time() if now is None else now
+        entry = self.pending.setdefault(name, {"first_seen": now})
+        entry["changed_at"] = now
+        entry["signature"] = signature
+
+    def rescan(self):
+        """Queue every document that differs from its stored record and drop records of deleted files."""
+        signatures = scan_folder(self.data_folder)
+        for name in list(self.documents):
+            if name not in signatures:
+                self._forget(name)
+        now = time.time()
+        for name, signature in signatures.items():
+            if name in self.pending or self._is_current(name, signature):
+                continue
+            # Files that have not been written to recently are ready straight away
+            changed_at = min(now, signature[1] / 1e9)
+            self.pending[name] = {"first_seen": now, "changed_at": changed_at, "signature": signature}
+
+    def ready_documents(self, now=None):
+        """Pending files that have been stable for the debounce period, oldest first."""
+        now = time.time() if now is None else now
+        ready = []
+        for name, entry in list(self.pending.items()):
+            signature = file_signature(self.data_folder / name)
+            if signature is None:
+                self._forget(name)
+            elif signature != entry["signature"]:
+                entry["signature"] = signature
+                entry["changed_at"] = now
+            elif now - entry["changed_at"] >= WATCH_DEBOUNCE_SECONDS:
+                ready.append(name)
+        return sorted(ready, key=lambda name: self.pending[name]["first_seen"])
+
+    def next_timeout(self, now=None):
+        """How long the watcher may block before a pending file could become ready."""
+        if not self.pending:
+            return WATCH_POLL_SECONDS
+        now = time.time() if now is None else now
+        settle = min(entry["changed_at"] for entry in self.pending.values()) + WATCH_DEBOUNCE_SECONDS - now
+        return max(0.0, min(WATCH_POLL_SECONDS, settle))
+
+    def _chunk(self, text_file):
+        if not self._embeddings_ready:
+            self._embeddings_ready = check_embedding_backend(self.embedding_type, self.embedding_model)
+            if not self._embeddings_ready:
+                raise RuntimeError(f"{self.embedding_type} embeddings are not available")
+        result = vectorize_text_file(text_file, self.chunk_output_folder, self.embedding_type, self.embedding_model)
+        if result is None:
+            raise RuntimeError("extracted text is empty")
+        return result
+
+    def _generate_qa(self, chunk_file):
+        if self._qa_generator is None:
+            # Imported here so the daemon can run without Ollama when WATCH_QA=false
+            from generate_qa import QAGenerator
+            self._qa_generator = QAGenerator()
+        if not self._qa_generator.process_file(Path(chunk_file)):
+            raise RuntimeError("QA generation failed")
+        return str(self._qa_generator.output_file_for(Path(chunk_file)))
+
+    def process_document(self, name):
+        """Run one document through every step and record the outcome. Returns the record."""
+        path = self.data_folder / name
+        entry = self.pending.pop(name)
+        size, mtime_ns = entry["signature"]
+        record = {"size": size, "mtime_ns": mtime_ns, "timings": {}, "outputs": {}}
+        stage = "hashing"
+
+        def timed(step, function, *args, **kwargs):
+            start_time = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record["timings"][step] = round(time.time() - start_time, 3)
+
+        try:
+            record["hash"] = hash_file(path)
+
+            stage = "inspection"
+            metadata = timed(stage, inspect_file, path)
+            record["inspection"] = metadata
+            if metadata is None:
+                raise RuntimeError("inspection failed")
+
+            stage = "extraction"
+            # Under OCR_DOCUMENT_TIMEOUT / OCR_DOCUMENT_MAX_RSS_MB a stuck document cannot stall the daemon
+            extract = process_file_isolated if OCR_ISOLATE_DOCUMENTS else process_file_with_ocr
+            result = timed(stage, extract, path, self.ocr_output_folder, data_root=self.data_folder)
+            if result.get("status"):
+                record["extraction_status"] = result["status"]
+            if not result["success"]:
+                raise RuntimeError(result.get("error") or "no text extracted")
+            record["outputs"]["text"] = result["output_file"]
+            if result.get("structured_file"):
+                record["outputs"]["structured"] = result["structured_file"]
+            record["cache_hit"] = result.get("cache_hit", False)
+
+            stage = "chunking"
+            chunk_file, chunk_count = timed(stage, self._chunk, result.get("structured_file") or result["output_file"])
+            record["outputs"]["chunks"] = str(chunk_file)
+            record["chunk_count"] = chunk_count
+
+            if CHUNK_DEDUP_ENABLED:
+                # Against every chunk indexed so far, so QA skips boilerplate seen in earlier documents
+                stage = "dedup"
+                record["duplicate_count"] = len(timed(stage, dedup_chunk_file, chunk_file))
+
+            if WATCH_QA:
+                stage = "qa"
+                record["outputs"]["qa"] = timed(stage, self._generate_qa, chunk_file)
+
+            record["status"] = "done"
+        except Exception as e:
+            record["status"] = "failed"
+            record["failed_stage"] = stage
+            record["error"] = str(e)
+
+        record["latency_seconds"] = round(time.time() - entry["first_seen"], 3)
+        record["processed_at"] = datetime.now().isoformat()
+        self.documents[name] = record
+        save_watch_state(self.state_file, self.documents)
+        if SHARE_PARSED_DOCUMENTS:
+            evict_parsed_documents()
+
+        if record["status"] == "done":
+            print(f"✅ {name}: done in {record['latency_seconds']:.1f}s "
+                  f"({', '.join(f'{step} {seconds:.1f}s' for step, seconds in record['timings'].items())})")
+        else:
+            print(f"❌ {name}: failed at {stage}: {record['error']}")
+        return record
+
+    def process_ready(self):
+        """Process every document that has settled; changes seen in between are picked up as well."""
+        processed = 0
+        while True:
+            ready = self.ready_documents()
+            if not ready:
+                return processed
+            name = ready[0]
+            if self._is_current(name, self.pending[name]["signature"]):
+                # Touched or rewritten with the same bytes
+                del self.pending[name]
+                log_verbose(f"{name} is unchanged since its last run, skipping", "debug")
+                save_watch_state(self.state_file, self.documents)
+            else:
+                self.process_document(name)
+                processed += 1
+            self._drain_events(0)
+
+    def _drain_events(self, timeout):
+        changed = self.watcher.wait(timeout)
+        if changed is None:
+            log_verbose("Watch event queue overflowed, rescanning the data folder", "warning")
+            self.rescan()
+            return
+        for name in changed:
+            self.note_change(name)
+
+    def run(self, once=False):
+        """Watch the data folder until interrupted (or, with ``once``, until nothing is left to do)."""
+        if not self.data_folder.is_dir():
+            print(f"❌ Data folder {self.data_folder} does not exist")
+            return
+        if self.watcher is None:
+            self.watcher = open_watcher(self.data_folder)
+
+        print(f"👀 Watching {self.data_folder} ({self.watcher.name}, debounce {WATCH_DEBOUNCE_SECONDS:g}s)")
+        print(f"   State file: {self.state_file} ({len(self.documents)} documents known)")
+        try:
+            # Catch up with whatever changed while the daemon was not running
+            self.rescan()
+            if self.pending:
+                print(f"⚙️ {len(self.pending)} new or modified documents to process")
+            while True:
+                self.process_ready()
+                if once and not self.pending:
+                    break
+                self._drain_events(self.next_timeout())
+        except KeyboardInterrupt:
+            print("\n⚠️ Stopping watch daemon")
+        finally:
+            self.watcher.close()
+            save_watch_state(self.state_file, self.documents)
+
+        done = sum(1 for record in self.documents.values() if record.get("status") == "done")
+        failed = sum(1 for record in self.documents.values() if record.get("status") == "failed")
+        print(f"📊 {done} documents done, {failed} failed, {len(self.pending)} still pending")
+
+if __name__ == "__main__":
+    WatchDaemon().run(once="--once" in sys.argv[1:])